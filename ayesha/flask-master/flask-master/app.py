@@ -1,8 +1,16 @@
 from flask import Flask, render_template, request, redirect, url_for
+import difflib
 import json
 import subprocess
 import os
 import sys
+import time
+
+# preprocessor_worker.py lives in the main project directory (same level as preprocessor.py)
+MAIN_PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+sys.path.insert(0, MAIN_PROJECT_DIR)
+import preprocessor_worker
+from preprocessor_log import read_job_result
 
 # Set UTF-8 encoding for Windows console
 if sys.platform == 'win32':
@@ -27,6 +35,52 @@ def after_request(response):
 
 session_data = {}
 
+# Use the Dataset conda environment Python
+DATASET_PYTHON = r"D:\anaconda\envs\Dataset\python.exe"
+
+def ensure_preprocessor_worker(startup_timeout=300):
+    """
+    Make sure the long-lived preprocessor worker is running, starting it on
+    first use. The worker keeps the SentenceTransformer model loaded between jobs.
+    """
+    if preprocessor_worker.ping():
+        return True
+    if preprocessor_worker.port_in_use():
+        # Something that rejects our key holds the port; a new worker could not bind it
+        print(f"[X] Port {preprocessor_worker.WORKER_PORT} is in use by a process that is not a reachable "
+              f"preprocessor worker (stop it or set PREPROCESSOR_WORKER_PORT)", flush=True)
+        return False
+
+    worker_path = os.path.join(MAIN_PROJECT_DIR, "preprocessor_worker.py")
+    python_exe = DATASET_PYTHON if os.path.exists(DATASET_PYTHON) else sys.executable
+    # The worker gets the key this app uses (see preprocessor_worker.load_authkey)
+    env = {**os.environ, "PREPROCESSOR_WORKER_AUTHKEY": preprocessor_worker.WORKER_AUTHKEY.hex()}
+    worker = subprocess.Popen([python_exe, worker_path], cwd=MAIN_PROJECT_DIR, env=env)
+
+    # Wait for the model to load and the worker to start listening
+    deadline = time.time() + startup_timeout
+    while time.time() < deadline:
+        if preprocessor_worker.ping(timeout=1):
+            return True
+        if worker.poll() is not None:
+            print(f"[X] Preprocessor worker exited with code {worker.returncode}", flush=True)
+            return False
+        time.sleep(0.5)
+    return False
+
+def load_profile(file_path, timeout=600):
+    """
+    Column summary of the dataset from the preprocessor worker (cached per
+    file content there), or None when it cannot be computed.
+    """
+    try:
+        if not ensure_preprocessor_worker():
+            return None
+        reply = preprocessor_worker.submit_profile(file_path, timeout=timeout)
+    except Exception:
+        return None
+    return reply.get("profile")
+
 @app.route("/")
 def home():
     return render_template("index.html")
@@ -69,15 +123,35 @@ def submit(process_name):
             
             session_data["file_path"] = file_path
             session_data["conversation"].append({"type": "user", "message": file_path})
-            session_data["conversation"].append({"type": "bot", "message": f"Great! File path received: {file_path}. Now, please provide the target column name."})
+            session_data["profile"] = load_profile(file_path)
+            profile = session_data["profile"]
+            if profile:
+                summary = f" It has {profile['rows']} rows and {len(profile['columns'])} columns (summary below)."
+            else:
+                summary = ""
+            session_data["conversation"].append({"type": "bot", "message": f"Great! File path received: {file_path}.{summary} Now, please provide the target column name."})
             return render_template("chatbot.html",
                                    process_name=process_name,
                                    stage="target_column",
                                    filepath=file_path,
+                                   profile=profile,
                                    conversation=session_data["conversation"])
 
         elif stage == "target_column":
-            target_column = request.form.get("target_column")
+            target_column = (request.form.get("target_column") or "").strip()
+            profile = session_data.get("profile")
+            column_names = [column["name"] for column in profile["columns"]] if profile else []
+            if column_names and target_column not in column_names:
+                # Ask again instead of failing the whole job later
+                close = difflib.get_close_matches(target_column, column_names, n=1)
+                hint = f" Did you mean '{close[0]}'?" if close else ""
+                session_data["conversation"].append({"type": "user", "message": target_column})
+                session_data["conversation"].append({"type": "bot", "message": f"Column '{target_column}' is not in the dataset.{hint} Please provide the target column name."})
+                return render_template("chatbot.html",
+                                       process_name=process_name,
+                                       stage="target_column",
+                                       profile=profile,
+                                       conversation=session_data["conversation"])
             session_data["target_column"] = target_column
             session_data["conversation"].append({"type": "user", "message": target_column})
             session_data["conversation"].append({"type": "bot", "message": f"Target column set: {target_column}. Now let's add preprocessing steps. Type 'END' when finished."})
@@ -120,31 +194,33 @@ def submit(process_name):
                 with open(json_full_path, 'w') as f:
                     json.dump(preprocessing_data, f, indent=4)
                 
-                # Call the actual preprocessor.py
+                # Submit the job to the preprocessor worker
                 try:
-                    # Change to the main project directory where preprocessor.py is located
-                    preprocessor_path = os.path.join(main_project_dir, "preprocessor.py")
-                    
-                    # Use the Dataset conda environment Python
-                    dataset_python = r"D:\anaconda\envs\Dataset\python.exe"
-                    
-                    # Run the preprocessor with the correct Python environment
-                    result = subprocess.run(
-                        [dataset_python, preprocessor_path],
-                        cwd=main_project_dir,
-                        capture_output=True,
-                        text=True,
-                        timeout=6600  # 5 minute timeout
+                    output_json_path = os.path.join(main_project_dir, "Output.json")
+                    worker_error = ""
+
+                    if not ensure_preprocessor_worker():
+                        raise RuntimeError("Preprocessor worker failed to start")
+
+                    # Don't mistake the result of an earlier job for this one
+                    if os.path.exists(output_json_path):
+                        os.remove(output_json_path)
+
+                    # Run the preprocessor job in the warm worker process
+                    result = preprocessor_worker.submit_job(
+                        json_full_path,
+                        os.path.join(main_project_dir, "Processed_Dataset.csv"),
+                        output_json_path,
+                        timeout=6600
                     )
-                    
+                    if result.get("status") == "error":
+                        worker_error = result.get("message", "")
+
                     # Check if Output.json was created
-                    output_json_path = os.path.join(main_project_dir, "Output.json")
-                    
                     if os.path.exists(output_json_path):
-                        # Read the Output.json file
-                        with open(output_json_path, 'r') as f:
-                            output_data = json.load(f)
-                        
+                        # Read the Output.json file (written once, atomically, at the end of the job)
+                        output_data = read_job_result(output_json_path)
+
                         # Extract values from output JSON
                         status = output_data.get("status", "unknown")
                         processed_dataset_path = output_data.get("Processed_dataset_path", "")
@@ -168,16 +244,16 @@ def submit(process_name):
                         else:
                             backend_output = {
                                 "status": "error",
-                                "message": output_data.get("message", "Unknown error occurred")
+                                "message": f"[X] {output_data.get('message') or 'Unknown error occurred'}"[:200]
                             }
                     else:
                         # No Output.json found
                         backend_output = {
                             "status": "error",
-                            "message": f"[X] Preprocessing failed - no Output.json created.\nError: {result.stderr[:200] if result.stderr else 'Unknown error'}"
+                            "message": f"[X] Preprocessing failed - no Output.json created.\nError: {worker_error[:200] if worker_error else 'Unknown error'}"
                         }
                         
-                except subprocess.TimeoutExpired:
+                except TimeoutError:
                     backend_output = {
                         "status": "error",
                         "message": "Preprocessing timed out (exceeded 5 minutes)"
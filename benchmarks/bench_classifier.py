@@ -0,0 +1,55 @@
+"""
+Per-prompt vs batched intent classification latency.
+
+    python benchmarks/bench_classifier.py [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import preprocessor
+
+SAMPLE_PROMPTS = [
+    "remove duplicate rows",
+    "fill missing values in age with the mean",
+    "normalize all columns",
+    "drop the id column",
+    "encode the city column",
+    "convert price to float",
+    "reduce the dataset to two dimensions",
+    "standardize income and spending",
+    "keep only rows where age > 30",
+    "fill missing categories with the most frequent value"
+]
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100])
+    args = parser.parse_args()
+
+    embedder, label_embs = preprocessor.load_classifier()
+    labels = preprocessor.CANDIDATE_LABELS
+
+    # Warm up the model so the first measurement is not an outlier
+    preprocessor.classify_batch(SAMPLE_PROMPTS, embedder, label_embs)
+
+    print(f"{'prompts':>8} {'per-prompt (ms)':>16} {'batched (ms)':>13} {'speedup':>8}")
+    for n in args.sizes:
+        prompts = (SAMPLE_PROMPTS * (n // len(SAMPLE_PROMPTS) + 1))[:n]
+        per_prompt = best_of(lambda: [preprocessor.classifier(p, labels, embedder, label_embs) for p in prompts], args.repeat)
+        batched = best_of(lambda: preprocessor.classify_batch(prompts, embedder, label_embs, top_k=1), args.repeat)
+        print(f"{n:>8} {per_prompt * 1000:>16.2f} {batched * 1000:>13.2f} {per_prompt / batched:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Finding the columns named in prompts on wide tables: substring scan over every column vs the column index.
+
+    python benchmarks/bench_column_matching.py [--columns 1000 5000 20000] [--prompts 200]
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from preprocessor_columns import ColumnIndex
+
+def substring_scan(user_input, columns):
+    lower_input = user_input.lower()
+    return [col for col in columns if col.lower() in lower_input]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--columns", type=int, nargs="+", default=[1000, 5000, 20000])
+    parser.add_argument("--prompts", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    templates = [
+        "fill missing values in {} with the median",
+        "normalize {} and {}",
+        "drop the {} column",
+        "convert {} to float"
+    ]
+    print(f"{'columns':>8} {'scan (ms/prompt)':>17} {'build (ms)':>11} {'index (ms/prompt)':>18}")
+    for n in args.columns:
+        columns = [f"sensor_{i:05d}_reading" for i in range(n)]
+        prompts = []
+        for _ in range(args.prompts):
+            template = templates[rng.integers(len(templates))]
+            names = rng.choice(columns, template.count("{}"), replace=False)
+            prompts.append(template.format(*names))
+
+        start = time.perf_counter()
+        expected = [substring_scan(prompt, columns) for prompt in prompts]
+        scan = (time.perf_counter() - start) / len(prompts)
+
+        start = time.perf_counter()
+        index = ColumnIndex(columns)
+        build = time.perf_counter() - start
+        start = time.perf_counter()
+        found = [index.find(prompt) for prompt in prompts]
+        lookup = (time.perf_counter() - start) / len(prompts)
+        assert found == expected
+        print(f"{n:>8} {scan * 1000:>17.3f} {build * 1000:>11.1f} {lookup * 1000:>18.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Streaming remove_duplicates: a Python set of 64-bit row hashes vs sorted fingerprint arrays (64/128-bit, and spilled to disk).
+
+    python benchmarks/bench_dedup.py [--rows 5000000] [--chunksize 100000] [--duplicates 0.2]
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from preprocessor_dedup import FingerprintSet, first_occurrences, row_fingerprints
+
+def python_set(chunks):
+    seen = set()
+    kept = 0
+    for chunk in chunks:
+        hashes = pd.util.hash_pandas_object(chunk, index=False).to_numpy()
+        first = ~pd.Series(hashes).duplicated().to_numpy()
+        first &= np.fromiter((h not in seen for h in hashes), dtype=bool, count=len(hashes))
+        seen.update(hashes[first])
+        kept += int(first.sum())
+    # Set table plus one int object per entry
+    return kept, (sys.getsizeof(seen) + 32 * len(seen)) / 2**20, 0
+
+def fingerprint_set(chunks, bits, memory_bytes):
+    seen = FingerprintSet(bits, memory_bytes)
+    kept = 0
+    for chunk in chunks:
+        fingerprints = row_fingerprints(chunk, None, bits)
+        first = first_occurrences(fingerprints)
+        if len(seen):
+            first[first] = ~seen.contains(fingerprints[first])
+        seen.add(fingerprints[first])
+        kept += int(first.sum())
+    return kept, seen.memory.nbytes / 2**20, seen.spilled
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument("--chunksize", type=int, default=100_000)
+    parser.add_argument("--duplicates", type=float, default=0.2)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    distinct = int(args.rows * (1 - args.duplicates))
+    ids = rng.integers(0, distinct, args.rows)
+    frame = pd.DataFrame({"id": ids, "value": ids * 0.5, "region": np.array(["north", "south", "east"])[ids % 3]})
+    chunks = [frame.iloc[i:i + args.chunksize] for i in range(0, len(frame), args.chunksize)]
+    expected = int((~frame.duplicated()).sum())
+
+    print(f"{args.rows} rows in chunks of {args.chunksize}, {args.rows - expected} duplicates")
+    print(f"{'method':>26} {'time (s)':>9} {'memory (MB)':>12} {'spilled':>10}")
+    # Room for an eighth of the distinct fingerprints (8 bytes each) before spilling
+    budget = expected
+    for name, run in [
+        ("python set, 64-bit", lambda: python_set(chunks)),
+        ("sorted array, 64-bit", lambda: fingerprint_set(chunks, 64, 2**40)),
+        ("sorted array, 128-bit", lambda: fingerprint_set(chunks, 128, 2**40)),
+        ("spilled to disk, 64-bit", lambda: fingerprint_set(chunks, 64, budget))
+    ]:
+        start = time.perf_counter()
+        kept, memory, spilled = run()
+        elapsed = time.perf_counter() - start
+        assert kept == expected, (name, kept, expected)
+        print(f"{name:>26} {elapsed:>9.3f} {memory:>12.1f} {spilled:>10}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+filter_rows on Parquet: DataFrame.query after a full read vs the compiled predicate with row-group pruning.
+
+    python benchmarks/bench_filter_pushdown.py [--rows 2000000] [--row-group-size 100000] [--selectivity 0.05]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from preprocessor_io import read_dataset
+from preprocessor_query import evaluate, matching_row_groups, parse_predicate
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--row-group-size", type=int, default=100_000)
+    parser.add_argument("--selectivity", type=float, default=0.05)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    # Rows arrive roughly in timestamp order, as in most logs and exports
+    frame = pd.DataFrame({
+        "timestamp": np.arange(args.rows) + rng.integers(0, 1000, args.rows),
+        "amount": rng.normal(100, 30, args.rows),
+        "region": rng.choice(["north", "south", "east", "west"], args.rows),
+        "score": rng.random(args.rows)
+    })
+    threshold = int(args.rows * (1 - args.selectivity))
+    prompt = f"keep rows where timestamp >= {threshold} and amount > 50"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "data.parquet")
+        frame.to_parquet(path, row_group_size=args.row_group_size)
+
+        query_time, expected = timed(lambda: read_dataset(path).query(f"timestamp >= {threshold} and amount > 50"))
+
+        def pushed_down():
+            predicate = parse_predicate(prompt, list(frame.columns))
+            groups, total = matching_row_groups(path, predicate)
+            loaded = read_dataset(path, row_groups=groups)
+            return loaded[evaluate(predicate, loaded)], len(groups), total
+        pushdown_time, (result, read, total) = timed(pushed_down)
+
+    assert len(result) == len(expected)
+    print(f"{args.rows} rows, {total} row groups, {len(result)} rows kept")
+    print(f"{'method':>28} {'time (s)':>9} {'row groups read':>16}")
+    print(f"{'full read + query':>28} {query_time:>9.3f} {total:>16}")
+    print(f"{'compiled + row-group pruning':>28} {pushdown_time:>9.3f} {read:>16}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Cold-start import time regression check for preprocessor.py.
+
+Runs `python -X importtime -c "import preprocessor"` in a fresh interpreter,
+reports the cumulative import time, and exits non-zero when it exceeds the
+budget or when a heavy dependency is imported eagerly.
+
+    python benchmarks/bench_import_time.py [--budget-ms 1500] [--runs 3]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must only be imported on demand
+LAZY_MODULES = ["torch", "sentence_transformers", "sklearn"]
+
+def measure_import(module):
+    """
+    Return (cumulative microseconds for module, set of top-level packages imported).
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_DIR,
+        capture_output=True,
+        text=True
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+
+    total_us = None
+    imported = set()
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = [p.strip() for p in line[len("import time:"):].split("|")]
+        if not parts[1].isdigit():
+            continue  # header row
+        name = parts[2]
+        imported.add(name.split(".")[0])
+        if name == module:
+            total_us = int(parts[1])
+    return total_us, imported
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--module", default="preprocessor")
+    parser.add_argument("--budget-ms", type=float, default=float(os.environ.get("PREPROCESSOR_IMPORT_BUDGET_MS", "1500")))
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    timings = []
+    imported = set()
+    for _ in range(args.runs):
+        total_us, imported = measure_import(args.module)
+        timings.append(total_us / 1000)
+    best = min(timings)
+
+    print(f"import {args.module}: best {best:.1f} ms over {args.runs} run(s), budget {args.budget_ms:.0f} ms")
+
+    failed = False
+    eager = [m for m in LAZY_MODULES if m in imported]
+    if eager:
+        print(f"[X] Heavy modules imported at startup: {', '.join(eager)}")
+        failed = True
+    if best > args.budget_ms:
+        print(f"[X] Cold start exceeds budget by {best - args.budget_ms:.1f} ms")
+        failed = True
+    if not failed:
+        print("[OK] Within budget")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
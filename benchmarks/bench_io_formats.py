@@ -0,0 +1,66 @@
+"""
+Write/read time and file size of CSV vs Parquet vs Feather for processed data.
+
+    python benchmarks/bench_io_formats.py [--rows 1000000] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from preprocessor_io import read_dataset, write_dataset
+
+FORMATS = [
+    ("csv", None, ".csv"),
+    ("parquet", "snappy", ".parquet"),
+    ("parquet", "zstd", ".parquet"),
+    ("feather", "lz4", ".feather"),
+    ("feather", "uncompressed", ".feather")
+]
+
+def make_frame(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "id": np.arange(rows),
+        "age": rng.integers(18, 90, rows),
+        "income": rng.normal(50000, 15000, rows),
+        "score": rng.random(rows),
+        "city": pd.Categorical(rng.choice(["Chennai", "Delhi", "Mumbai", "Pune", "Kolkata"], rows)),
+        "signup": pd.Timestamp("2020-01-01") + pd.to_timedelta(rng.integers(0, 1500, rows), unit="D"),
+        "label_yes": rng.random(rows) > 0.5
+    })
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    frame = make_frame(args.rows)
+    print(f"{args.rows} rows x {frame.shape[1]} columns")
+    print(f"{'format':<22} {'write (s)':>10} {'read (s)':>10} {'size (MB)':>10} {'dtypes kept':>12}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt, compression, ext in FORMATS:
+            path = os.path.join(tmp, f"data_{fmt}_{compression}{ext}")
+            write_time = best_of(lambda: write_dataset(frame, path, fmt, compression), args.repeat)
+            read_time = best_of(lambda: read_dataset(path, fmt), args.repeat)
+            size_mb = os.path.getsize(path) / 1024 / 1024
+            kept = (read_dataset(path, fmt).dtypes == frame.dtypes).sum()
+            name = f"{fmt} ({compression})" if compression else fmt
+            print(f"{name:<22} {write_time:>10.3f} {read_time:>10.3f} {size_mb:>10.1f} {kept:>8}/{frame.shape[1]}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Throughput of column-sharded in-memory execution from 1 to N worker processes.
+
+    python benchmarks/bench_parallel.py [--rows 1000000] [--numeric 16] [--categorical 8] [--workers 1 2 4]
+"""
+import argparse
+import copy
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from preprocessor_plan import compile_plan, run_plan
+
+ACTIONS = [
+    ("fill_missing_mean", "fill missing values with mean"),
+    ("encode_categorical", "encode categorical columns"),
+    ("standardize_columns", "standardize numeric columns")
+]
+
+def make_frame(rows, numeric, categorical, seed=0):
+    rng = np.random.default_rng(seed)
+    data = {f"num_{i}": rng.normal(size=rows) for i in range(numeric)}
+    vocabulary = np.array([f"value_{i}" for i in range(50)], dtype=object)
+    data.update({f"cat_{i}": vocabulary[rng.integers(0, 50, rows)] for i in range(categorical)})
+    data["target"] = rng.choice(["a", "b", "c"], rows)
+    frame = pd.DataFrame(data)
+    for i in range(numeric):
+        frame.loc[rng.random(rows) < 0.05, f"num_{i}"] = np.nan
+    return frame
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--numeric", type=int, default=16)
+    parser.add_argument("--categorical", type=int, default=8)
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument("--repeat", type=int, default=2)
+    args = parser.parse_args()
+
+    frame = make_frame(args.rows, args.numeric, args.categorical)
+    errors = []
+    print(f"{args.rows} rows x {frame.shape[1]} columns, {os.cpu_count()} cores")
+    print(f"{'workers':>8} {'time (s)':>10} {'rows/s':>12} {'speedup':>8}")
+    baseline = None
+    for workers in args.workers:
+        plan = compile_plan(ACTIONS, "target", frame.columns, {"workers": workers})
+        timings = []
+        for _ in range(args.repeat):
+            run = copy.deepcopy(plan)
+            start = time.perf_counter()
+            run_plan(frame.copy(), run, errors.append)
+            timings.append(time.perf_counter() - start)
+        # The first run of a new pool includes starting its processes
+        elapsed = min(timings)
+        baseline = baseline or elapsed
+        print(f"{workers:>8} {elapsed:>10.3f} {args.rows / elapsed:>12,.0f} {baseline / elapsed:>7.2f}x")
+    if errors:
+        print("errors:", errors)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+PCA fit time on tall matrices: sklearn PCA vs the one-pass scatter-matrix fit of reduce_dimensions.
+
+    python benchmarks/bench_pca.py [--rows 100000 1000000] [--columns 20] [--chunksize 100000]
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from preprocessor_ops import OPS, new_step
+
+def fit_op(frame, chunksize):
+    op = OPS["reduce_dimensions"]
+    step = new_step("reduce_dimensions", "reduce dimensions with pca to 2 components")
+    op.resolve(step, frame, {"target_column": None, "columns": list(frame.columns)})
+    state = op.new_state(step)
+    for start in range(0, len(frame), chunksize):
+        op.update(state, frame.iloc[start:start + chunksize], step)
+    return op.finalize(state, step)
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--columns", type=int, default=20)
+    parser.add_argument("--chunksize", type=int, default=100_000)
+    args = parser.parse_args()
+
+    from sklearn.decomposition import PCA
+    rng = np.random.default_rng(0)
+    print(f"{'rows':>10} {'sklearn full (s)':>17} {'sklearn randomized (s)':>23} {'one pass (s)':>13} {'max |diff|':>11}")
+    for rows in args.rows:
+        frame = pd.DataFrame(rng.normal(size=(rows, args.columns)) @ rng.normal(size=(args.columns, args.columns)),
+                             columns=[f"x{i}" for i in range(args.columns)])
+        full_time, full = timed(lambda: PCA(n_components=2, svd_solver="full").fit(frame))
+        randomized_time, _ = timed(lambda: PCA(n_components=2, svd_solver="randomized", random_state=0).fit(frame))
+        op_time, params = timed(lambda: fit_op(frame, args.chunksize))
+        diff = np.abs(np.asarray(params["components"]) - full.components_).max()
+        print(f"{rows:>10} {full_time:>17.3f} {randomized_time:>23.3f} {op_time:>13.3f} {diff:>11.2e}")
+
+if __name__ == "__main__":
+    main()
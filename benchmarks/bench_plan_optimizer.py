@@ -0,0 +1,65 @@
+"""
+In-memory run of a pipeline whose drop and filter come last, in prompt order vs reordered by the plan optimizer.
+
+    python benchmarks/bench_plan_optimizer.py [--rows 1000000] [--columns 20] [--regions 10]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from preprocessor import preprocess_in_memory
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--columns", type=int, default=20)
+    parser.add_argument("--regions", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    data = {f"feature_{i:03d}": rng.normal(size=args.rows) for i in range(args.columns)}
+    for values in list(data.values())[::3]:
+        values[rng.random(args.rows) < 0.05] = np.nan
+    data["segment"] = rng.choice(["retail", "online", "partner", "direct"], args.rows)
+    data["region"] = rng.choice([f"region_{i:03d}" for i in range(args.regions)], args.rows)
+    data["target"] = rng.choice(["yes", "no"], args.rows)
+    frame = pd.DataFrame(data)
+
+    unused = [f"feature_{i:03d}" for i in range(args.columns // 2, args.columns)]
+    actions = [
+        ("fill_missing_mean", "fill missing values with the mean"),
+        ("standardize_columns", "standardize the numeric columns"),
+        ("encode_categorical", "encode segment"),
+        ("filter_rows", "keep rows where region is 'region_000'"),
+        ("drop_columns", "drop " + ", ".join(unused)),
+        ("remove_duplicates", "remove duplicates")
+    ]
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "data.parquet")
+        frame.to_parquet(path)
+        print(f"{args.rows} rows, {frame.shape[1]} columns, {len(unused)} dropped, "
+              f"1 of {args.regions} regions kept")
+        print(f"{'plan':>10} {'time (s)':>9} {'cells transformed':>18}  order")
+        for name, optimize in [("prompt", False), ("optimized", True)]:
+            errors = []
+            start = time.perf_counter()
+            plan, shape, _ = preprocess_in_memory(path, actions, "target", os.path.join(tmp, f"{name}.parquet"),
+                                                  errors.append, plan_options={"optimize": optimize})
+            elapsed = time.perf_counter() - start
+            assert not errors, errors
+            cells = sum(step["metrics"]["rows_in"] * step["metrics"]["columns_in"] for step in plan["steps"])
+            order = ", ".join(step["op"] for step in plan["steps"])
+            print(f"{name:>10} {elapsed:>9.3f} {cells:>18,}  {order}")
+            results[name] = pd.read_parquet(os.path.join(tmp, f"{name}.parquet"))
+
+    pd.testing.assert_frame_equal(results["prompt"], results["optimized"])
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Column profile of a CSV: full pandas load with describe/nunique/value_counts vs the chunked profile pass and its cache.
+
+    python benchmarks/bench_profile.py [--rows 1000000] [--columns 20]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dataset_profile import profile_dataset
+from preprocessor_metrics import peak_rss, reset_peak_rss
+
+def pandas_profile(path):
+    frame = pd.read_csv(path)
+    frame.describe()
+    frame.isna().sum()
+    frame.nunique()
+    for col in frame.columns:
+        frame[col].value_counts().head(5)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--columns", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    data = {}
+    for i in range(args.columns):
+        if i % 4 == 0:
+            data[f"category_{i:03d}"] = rng.choice(["red", "green", "blue", "yellow", None], args.rows)
+        elif i % 4 == 1:
+            data[f"count_{i:03d}"] = rng.integers(0, 1000, args.rows)
+        else:
+            values = rng.normal(size=args.rows)
+            values[rng.random(args.rows) < 0.05] = np.nan
+            data[f"measure_{i:03d}"] = values
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "data.csv")
+        pd.DataFrame(data).to_csv(path, index=False)
+        print(f"{args.rows} rows, {args.columns} columns, {os.path.getsize(path) / 2 ** 20:.0f} MB")
+        print(f"{'method':>22} {'time (s)':>9} {'peak RSS (MB)':>14}")
+        for name, run in [
+            ("pandas load + stats", lambda: pandas_profile(path)),
+            ("profile (one pass)", lambda: profile_dataset(path, cache_dir=tmp)),
+            ("profile (cached)", lambda: profile_dataset(path, cache_dir=tmp))
+        ]:
+            reset_peak_rss()
+            start = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - start
+            peak = peak_rss()
+            print(f"{name:>22} {elapsed:>9.3f} {peak / 2 ** 20 if peak else float('nan'):>14.0f}")
+
+if __name__ == "__main__":
+    main()
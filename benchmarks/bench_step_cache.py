@@ -0,0 +1,64 @@
+"""
+Re-running a job with one more prompt at the end: without the step cache, first run storing its stages, and the resumed run.
+
+    python benchmarks/bench_step_cache.py [--rows 1000000] [--columns 20]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from preprocessor import preprocess_in_memory
+from step_cache import open_step_cache
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--columns", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    data = {f"feature_{i:03d}": rng.normal(size=args.rows) for i in range(args.columns)}
+    for values in list(data.values())[::3]:
+        values[rng.random(args.rows) < 0.05] = np.nan
+    data["segment"] = rng.choice(["retail", "online", "partner", "direct"], args.rows)
+    data["target"] = rng.choice(["yes", "no"], args.rows)
+
+    actions = [
+        ("fill_missing_median", "fill missing values with the median"),
+        ("standardize_columns", "standardize the numeric columns"),
+        ("encode_categorical", "encode segment"),
+        ("remove_duplicates", "remove duplicates")
+    ]
+    extended = actions + [("normalize_columns", "normalize feature_000")]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "data.csv")
+        pd.DataFrame(data).to_csv(path, index=False)
+        # The first call picks the directory of the process-wide cache
+        open_step_cache(os.path.join(tmp, "cache"))
+        print(f"{args.rows} rows, {len(data)} columns")
+        print(f"{'run':>26} {'time (s)':>9} {'steps reused':>13}")
+        outputs = []
+        for name, run_actions, options in [
+            ("no cache", extended, {"step_cache": False}),
+            ("first run (stores)", actions, {"step_cache": True}),
+            ("one prompt added", extended, {"step_cache": True})
+        ]:
+            errors = []
+            output = os.path.join(tmp, f"out_{len(outputs)}.parquet")
+            start = time.perf_counter()
+            plan, _, _ = preprocess_in_memory(path, run_actions, "target", output, errors.append, plan_options=options)
+            elapsed = time.perf_counter() - start
+            assert not errors, errors
+            reused = plan.get("step_cache", {}).get("resumed_after_steps", 0)
+            print(f"{name:>26} {elapsed:>9.3f} {reused:>13}")
+            outputs.append(pd.read_parquet(output))
+        pd.testing.assert_frame_equal(outputs[0], outputs[2])
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Time, memory and written file size of the target encodings (dense one-hot, sparse one-hot, label codes) by number of classes.
+
+    python benchmarks/bench_target_encoding.py [--rows 200000] [--classes 10 1000 5000] [--format csv|parquet]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from preprocessor_io import DEFAULT_EXTENSIONS, write_dataset
+from preprocessor_ops import OPS, new_step
+
+def encode(frame, encoding):
+    op = OPS["encode_target"]
+    step = new_step("encode_target", "target")
+    op.resolve(step, frame, {"target_column": "target", "columns": list(frame.columns),
+                             "options": {"target_encoding": encoding}})
+    state = op.new_state(step)
+    op.update(state, frame, step)
+    step["params"] = op.finalize(state, step)
+    return op.transform(frame.copy(), step, op.start_pass(step))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--classes", type=int, nargs="+", default=[10, 1000, 5000])
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    path = os.path.join(tempfile.mkdtemp(), "encoded" + DEFAULT_EXTENSIONS[args.format])
+    print(f"{'classes':>8} {'encoding':>9} {'time (s)':>9} {'memory (MB)':>12} {'columns':>8} "
+          f"{'write (s)':>10} {'file (MB)':>10}")
+    for classes in args.classes:
+        labels = np.array([f"class_{i}" for i in range(classes)], dtype=object)
+        frame = pd.DataFrame({"x": rng.normal(size=args.rows), "target": labels[rng.integers(0, classes, args.rows)]})
+        for encoding in ["onehot", "sparse", "label"]:
+            start = time.perf_counter()
+            result = encode(frame, encoding)
+            elapsed = time.perf_counter() - start
+            memory = result.memory_usage(index=False, deep=True).sum() / 2**20
+            start = time.perf_counter()
+            write_dataset(result, path, args.format)
+            written = time.perf_counter() - start
+            size = os.path.getsize(path) / 2**20
+            os.remove(path)
+            print(f"{classes:>8} {encoding:>9} {elapsed:>9.3f} {memory:>12.1f} {result.shape[1]:>8} "
+                  f"{written:>10.3f} {size:>10.1f}")
+    os.rmdir(os.path.dirname(path))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+fix_data_types conversions: astype and to_datetime without a format vs the coercion engine, on clean and dirty columns.
+
+    python benchmarks/bench_type_coercion.py [--rows 1000000] [--dirty 0.001]
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from preprocessor_coerce import coerce_column, infer_datetime_format
+
+def old_convert(values, dtype):
+    if dtype == "datetime":
+        return pd.to_datetime(values, errors="coerce")
+    return values.astype({"int": int, "float": float, "str": str}[dtype])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--dirty", type=float, default=0.001, help="share of unparseable values in the dirty columns")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    # Day-first dates; a format guessed from the first value alone may take them for month-first
+    dates = pd.Timestamp("2015-01-01") + pd.to_timedelta(rng.integers(0, 3650, args.rows), unit="D")
+    columns = {
+        "int": pd.Series(rng.integers(0, 10 ** 6, args.rows).astype(str)),
+        "float": pd.Series(rng.normal(size=args.rows).round(4).astype(str)),
+        "datetime": pd.Series(dates.strftime("%d/%m/%Y"))
+    }
+    print(f"{args.rows} rows")
+    print(f"{'column':>16} {'old (s)':>9} {'old missing':>12} {'new (s)':>9} {'new missing':>12}")
+    for dirty in (False, True):
+        for dtype, values in columns.items():
+            if dirty:
+                values = values.copy()
+                values[rng.random(args.rows) < args.dirty] = "bad value"
+            start = time.perf_counter()
+            try:
+                missing = int(old_convert(values, dtype).isna().sum())
+                old = f"{time.perf_counter() - start:>9.3f} {missing:>12}"
+            except (TypeError, ValueError):
+                old = f"{'fails':>9} {'':>12}"
+            start = time.perf_counter()
+            date_format = infer_datetime_format(values) if dtype == "datetime" else None
+            result, _ = coerce_column(values, dtype, date_format)
+            new = time.perf_counter() - start
+            name = f"{dtype}{' (dirty)' if dirty else ''}"
+            print(f"{name:>16} {old} {new:>9.3f} {int(result.isna().sum()):>12}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+from intent_cache import DEFAULT_CACHE_DIR
+from preprocessor_coerce import infer_datetime_format
+from preprocessor_dedup import hash_columns
+from preprocessor_io import detect_format, iter_dataset_chunks
+from preprocessor_sketch import DistinctSketch, TopValues
+from preprocessor_stream import DEFAULT_CHUNKSIZE
+from step_cache import file_fingerprint
+
+# Column summary of a dataset, shown to users before they write prompts.
+# One pass over the file in chunks gives, per column, its dtype, missing
+# values, distinct values (exact up to EXACT_DISTINCT, then a HyperLogLog
+# estimate), min/max/mean of numbers and dates, and the most frequent values
+# (see preprocessor_sketch.py), so memory stays bounded on any file size.
+# Profiles are cached as JSON files keyed by the content hash of the file.
+
+TOP_VALUES = 5
+# Values of a text column its date format is inferred from
+DATE_SAMPLE = 10000
+MAX_CACHED_PROFILES = 256
+
+def merge_dtype(seen, dtype):
+    """
+    The dtype a column has over all chunks: chunks of a CSV column can be
+    read as int64 in one and float64 or object in another.
+    """
+    if seen is None or seen == dtype:
+        return dtype
+    if pd.api.types.is_numeric_dtype(seen) and pd.api.types.is_numeric_dtype(dtype) and \
+            not pd.api.types.is_bool_dtype(seen) and not pd.api.types.is_bool_dtype(dtype):
+        return np.dtype(np.float64)
+    return np.dtype(object)
+
+def column_kind(dtype):
+    if dtype is None:
+        return "empty"
+    if pd.api.types.is_bool_dtype(dtype):
+        return "boolean"
+    if pd.api.types.is_numeric_dtype(dtype):
+        return "numeric"
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return "datetime"
+    return "text"
+
+def plain(value):
+    """
+    value as something JSON can hold.
+    """
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    return str(value)
+
+class ColumnProfile:
+    def __init__(self, name):
+        self.name = name
+        self.dtype = None
+        self.count = 0
+        self.nulls = 0
+        self.distinct = DistinctSketch()
+        self.top = TopValues()
+        self.minimum = None
+        self.maximum = None
+        self.total = 0.0
+        self.numbers = 0
+        self.date_format = None
+        self.date_checked = False
+
+    def update(self, values):
+        self.count += len(values)
+        present = values.dropna()
+        self.nulls += len(values) - len(present)
+        if present.empty:
+            return
+        self.dtype = merge_dtype(self.dtype, present.dtype)
+        # Numbers normalized, so int64 and float64 chunks of one column agree
+        self.distinct.update(hash_columns(present.to_frame()))
+        self.top.update(present)
+        kind = column_kind(present.dtype)
+        if kind in ("numeric", "boolean", "datetime"):
+            low, high = present.min(), present.max()
+            self.minimum = low if self.minimum is None else min(self.minimum, low)
+            self.maximum = high if self.maximum is None else max(self.maximum, high)
+        if kind in ("numeric", "boolean"):
+            self.total += float(present.astype(np.float64).sum())
+            self.numbers += len(present)
+        elif kind == "text" and not self.date_checked:
+            # From the first values only, as fix_data_types does
+            self.date_format = infer_datetime_format(present.iloc[:DATE_SAMPLE])
+            self.date_checked = True
+
+    def report(self, top=TOP_VALUES):
+        kind = column_kind(self.dtype)
+        report = {
+            "name": self.name,
+            "dtype": str(self.dtype) if self.dtype is not None else None,
+            "kind": kind,
+            "nulls": self.nulls,
+            "null_share": round(self.nulls / self.count, 4) if self.count else 0.0,
+            "distinct": self.distinct.count(),
+            "distinct_exact": self.distinct.is_exact(),
+            "top": [{"value": plain(value), "count": count} for value, count in self.top.top(top)],
+            # Largest amount by which a top count can be too low
+            "top_error": self.top.max_dropped
+        }
+        if self.minimum is not None and kind != "text":
+            report["min"] = plain(self.minimum)
+            report["max"] = plain(self.maximum)
+        if self.numbers:
+            report["mean"] = self.total / self.numbers
+        if kind == "text" and self.date_format:
+            report["date_format"] = self.date_format
+        return report
+
+def build_profile(path, input_format=None, chunksize=DEFAULT_CHUNKSIZE, top=TOP_VALUES):
+    started = time.perf_counter()
+    columns = None
+    rows = 0
+    for chunk in iter_dataset_chunks(path, chunksize, input_format):
+        if columns is None:
+            columns = [ColumnProfile(name) for name in chunk.columns]
+        rows += len(chunk)
+        for column in columns:
+            column.update(chunk[column.name])
+    return {
+        "path": path,
+        "format": detect_format(path, input_format),
+        "rows": rows,
+        "columns": [column.report(top) for column in columns or []],
+        "seconds": round(time.perf_counter() - started, 3)
+    }
+
+def profile_path(cache_dir, path, input_format, top):
+    settings = json.dumps({"format": detect_format(path, input_format), "top": top}, sort_keys=True)
+    key = hashlib.sha256((file_fingerprint(path) + "\0" + settings).encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir, "profiles", key + ".json")
+
+def prune_profiles(directory, keep=MAX_CACHED_PROFILES):
+    paths = [os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".json")]
+    if len(paths) <= keep:
+        return
+    for path in sorted(paths, key=os.path.getmtime)[:len(paths) - keep]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def profile_dataset(path, input_format=None, chunksize=DEFAULT_CHUNKSIZE, top=TOP_VALUES,
+                    cache_dir=DEFAULT_CACHE_DIR, use_cache=True):
+    """
+    Column summary of the dataset at path: {"path", "format", "rows",
+    "columns": [{"name", "dtype", "kind", "nulls", "null_share", "distinct",
+    "distinct_exact", "top", "top_error", "min", "max", "mean",
+    "date_format"}], "seconds", "cached"}. min/max/mean are only given for
+    numbers and dates, date_format for text columns mostly holding dates
+    in one format. A profile of the same file content is read from the cache
+    unless use_cache is False or PREPROCESSOR_CACHE=0.
+    """
+    use_cache = use_cache and os.environ.get("PREPROCESSOR_CACHE", "1") != "0"
+    cached = profile_path(cache_dir, path, input_format, top) if use_cache else None
+    if cached is not None:
+        try:
+            with open(cached, encoding="utf-8") as f:
+                profile = json.load(f)
+            os.utime(cached)
+            return {**profile, "path": path, "cached": True}
+        except (OSError, ValueError):
+            pass
+
+    profile = build_profile(path, input_format, chunksize, top)
+    if cached is not None:
+        try:
+            os.makedirs(os.path.dirname(cached), exist_ok=True)
+            tmp_path = f"{cached}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(profile, f)
+            os.replace(tmp_path, cached)
+            prune_profiles(os.path.dirname(cached))
+        except OSError:
+            pass
+    return {**profile, "cached": False}
+
+def short(value):
+    return f"{value:.4g}" if isinstance(value, float) else str(value)
+
+def describe_column(column):
+    parts = [column["dtype"] or "empty"]
+    if column["nulls"]:
+        parts.append(f"{column['null_share']:.1%} missing")
+    parts.append(f"{'' if column['distinct_exact'] else '~'}{column['distinct']} distinct")
+    if "mean" in column:
+        parts.append(f"{short(column['min'])} to {short(column['max'])}, mean {column['mean']:.4g}")
+    elif "min" in column:
+        parts.append(f"{short(column['min'])} to {short(column['max'])}")
+    elif column["top"]:
+        parts.append("top: " + ", ".join(str(item["value"]) for item in column["top"][:3]))
+    if column.get("date_format"):
+        parts.append(f"dates ({column['date_format']})")
+    return f"{column['name']}: " + "; ".join(parts)
+
+def format_profile(profile):
+    """
+    One line per column, after a line with the table size.
+    """
+    lines = [f"{profile['rows']} rows, {len(profile['columns'])} columns"]
+    lines.extend(describe_column(column) for column in profile["columns"])
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    # python dataset_profile.py <dataset> [--json] [--no-cache]
+    parser = argparse.ArgumentParser(description="Summarize the columns of a dataset")
+    parser.add_argument("dataset")
+    parser.add_argument("--json", action="store_true", help="print the profile as JSON")
+    parser.add_argument("--no-cache", action="store_true")
+    args = parser.parse_args()
+    result = profile_dataset(args.dataset, use_cache=not args.no_cache)
+    print(json.dumps(result, indent=2) if args.json else format_profile(result))
@@ -0,0 +1,111 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import numpy as np
+
+DEFAULT_CACHE_DIR = os.environ.get("PREPROCESSOR_CACHE_DIR", ".preprocessor_cache")
+DEFAULT_MAX_BYTES = int(os.environ.get("PREPROCESSOR_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+def text_key(kind, model_name, text, namespace=""):
+    """
+    Content address of a cached vector: the kind of entry, the model that
+    produced it, an optional namespace (e.g. the label set) and the text.
+    """
+    raw = "\0".join([kind, model_name, namespace, text])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def labels_fingerprint(labels):
+    return hashlib.sha256("\0".join(labels).encode("utf-8")).hexdigest()[:16]
+
+class IntentCache:
+    """
+    Persistent, size-capped LRU store of float32 vectors keyed by content hash.
+    Used for candidate label embeddings ("label_emb") and for the per-prompt
+    label score vectors ("prompt_scores") so repeated prompts skip the model.
+    """
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS vectors ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS vectors_last_access ON vectors (last_access)")
+        self.conn.commit()
+
+    def get_vectors(self, kind, model_name, texts, namespace=""):
+        """
+        Return a list aligned with texts holding a cached vector or None.
+        """
+        keys = [text_key(kind, model_name, t, namespace) for t in texts]
+        found = {}
+        with self.lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self.conn.execute(
+                    f"SELECT key, value FROM vectors WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                self.conn.executemany("UPDATE vectors SET last_access = ? WHERE key = ?",
+                                      [(now, k) for k in found])
+                self.conn.commit()
+        return [np.frombuffer(found[k], dtype=np.float32) if k in found else None for k in keys]
+
+    def put_vectors(self, kind, model_name, texts, vectors, namespace=""):
+        now = time.time()
+        rows = []
+        for text, vector in zip(texts, vectors):
+            value = np.asarray(vector, dtype=np.float32).tobytes()
+            rows.append((text_key(kind, model_name, text, namespace), value, len(value), now))
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO vectors (key, value, size, last_access) VALUES (?, ?, ?, ?)", rows
+            )
+            self.conn.commit()
+            self.evict()
+
+    def evict(self):
+        """
+        Drop least recently used entries until the cache fits in max_bytes.
+        Callers must hold self.lock.
+        """
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM vectors").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        stale = []
+        for key, size in self.conn.execute("SELECT key, size FROM vectors ORDER BY last_access"):
+            if total <= self.max_bytes:
+                break
+            stale.append((key,))
+            total -= size
+        self.conn.executemany("DELETE FROM vectors WHERE key = ?", stale)
+        self.conn.commit()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+_default_cache = None
+
+def open_intent_cache(cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+    """
+    Return the process-wide cache, or None when disabled with PREPROCESSOR_CACHE=0.
+    """
+    global _default_cache
+    if os.environ.get("PREPROCESSOR_CACHE", "1") == "0":
+        return None
+    if _default_cache is None:
+        try:
+            _default_cache = IntentCache(os.path.join(cache_dir, "intent_cache.sqlite"), max_bytes)
+        except (OSError, sqlite3.Error):
+            return None
+    return _default_cache
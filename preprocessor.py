@@ -1,171 +1,190 @@
 import json
-import pandas as pd
+import re
+import sys
+import threading
+import time
+import numpy as np
 import os
-import glob
-from sentence_transformers import SentenceTransformer, util
-from sklearn.preprocessing import StandardScaler, MinMaxScaler, LabelEncoder, OneHotEncoder
-from sklearn.decomposition import PCA
-
-def log_error(e, log_file):
+from intent_cache import open_intent_cache, labels_fingerprint
+from preprocessor_ops import INTENT_OPS, new_step
+from preprocessor_plan import (compile_plan, load_pipeline, plan_summary, prunable_columns, pushdown_filters, run_plan,
+                               save_pipeline)
+from preprocessor_log import JobLog, open_event_sink
+from preprocessor_io import output_path_for, read_columns, read_dataset, write_dataset
+from preprocessor_schema import compact_frame, load_report, load_schema, prepare_load, prune_row_groups
+from preprocessor_stream import DEFAULT_CHUNKSIZE, apply_plan_to_file, should_stream, stream_preprocess
+from step_cache import ENABLED_BY_DEFAULT as STEP_CACHE_BY_DEFAULT, open_step_cache, prefix_keys, restore_steps
+
+# sentence_transformers (torch) and sklearn are imported inside the functions
+# that need them, so jobs that never hit those paths don't pay their import cost.
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+
+# Candidate intent labels, in the order the handlers are mapped
+CANDIDATE_LABELS = [
+    "drop columns from dataset",
+    "fill missing values with mean imputation",
+    "fill missing values with median imputation",
+    "fill missing values with mode imputation",
+    "remove duplicate rows",
+    "convert or change data types of columns",
+    "standardize numeric columns using z-score scaling",
+    "normalize numeric columns to range 0 to 1",
+    "encode categorical columns using label encoding",
+    "reduce dataset dimensions with PCA",
+    "filter dataset rows based on conditions"
+]
+
+# Keyword grammar for unambiguous prompts. Each rule is a list of patterns that
+# must all match; a prompt takes the fast path only when exactly one rule
+# matches, everything else falls back to the embedding classifier.
+_MISSING = r"\b(fill|fillna|imput\w*|missing|nan|nans|null|nulls|empty)\b"
+INTENT_RULES = [
+    ("drop columns from dataset", [r"^\s*(drop|delete)\b(?!.*\b(rows?|duplicates?|duplicated|na|nan|nulls?|missing)\b)"]),
+    ("fill missing values with mean imputation", [_MISSING, r"\b(mean|average|avg)\b"]),
+    ("fill missing values with median imputation", [_MISSING, r"\bmedian\b"]),
+    ("fill missing values with mode imputation", [_MISSING, r"\b(mode|most (frequent|common))\b"]),
+    ("remove duplicate rows", [r"\b(dedup\w*|duplicates?|duplicated)\b"]),
+    ("convert or change data types of columns", [r"\bto (int|integer|float|str|string|date|datetime)\b"]),
+    ("standardize numeric columns using z-score scaling", [r"\b(standardi[sz]\w*|z-?score|standard scal\w*)\b"]),
+    ("normalize numeric columns to range 0 to 1", [r"\b(normali[sz]\w*|min-?max)\b"]),
+    ("encode categorical columns using label encoding", [r"\b(encode|encoding|label[- ]?encod\w*)\b"]),
+    ("reduce dataset dimensions with PCA", [r"\b(pca|principal components?|dimensionality reduction|reduce (the )?dimensions?)\b"]),
+    # Rows "with missing values" / "with empty email" are not query conditions; the embedder takes those
+    ("filter dataset rows based on conditions", [r"^(?!.*\b(missing|empty|blank|nulls?|nan|nans|na|none)\b)"
+                                                 r"(\s*(`[^`]+`|\w+)\s*(==|!=|>=|<=|>|<)\s*\S+"
+                                                 r"|\s*(please\s+)?(filter|keep|select|show|only|remove|drop|exclude|delete|discard)\b"
+                                                 r".*\b(rows?|records?|entries|samples)\s+(where|whose|with|if|when|having)\b)"]),
+]
+COMPILED_INTENT_RULES = [(label, [re.compile(p, re.IGNORECASE) for p in patterns]) for label, patterns in INTENT_RULES]
+
+# Process-wide counters of how prompts were resolved (shared by worker threads)
+intent_stats = {"fast_path": 0, "embedder": 0}
+intent_stats_lock = threading.Lock()
+
+def log_error(e, log):
+    """
+    Record an error in a JobLog. A plain file path (older callers of the
+    per-operation functions below) gets the error appended as a JSON line.
+    """
+    if isinstance(log, JobLog):
+        log.error(e)
+        return
     try:
-        with open(log_file, "a") as f:
+        with open(log, "a") as f:
             json.dump({"error": str(e)}, f)
             f.write("\n")
-    except:
+    except OSError:
         pass
 
-def extract_columns_from_text(user_input, columns):
-    lower_input = user_input.lower()
-    return [col for col in columns if col.lower() in lower_input]
+def run_step(op_name, user_input, dataset, target_column, columns, log_file):
+    """
+    Run a single operation as a one-step plan on an in-memory dataset.
+    """
+    plan = {"target_column": target_column, "columns": columns, "steps": [new_step(op_name, user_input)]}
+    return run_plan(dataset, plan, lambda e: log_error(e, log_file))
 
 def drop_columns(user_input, dataset, target_column, columns, log_file):
-    try:
-        cols = extract_columns_from_text(user_input, columns)
-        cols = [c for c in cols if c != target_column]
-        if cols:
-            dataset.drop(columns=cols, inplace=True)
-    except Exception as e:
-        log_error(e, log_file)
-    return dataset
+    return run_step("drop_columns", user_input, dataset, target_column, columns, log_file)
 
 def fill_missing_mean(user_input, dataset, target_column, columns, log_file):
-    try:
-        cols = extract_columns_from_text(user_input, columns)
-        if not cols:
-            cols = dataset.select_dtypes(include="number").columns.tolist()
-            if target_column in cols:
-                cols.remove(target_column)
-        dataset[cols] = dataset[cols].fillna(dataset[cols].mean())
-    except Exception as e:
-        log_error(e, log_file)
-    return dataset
+    return run_step("fill_missing_mean", user_input, dataset, target_column, columns, log_file)
 
 def fill_missing_median(user_input, dataset, target_column, columns, log_file):
-    try:
-        cols = extract_columns_from_text(user_input, columns)
-        if not cols:
-            cols = dataset.select_dtypes(include="number").columns.tolist()
-            if target_column in cols:
-                cols.remove(target_column)
-        dataset[cols] = dataset[cols].fillna(dataset[cols].median())
-    except Exception as e:
-        log_error(e, log_file)
-    return dataset
+    return run_step("fill_missing_median", user_input, dataset, target_column, columns, log_file)
 
 def fill_missing_mode(user_input, dataset, target_column, columns, log_file):
-    try:
-        cols = extract_columns_from_text(user_input, columns)
-        if not cols:
-            cols = dataset.select_dtypes(include=["object", "category", "string"]).columns.tolist()
-            if target_column in cols:
-                cols.remove(target_column)
-        for col in cols:
-            if len(dataset[col].mode()) > 0:
-                dataset[col].fillna(dataset[col].mode()[0], inplace=True)
-    except Exception as e:
-        log_error(e, log_file)
-    return dataset
+    return run_step("fill_missing_mode", user_input, dataset, target_column, columns, log_file)
 
 def remove_duplicates(user_input, dataset, log_file):
-    try:
-        dataset.drop_duplicates(inplace=True)
-    except Exception as e:
-        log_error(e, log_file)
-    return dataset
+    return run_step("remove_duplicates", user_input, dataset, None, list(dataset.columns), log_file)
 
 def fix_data_types(user_input, dataset, columns, log_file):
-    try:
-        dtype_dict = {}
-        user_lower = user_input.lower()
-        for col in columns:
-            if f"{col} to int" in user_lower:
-                dtype_dict[col] = int
-            elif f"{col} to float" in user_lower:
-                dtype_dict[col] = float
-            elif f"{col} to str" in user_lower:
-                dtype_dict[col] = str
-            elif f"{col} to date" in user_lower or f"{col} to datetime" in user_lower:
-                dtype_dict[col] = "datetime"
-
-        for col, dtype in dtype_dict.items():
-            if dtype == "datetime":
-                dataset[col] = pd.to_datetime(dataset[col], errors="coerce")
-            else:
-                dataset[col] = dataset[col].astype(dtype)
-    except Exception as e:
-        log_error(e, log_file)
-    return dataset
+    return run_step("fix_data_types", user_input, dataset, None, columns, log_file)
 
 def standardize_columns(user_input, dataset, target_column, columns, log_file):
-    try:
-        cols = extract_columns_from_text(user_input, columns)
-        if not cols:
-            cols = dataset.select_dtypes(include="number").columns.tolist()
-            if target_column in cols:
-                cols.remove(target_column)
-        scaler = StandardScaler()
-        dataset[cols] = scaler.fit_transform(dataset[cols])
-    except Exception as e:
-        log_error(e, log_file)
-    return dataset
+    return run_step("standardize_columns", user_input, dataset, target_column, columns, log_file)
 
 def normalize_columns(user_input, dataset, target_column, columns, log_file):
-    try:
-        cols = extract_columns_from_text(user_input, columns)
-        if not cols:
-            cols = dataset.select_dtypes(include="number").columns.tolist()
-            if target_column in cols:
-                cols.remove(target_column)
-        scaler = MinMaxScaler()
-        dataset[cols] = scaler.fit_transform(dataset[cols])
-    except Exception as e:
-        log_error(e, log_file)
-    return dataset
+    return run_step("normalize_columns", user_input, dataset, target_column, columns, log_file)
 
 def encode_categorical(user_input, dataset, target_column, columns, log_file):
-    try:
-        cols = extract_columns_from_text(user_input, columns)
-        if not cols:
-            cols = dataset.select_dtypes(include=["object", "category", "string"]).columns.tolist()
-            if target_column in cols:
-                cols.remove(target_column)
-        cols = [c for c in cols if c in dataset.columns]
-        for col in cols:
-            le = LabelEncoder()
-            dataset[col] = le.fit_transform(dataset[col].astype(str))
-    except Exception as e:
-        log_error(e, log_file)
-    return dataset
+    return run_step("encode_categorical", user_input, dataset, target_column, columns, log_file)
 
 def reduce_dimensions(user_input, dataset, target_column, columns, log_file):
-    try:
-        cols = extract_columns_from_text(user_input, columns)
-        numeric_cols = [col for col in cols if col in dataset.select_dtypes(include="number").columns]
-
-        if not numeric_cols:
-            numeric_cols = dataset.select_dtypes(include="number").columns.tolist()
-            if target_column in numeric_cols:
-                numeric_cols.remove(target_column)
+    return run_step("reduce_dimensions", user_input, dataset, target_column, columns, log_file)
 
-        n_components = 2
-        pca = PCA(n_components=n_components)
-        reduced = pca.fit_transform(dataset[numeric_cols])
+def filter_rows(user_input, dataset, log_file):
+    return run_step("filter_rows", user_input, dataset, None, list(dataset.columns), log_file)
 
-        for i in range(n_components):
-            dataset[f"PCA_{i+1}"] = reduced[:, i]
-    except Exception as e:
-        log_error(e, log_file)
-    return dataset
+def match_intent_rule(user_input):
+    """
+    Resolve a prompt with the keyword grammar. Returns the label when exactly
+    one rule matches, otherwise None.
+    """
+    matches = [label for label, patterns in COMPILED_INTENT_RULES
+               if all(p.search(user_input) for p in patterns)]
+    return matches[0] if len(matches) == 1 else None
+
+def get_intent_stats():
+    with intent_stats_lock:
+        total = intent_stats["fast_path"] + intent_stats["embedder"]
+        return {
+            "fast_path": intent_stats["fast_path"],
+            "embedder": intent_stats["embedder"],
+            "fast_path_hit_rate": intent_stats["fast_path"] / total if total else 0.0
+        }
 
-def filter_rows(user_input, dataset, log_file):
-    try:
-        filtered_df = dataset.query(user_input)
-        dataset = filtered_df.copy()
-    except Exception as e:
-        log_error(e, log_file)
-    return dataset
+def classify_batch(user_inputs, embedder, label_embs, candidate_labels=CANDIDATE_LABELS, top_k=None,
+                   cache=None, model_name=MODEL_NAME):
+    """
+    Classify many prompts with a single encoder call. Scores for all prompts
+    are computed as one (prompts x labels) similarity matrix and ranked with a
+    vectorized argsort; only the top_k labels are returned when it is given.
+    Prompts already scored in the cache skip the model, and the embedder is
+    only loaded (when None) if at least one prompt misses the cache.
+    """
+    if not user_inputs:
+        return []
+
+    namespace = labels_fingerprint(candidate_labels)
+    rows = [None] * len(user_inputs)
+    if cache is not None:
+        rows = cache.get_vectors("prompt_scores", model_name, user_inputs, namespace)
+
+    missing = [i for i, row in enumerate(rows) if row is None]
+    if missing:
+        if embedder is None or label_embs is None:
+            embedder, label_embs = load_classifier(model_name, candidate_labels, cache)
+        from sentence_transformers import util
+        missing_inputs = [user_inputs[i] for i in missing]
+        input_embs = embedder.encode(missing_inputs, convert_to_tensor=True)
+        cos_scores = util.cos_sim(input_embs, label_embs)
+        if hasattr(cos_scores, "cpu"):
+            cos_scores = cos_scores.cpu().numpy()
+        cos_scores = np.asarray(cos_scores, dtype=np.float32)
+        for i, row in zip(missing, cos_scores):
+            rows[i] = row
+        if cache is not None:
+            cache.put_vectors("prompt_scores", model_name, missing_inputs, cos_scores, namespace)
+
+    cos_scores = np.vstack(rows)
+    order = np.argsort(-cos_scores, axis=1, kind="stable")
+    if top_k is not None:
+        order = order[:, :top_k]
+    top_scores = np.take_along_axis(cos_scores, order, axis=1)
+
+    return [
+        {
+            "sequence": user_input,
+            "labels": [candidate_labels[j] for j in label_idx],
+            "scores": scores.tolist()
+        }
+        for user_input, label_idx, scores in zip(user_inputs, order, top_scores)
+    ]
 
 def classifier(user_input, candidate_labels, embedder, label_embs):
+    from sentence_transformers import util
     input_emb = embedder.encode(user_input, convert_to_tensor=True)
     cos_scores = util.cos_sim(input_emb, label_embs)[0]
     scores = cos_scores.tolist()
@@ -182,146 +201,309 @@ def classifier(user_input, candidate_labels, embedder, label_embs):
     }
     return result
 
-def preprocess_dataset(input_file_path="sampleinput.json", output_csv="Processed_Dataset.csv", log_file="Output.json"):
+def load_classifier(model_name=MODEL_NAME, candidate_labels=CANDIDATE_LABELS, cache=None):
     """
-    Main function to preprocess dataset based on input configuration
+    Load the sentence embedder and pre-encode the candidate labels.
+    Long-lived callers (see preprocessor_worker.py) keep the result warm
+    and pass it to preprocess_dataset so the model is only loaded once.
+    Label embeddings found in the cache are not re-encoded.
     """
-    # Load configuration
+    from sentence_transformers import SentenceTransformer
+    embedder = SentenceTransformer(model_name)
+    label_embs = [None] * len(candidate_labels)
+    if cache is not None:
+        label_embs = cache.get_vectors("label_emb", model_name, candidate_labels)
+
+    missing = [i for i, emb in enumerate(label_embs) if emb is None]
+    if missing:
+        missing_labels = [candidate_labels[i] for i in missing]
+        encoded = np.asarray(embedder.encode(missing_labels), dtype=np.float32)
+        for i, emb in zip(missing, encoded):
+            label_embs[i] = emb
+        if cache is not None:
+            cache.put_vectors("label_emb", model_name, missing_labels, encoded)
+
+    return embedder, np.vstack(label_embs)
+
+def classify_prompts(prompts, embedder=None, label_embs=None, classify_fn=None):
+    """
+    Resolve unambiguous prompts with the keyword grammar, then classify the
+    rest in one batch. The embedder is reused when the caller provides a warm
+    one and is only loaded here if some prompt is not in the intent cache.
+    Returns (results, intent_resolution counts). Every result has its
+    "latency" in seconds; prompts classified in one batch share its time.
+    """
+    results = [None] * len(prompts)
+    for i, user_input in enumerate(prompts):
+        started = time.perf_counter()
+        label = match_intent_rule(user_input)
+        if label is not None:
+            results[i] = {"sequence": user_input, "labels": [label], "scores": [1.0], "source": "rule",
+                          "latency": time.perf_counter() - started}
+
+    fallback = [i for i, result in enumerate(results) if result is None]
+    fallback_prompts = [prompts[i] for i in fallback]
+    started = time.perf_counter()
+    if not fallback_prompts:
+        fallback_results = []
+    elif classify_fn is not None:
+        fallback_results = classify_fn(fallback_prompts)
+    else:
+        fallback_results = classify_batch(fallback_prompts, embedder, label_embs, top_k=1, cache=open_intent_cache())
+    batch_latency = (time.perf_counter() - started) / max(len(fallback_prompts), 1)
+    for i, result in zip(fallback, fallback_results):
+        results[i] = {"source": "embedder", **result, "latency": batch_latency}
+
+    intent_resolution = {"fast_path": len(prompts) - len(fallback), "embedder": len(fallback)}
+    with intent_stats_lock:
+        intent_stats["fast_path"] += intent_resolution["fast_path"]
+        intent_stats["embedder"] += intent_resolution["embedder"]
+    return results, intent_resolution
+
+def resolve_plan_options(plan_options, streaming):
+    """
+    Fill in "auto" settings: quantiles are exact in memory and sketched
+    (approximate) when streaming; "workers": "auto" uses every core.
+    """
+    options = dict(plan_options or {})
+    if options.get("quantiles", "auto") == "auto":
+        options["quantiles"] = "approximate" if streaming else "exact"
+    workers = options.get("workers", 1)
+    options["workers"] = (os.cpu_count() or 1) if workers == "auto" else int(workers)
+    return options
+
+def preprocess_in_memory(dataset_path, actions, target_column, output_csv, log_error, io_options=None,
+                         plan_options=None):
+    """
+    Compile the (op name, prompt) actions into a plan, load the columns the
+    plan needs with the sniffed schema, run it and save the result. With
+    plan option "step_cache": true the frame after every stage goes to the
+    step cache (step_cache.py) and a later job sharing a prefix of the plan
+    resumes from it. Errors are passed to log_error.
+    Returns (plan, shape, columns), or None if loading or saving failed.
+    """
+    io_options = io_options or {}
+    input_format = io_options.get("input_format")
+    infer_schema = io_options.get("infer_schema", False)
+
+    # Load dataset, or the frame after the longest prefix of the plan an
+    # earlier job ran on the same file
     try:
-        with open(input_file_path) as f:
-            data = json.load(f)
+        columns = read_columns(dataset_path, input_format)
+        plan = compile_plan(actions, target_column, columns, resolve_plan_options(plan_options, streaming=False))
+        read_kwargs, schema, skipped = prepare_load(
+            dataset_path, input_format, columns, prunable_columns(plan), infer_schema
+        )
+        plan["load_schema"] = load_schema(schema)
+        prune_row_groups(dataset_path, input_format, *pushdown_filters(plan), read_kwargs)
+        cache = open_step_cache() if plan["options"].get("step_cache", STEP_CACHE_BY_DEFAULT) else None
+        keys = prefix_keys(dataset_path, read_kwargs, infer_schema, plan) if cache is not None else None
+        hit = cache.lookup(keys) if cache is not None else None
+        if hit is not None:
+            start, dataset, cached_steps, plan["load_report"] = hit
+            restore_steps(plan, cached_steps)
+        else:
+            start = 0
+            dataset = read_dataset(dataset_path, input_format, **read_kwargs)
+            if infer_schema:
+                compact_frame(dataset)
+            plan["load_report"] = load_report(schema, skipped, len(dataset), dataset)
+        if infer_schema:
+            # Columns compact_frame downcast, also when resuming from the step cache
+            float32 = [c for c, dtype in (plan["load_report"] or {}).get("dtypes", {}).items() if dtype == "float32"]
+            plan["load_schema"] = load_schema(schema, float32)
     except Exception as e:
-        log_error(e, log_file)
-        return False
+        log_error(e)
+        return None
 
-    dataset_path = data["path"]
-    target_column = data["target"]
-    threshold = 0.4
+    checkpoint = None
+    if cache is not None:
+        plan["step_cache"] = {"resumed_after_steps": start, "stored": []}
+
+        def checkpoint(end, frame):
+            if cache.store(keys[end], frame, plan["steps"][:end], plan["load_report"]):
+                plan["step_cache"]["stored"].append(end)
+
+    dataset = run_plan(dataset, plan, log_error, start, checkpoint)
 
-    # Load dataset
+    # Save processed dataset
     try:
-        dataset = pd.read_csv(dataset_path)
+        write_dataset(dataset, output_csv, io_options.get("output_format"), io_options.get("compression"))
     except Exception as e:
-        log_error(e, log_file)
-        return False
+        log_error(e)
+        return None
 
-    columns = dataset.columns.tolist()
-    numprompt = len(data) - 2
+    return plan, list(dataset.shape), list(dataset.columns)
 
-    # Initialize embedder
+def preprocess_dataset(input_file_path="sampleinput.json", output_csv="Processed_Dataset.csv", log_file="Output.json",
+                       embedder=None, label_embs=None, classify_fn=None):
+    """
+    Main function to preprocess dataset based on input configuration.
+    classify_fn, when given, replaces the local batched classifier; it takes a
+    list of prompts and returns one classification result per prompt.
+    Datasets are streamed in chunks when the configuration sets
+    "execution": "stream" or, with the default "auto", when the file is large.
+    The result and the job's events are written to log_file once, at the
+    end (see preprocessor_log.py).
+    """
+    job_started = time.perf_counter()
+    log = JobLog(log_file, sink=open_event_sink())
+    # Load configuration
+    try:
+        with open(input_file_path) as f:
+            data = json.load(f)
+        dataset_path = data["path"]
+        target_column = data["target"]
+    except Exception as e:
+        log.error(e)
+        log.fail()
+        return False
+    threshold = 0.4
+    # "event_log": path of a JSON-lines file that collects the events of every job
+    if data.get("event_log"):
+        log.sink = open_event_sink(data["event_log"])
+    log.event("job_started", input_file=input_file_path, dataset_path=dataset_path)
+
+    # Input/output formats: CSV, Parquet or Feather, by config key or extension.
+    # "infer_schema": true sniffs category and date columns and downcasts floats;
+    # by default columns keep the reader's dtypes.
+    io_options = {key: data[key] for key in ("input_format", "output_format", "compression", "infer_schema") if key in data}
+    output_csv = output_path_for(output_csv, io_options.get("output_format"))
+    # "quantiles": "exact" | "approximate" | "auto" (approximate only when streaming)
+    # "workers": processes for column-sharded in-memory stages (1, N or "auto")
+    # "copy_free": true filters rows with masks so steps never copy the whole frame
+    # "target_encoding": "auto" | "onehot" | "sparse" | "label"
+    # "optimize": false runs the steps exactly in prompt order
+    # "step_cache": true reuses and stores intermediate frames (off by default)
+    # "dedup_fingerprint": 64 | 128 bits per row fingerprint in remove_duplicates
+    plan_options = {key: data[key] for key in ("quantiles", "workers", "copy_free", "target_encoding", "optimize",
+                                               "step_cache", "dedup_fingerprint") if key in data}
+    # "profile": true (or a directory) saves a cProfile dump of every step
+    if data.get("profile"):
+        profile_dir = data["profile"] if isinstance(data["profile"], str) else os.path.splitext(output_csv)[0] + "_profile"
+        plan_options["profile_dir"] = profile_dir
+
+    numprompt = len([key for key in data if key.startswith("prompt_")])
+    prompts = [data[f"prompt_{i+1}"] for i in range(numprompt)]
+
+    started = time.perf_counter()
     try:
-        embedder = SentenceTransformer("all-MiniLM-L6-v2")
+        results, intent_resolution = classify_prompts(prompts, embedder, label_embs, classify_fn)
     except Exception as e:
-        log_error(e, log_file)
+        log.error(e)
+        log.fail()
         return False
+    classify_seconds = time.perf_counter() - started
 
-    # Define candidate labels
-    candidate_labels = [
-        "drop columns from dataset",
-        "fill missing values with mean imputation",
-        "fill missing values with median imputation",
-        "fill missing values with mode imputation",
-        "remove duplicate rows",
-        "convert or change data types of columns",
-        "standardize numeric columns using z-score scaling",
-        "normalize numeric columns to range 0 to 1",
-        "encode categorical columns using label encoding",
-        "reduce dataset dimensions with PCA",
-        "filter dataset rows based on conditions"
-    ]
-
-    # Pre-encode candidate labels
-    label_embs = embedder.encode(candidate_labels, convert_to_tensor=True)
-
-    # Intent function mapping
-    intent_function_mapping = {
-        "drop columns from dataset": lambda ui: drop_columns(ui, dataset, target_column, columns, log_file),
-        "fill missing values with mean imputation": lambda ui: fill_missing_mean(ui, dataset, target_column, columns, log_file),
-        "fill missing values with median imputation": lambda ui: fill_missing_median(ui, dataset, target_column, columns, log_file),
-        "fill missing values with mode imputation": lambda ui: fill_missing_mode(ui, dataset, target_column, columns, log_file),
-        "remove duplicate rows": lambda ui: remove_duplicates(ui, dataset, log_file),
-        "convert or change data types of columns": lambda ui: fix_data_types(ui, dataset, columns, log_file),
-        "standardize numeric columns using z-score scaling": lambda ui: standardize_columns(ui, dataset, target_column, columns, log_file),
-        "normalize numeric columns to range 0 to 1": lambda ui: normalize_columns(ui, dataset, target_column, columns, log_file),
-        "encode categorical columns using label encoding": lambda ui: encode_categorical(ui, dataset, target_column, columns, log_file),
-        "reduce dataset dimensions with PCA": lambda ui: reduce_dimensions(ui, dataset, target_column, columns, log_file),
-        "filter dataset rows based on conditions": lambda ui: filter_rows(ui, dataset, log_file)
-    }
-
-    # Process prompts
-    for i in range(numprompt):
-        user_input = data[f"prompt_{i+1}"]
-        result = classifier(user_input, candidate_labels, embedder, label_embs)
-        action = result['labels'][0]
+    actions = []
+    for user_input, result in zip(prompts, results):
         if result['scores'][0] >= threshold:
-            dataset = intent_function_mapping[action](user_input)
+            intent = {
+                "label": result['labels'][0],
+                "score": float(result['scores'][0]),
+                "source": result.get("source"),
+                "classify_seconds": result.get("latency")
+            }
+            actions.append((INTENT_OPS[result['labels'][0]], user_input, intent))
+            log.event("prompt_classified", prompt=user_input, **intent)
         else:
-            log_error(f"Unrecognized prompt: {user_input}", log_file)
+            log.error(f"Unrecognized prompt: {user_input}", prompt=user_input)
 
-    # Handle target column - create dummy variables
-    if target_column in dataset.columns:
+    if should_stream(data, dataset_path):
         try:
-            target_dummies = pd.get_dummies(dataset[target_column], prefix=target_column)
-            dataset.drop(columns=[target_column], inplace=True)
-            dataset = pd.concat([dataset, target_dummies], axis=1)
+            plan, rows, final_columns = stream_preprocess(
+                dataset_path,
+                actions,
+                target_column,
+                output_csv,
+                log.error,
+                int(data.get("chunksize", DEFAULT_CHUNKSIZE)),
+                io_options,
+                resolve_plan_options(plan_options, streaming=True)
+            )
         except Exception as e:
-            log_error(e, log_file)
-
-    # Save processed dataset
+            log.error(e)
+            log.fail()
+            return False
+        final_shape = [rows, len(final_columns)]
+    else:
+        outcome = preprocess_in_memory(dataset_path, actions, target_column, output_csv, log.error, io_options,
+                                       plan_options)
+        if outcome is None:
+            log.fail()
+            return False
+        plan, final_shape, final_columns = outcome
+    for move in plan.get("optimizer", {}).get("moves", []):
+        log.event("step_reordered", **move)
+    for step in plan["steps"]:
+        for col, entry in step.get("coercion", {}).items():
+            if entry["failed"]:
+                log.event("values_coerced", prompt=step["prompt"], column=col, **entry)
+        if step.get("target_encoding"):
+            log.event("target_label_encoded", level="warning", column=target_column, **step["target_encoding"])
+    log.event("output_written", path=output_csv, shape=final_shape)
+
+    pipeline_path = data.get("pipeline_path", os.path.splitext(output_csv)[0] + "_pipeline.json")
     try:
-        dataset.to_csv(output_csv, index=False)
+        save_pipeline(plan, pipeline_path)
+        log.event("pipeline_saved", path=pipeline_path)
     except Exception as e:
-        log_error(e, log_file)
-        return False
+        log.error(e)
+        pipeline_path = None
+
+    log.finish(
+        "Dataset preprocessing completed successfully",
+        Processed_dataset_path=output_csv,
+        original_dataset_path=dataset_path,
+        target_column=target_column,
+        final_shape=final_shape,
+        final_columns=final_columns,
+        intent_resolution=intent_resolution,
+        plan=plan_summary(plan),
+        plan_optimizer=plan.get("optimizer"),
+        step_cache=plan.get("step_cache"),
+        load_report=plan.get("load_report"),
+        pipeline_path=pipeline_path,
+        timing={
+            "classify_seconds": classify_seconds,
+            "total_seconds": time.perf_counter() - job_started
+        },
+        profile_dir=plan_options.get("profile_dir")
+    )
 
-    # Update log file with processed dataset path
+    return True
+
+def apply_pipeline(pipeline_path, input_csv, output_csv="Applied_Dataset.csv", log_file="Output.json", chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Transform a new dataset with a fitted pipeline saved by preprocess_dataset.
+    No prompt is classified and nothing is re-fitted, so this only pays for
+    reading, transforming and writing the data. Input and output formats
+    follow the file extensions (.csv, .parquet, .feather).
+    """
+    log = JobLog(log_file, task="Pipeline application", sink=open_event_sink())
+    log.event("job_started", pipeline_path=pipeline_path, dataset_path=input_csv)
     try:
-        log_data = {
-            "status": "success",
-            "message": "Dataset preprocessing completed successfully",
-            "Processed_dataset_path": output_csv,
-            "original_dataset_path": dataset_path,
-            "target_column": target_column,
-            "final_shape": list(dataset.shape),
-            "final_columns": list(dataset.columns)
-        }
-        
-        # Check if there were any errors logged previously
-        if os.path.exists(log_file):
-            with open(log_file, "r") as f:
-                content = f.read().strip()
-                if content:
-                    # Handle multiple JSON objects in file (errors)
-                    lines = content.split('\n')
-                    errors = []
-                    for line in lines:
-                        if line.strip():
-                            try:
-                                error_data = json.loads(line)
-                                if "error" in error_data:
-                                    errors.append(error_data["error"])
-                            except:
-                                pass
-                    if errors:
-                        log_data["errors"] = errors
-                        log_data["status"] = "completed_with_errors"
-                        log_data["message"] = f"Dataset preprocessing completed with {len(errors)} error(s)"
-        
-        with open(log_file, "w") as f:
-            json.dump(log_data, f, indent=2)
+        plan = load_pipeline(pipeline_path)
+        rows, final_columns = apply_plan_to_file(plan, input_csv, output_csv, log.error, chunksize)
     except Exception as e:
-        # If all else fails, create a minimal output file
-        try:
-            with open(log_file, "w") as f:
-                json.dump({
-                    "status": "error", 
-                    "message": f"Error updating output file: {str(e)}",
-                    "Processed_dataset_path": output_csv
-                }, f, indent=2)
-        except:
-            pass
+        log.error(e)
+        log.fail()
+        return False
 
+    log.finish(
+        "Pipeline applied successfully",
+        Processed_dataset_path=output_csv,
+        original_dataset_path=input_csv,
+        pipeline_path=pipeline_path,
+        final_shape=[rows, len(final_columns)],
+        final_columns=final_columns
+    )
     return True
 
 if __name__ == "__main__":
-    preprocess_dataset()
\ No newline at end of file
+    # python preprocessor.py                                        -> run sampleinput.json
+    # python preprocessor.py apply <pipeline.json> <input.csv> [output.csv]
+    if len(sys.argv) >= 4 and sys.argv[1] == "apply":
+        apply_pipeline(*sys.argv[2:5])
+    else:
+        preprocess_dataset()
\ No newline at end of file
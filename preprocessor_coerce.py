@@ -0,0 +1,122 @@
+import warnings
+import numpy as np
+import pandas as pd
+from pandas.tseries.api import guess_datetime_format
+
+# Type conversion for fix_data_types. Every column is converted with one
+# vectorized call and values that cannot be converted become missing instead
+# of failing the step: numbers are parsed with pd.to_numeric (integers go to
+# the nullable Int64 dtype when some values are missing), dates with one
+# strftime format inferred from a sample of the column when the step is
+# resolved and kept in its params, so every chunk, and every later run of a
+# saved pipeline, parses with the same format instead of guessing per value.
+# The values that became missing are counted per column.
+
+# Distinct values tried when inferring a date format
+FORMAT_SAMPLE = 1000
+# Candidate formats are guessed from this many of the sampled values
+FORMAT_CANDIDATES = 20
+# A format is used when it parses at least this share of the sample
+FORMAT_MIN_SHARE = 0.5
+# Failed values quoted per column in the report
+MAX_EXAMPLES = 3
+
+def infer_datetime_format(values, sample_size=FORMAT_SAMPLE):
+    """
+    The strftime format that parses the largest share of a sample of values
+    (strings), or None when none parses at least FORMAT_MIN_SHARE of it.
+    """
+    if not (pd.api.types.is_object_dtype(values) or pd.api.types.is_string_dtype(values)):
+        return None
+    sample = pd.Series(values.dropna().unique()[:sample_size]).astype(str)
+    if sample.empty:
+        return None
+    candidates = []
+    for value in sample.iloc[:FORMAT_CANDIDATES]:
+        for dayfirst in (False, True):
+            with warnings.catch_warnings():
+                # pandas warns when a guess contradicts dayfirst; both are tried anyway
+                warnings.simplefilter("ignore", UserWarning)
+                fmt = guess_datetime_format(value, dayfirst=dayfirst)
+            if fmt is not None and fmt not in candidates:
+                candidates.append(fmt)
+    best, best_share = None, 0.0
+    for fmt in candidates:
+        share = pd.to_datetime(sample, errors="coerce", format=fmt).notna().mean()
+        if share > best_share:
+            best, best_share = fmt, share
+            if share == 1.0:
+                break
+    return best if best_share >= FORMAT_MIN_SHARE else None
+
+def to_numbers(values, dtype):
+    """
+    values as numbers; unparseable ones become NaN. Clean text columns take
+    the faster astype path.
+    """
+    if pd.api.types.is_numeric_dtype(values):
+        return values
+    try:
+        return values.astype(dtype)
+    except (TypeError, ValueError, OverflowError):
+        return pd.to_numeric(values, errors="coerce")
+
+def to_datetimes(values, date_format):
+    """
+    Parse text dates once per distinct value; dates usually repeat a lot.
+    """
+    codes, uniques = pd.factorize(values)
+    if not len(uniques):
+        return pd.to_datetime(values, errors="coerce")
+    parsed = pd.to_datetime(pd.Series(uniques, dtype=object), errors="coerce", format=date_format)
+    result = parsed.take(np.maximum(codes, 0)).set_axis(values.index).rename(values.name)
+    return result.where(codes >= 0)
+
+def to_int(values):
+    numbers = to_numbers(values, np.int64)
+    if pd.api.types.is_bool_dtype(numbers) or pd.api.types.is_integer_dtype(numbers):
+        return numbers.astype(np.int64) if not numbers.hasnans else numbers.astype("Int64")
+    # Fractions are cut off like astype(int) does
+    numbers = np.trunc(numbers.astype(np.float64))
+    if not numbers.hasnans:
+        return numbers.astype(np.int64)
+    return numbers.astype("Int64")
+
+def coerce_column(values, dtype, date_format=None):
+    """
+    values converted to dtype ("int", "float", "str" or "datetime"), and a
+    boolean mask of the values that were present but could not be converted.
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.astype(object)
+    if dtype == "int":
+        result = to_int(values)
+    elif dtype == "float":
+        result = to_numbers(values, np.float64).astype(np.float64)
+    elif dtype == "str":
+        # Missing values stay missing instead of becoming the text "nan"
+        result = values.astype(str).where(values.notna())
+    elif dtype == "datetime":
+        if pd.api.types.is_datetime64_any_dtype(values):
+            result = values
+        elif pd.api.types.is_object_dtype(values) or pd.api.types.is_string_dtype(values):
+            result = to_datetimes(values, date_format)
+        else:
+            result = pd.to_datetime(values, errors="coerce")
+    else:
+        raise ValueError(f"Unknown target type: {dtype}")
+    return result, values.notna().to_numpy() & result.isna().to_numpy()
+
+def add_to_report(report, col, values, failed, result):
+    """
+    Add the failures of one chunk of col to report.
+    """
+    entry = report.setdefault(col, {"dtype": None, "failed": 0, "examples": []})
+    entry["dtype"] = str(result.dtype)
+    count = int(failed.sum())
+    if not count:
+        return
+    entry["failed"] += count
+    for value in values[failed].astype(str).unique()[:MAX_EXAMPLES]:
+        if len(entry["examples"]) < MAX_EXAMPLES and value not in entry["examples"]:
+            entry["examples"].append(value)
@@ -0,0 +1,120 @@
+import difflib
+import re
+import threading
+
+# Finding column names in prompts. Column names and prompts are split into
+# lowercase words (letters and digits; spaces, underscores, dashes and
+# other punctuation separate words), so "customer_id", "Customer ID" and
+# "customer-id" are the same name and "age" does not match inside
+# "percentage". The word sequences of all columns go into a trie built once
+# per dataset; a prompt is matched by walking the trie from every word,
+# which costs O(prompt words x longest name) however many columns there are.
+#
+# When no column matches exactly, single prompt words that are not part of
+# the instruction vocabulary are compared with the column names and
+# accepted when they are a close, unambiguous match ("incme" -> "income").
+
+WORD = re.compile(r"[^\W_]+")
+# Similarity (difflib ratio) a prompt word needs to stand for a column name
+FUZZY_CUTOFF = 0.85
+FUZZY_MIN_LENGTH = 4
+# Words of the instructions themselves, never taken for misspelled columns
+PROMPT_WORDS = frozenset("""
+    a all an and any are as average based by column columns convert converting data dataset date datetime
+    dedup delete dimension dimensions discard drop duplicate duplicated duplicates each empty encode
+    encoding every except exclude fill filter float for from impute imputation imputing in int integer into
+    keep label labels mean median missing mode most nan nans normalize normalise null nulls numeric number
+    numbers of on only or pca please remove reduce row rows scale scaling select show standardize
+    standardise str string strings text the their them these this those to type types use using value
+    values where which whose with zscore
+""".split())
+
+def words(text):
+    return WORD.findall(str(text).lower())
+
+class ColumnIndex:
+    """
+    Word-level trie over the column names of one dataset.
+    """
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self.order = {c: i for i, c in enumerate(self.columns)}
+        self.trie = {}
+        self.names = {}
+        for c in self.columns:
+            key = words(c)
+            if not key:
+                continue
+            node = self.trie
+            for word in key:
+                node = node.setdefault(word, {})
+            # Names that differ only in case or punctuation all match
+            node.setdefault(None, []).append(c)
+            self.names.setdefault(" ".join(key), []).append(c)
+
+    def spans(self, text):
+        """
+        (start, end, columns) of every column mention in text, as word
+        positions, leftmost-longest and not overlapping: in "income_tax",
+        only "income tax" matches, not "income".
+        """
+        prompt = words(text)
+        found = []
+        start = 0
+        while start < len(prompt):
+            node = self.trie
+            match = None
+            for end in range(start, len(prompt)):
+                node = node.get(prompt[end])
+                if node is None:
+                    break
+                if None in node:
+                    match = (start, end + 1, node[None])
+            if match is None:
+                start += 1
+            else:
+                found.append(match)
+                start = match[1]
+        return found
+
+    def find(self, text, fuzzy=True):
+        """
+        Columns mentioned in text, in dataset order.
+        """
+        matched = {c for _, _, columns in self.spans(text) for c in columns}
+        if not matched and fuzzy:
+            matched = self.fuzzy(text)
+        return sorted(matched, key=self.order.get)
+
+    def fuzzy(self, text):
+        matched = set()
+        for word in words(text):
+            if len(word) < FUZZY_MIN_LENGTH or word in PROMPT_WORDS:
+                continue
+            close = difflib.get_close_matches(word, self.names, n=2, cutoff=FUZZY_CUTOFF)
+            # Only an unambiguous best match counts
+            if len(close) == 1 or (len(close) == 2 and
+                                   difflib.SequenceMatcher(None, word, close[0]).ratio() >
+                                   difflib.SequenceMatcher(None, word, close[1]).ratio()):
+                matched.update(self.names[close[0]])
+        return matched
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+# Indexes kept for the most recently used column lists
+MAX_INDEXES = 32
+
+def column_index(columns):
+    """
+    Shared ColumnIndex of a column list; built on first use.
+    """
+    key = tuple(columns)
+    with _indexes_lock:
+        index = _indexes.pop(key, None)
+        if index is None:
+            index = ColumnIndex(key)
+        _indexes[key] = index
+        while len(_indexes) > MAX_INDEXES:
+            del _indexes[next(iter(_indexes))]
+    return index
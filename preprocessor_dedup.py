@@ -0,0 +1,188 @@
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+
+# Duplicate detection for remove_duplicates. Every row (or its subset of
+# columns) is reduced to a 64- or 128-bit fingerprint and a row is dropped
+# when its fingerprint was seen before in the same pass, so only the
+# fingerprints are kept, never the rows.
+#
+# The fingerprints seen so far are a sorted array, searched and merged with
+# numpy a chunk at a time (128-bit ones are sorted by their high half only;
+# numpy compares whole records far slower than plain integers). Above a memory budget the array is spilled to
+# disk: it is cut into buckets by the top bits of the fingerprint (a sorted
+# array splits into contiguous slices) and each slice is appended to its
+# bucket as a sorted run file, searched through a memory map from then on.
+# Too many runs in a bucket are merged into one.
+
+FINGERPRINT_BITS = [64, 128]
+# 128-bit fingerprints are two 64-bit row hashes under different keys
+FINGERPRINT_128 = np.dtype([("high", "<u8"), ("low", "<u8")])
+SECOND_HASH_KEY = "dedup-128-bit-fp"
+# Bytes of fingerprints kept in memory before spilling to disk buckets
+DEDUP_MEMORY_BYTES = int(os.environ.get("PREPROCESSOR_DEDUP_MEMORY_BYTES", str(256 * 1024 * 1024)))
+DEDUP_SPILL_DIR = os.environ.get("PREPROCESSOR_SPILL_DIR") or None
+BUCKET_BITS = 8
+MAX_RUNS_PER_BUCKET = 8
+
+def hashable(values):
+    """
+    Columns to hash in place of values. A CSV column is read as int64 in
+    chunks without missing values and as float64 in the others, so numbers
+    are split into an int64 column holding the integral ones (exact above
+    2**53, and -0.0 is 0) and a float64 column holding the rest, and the
+    same number hashes the same in every chunk.
+    """
+    if not pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values):
+        return [values]
+    if pd.api.types.is_integer_dtype(values):
+        ints = values.to_numpy(dtype=np.int64, na_value=0)
+        floats = np.where(values.isna().to_numpy(), np.nan, 0.0)
+    else:
+        floats = values.to_numpy(dtype=np.float64, na_value=np.nan)
+        with np.errstate(invalid="ignore"):
+            integral = np.isfinite(floats) & (np.trunc(floats) == floats) & (np.abs(floats) < 2.0 ** 63)
+        ints = np.where(integral, floats, 0.0).astype(np.int64)
+        floats = np.where(integral, 0.0, floats)
+        # Missing values may carry different NaN bit patterns
+        floats[np.isnan(floats)] = np.nan
+    return [pd.Series(ints, index=values.index), pd.Series(floats, index=values.index)]
+
+def hash_columns(values, hash_key=None):
+    """
+    uint64 hash of every row of the DataFrame values, with numbers
+    normalized by hashable.
+    """
+    parts = [part for i in range(values.shape[1]) for part in hashable(values.iloc[:, i])]
+    frame = pd.DataFrame(dict(enumerate(parts)), index=values.index)
+    if hash_key is None:
+        return pd.util.hash_pandas_object(frame, index=False).to_numpy()
+    return pd.util.hash_pandas_object(frame, index=False, hash_key=hash_key).to_numpy()
+
+def row_fingerprints(frame, columns=None, bits=64):
+    """
+    Fingerprint of every row of frame, over columns (all when empty):
+    uint64 values, or FINGERPRINT_128 records with bits=128.
+    """
+    values = frame[columns] if columns else frame
+    low = hash_columns(values)
+    if bits == 64:
+        return low
+    fingerprints = np.empty(len(low), dtype=FINGERPRINT_128)
+    fingerprints["high"] = hash_columns(values, SECOND_HASH_KEY)
+    fingerprints["low"] = low
+    return fingerprints
+
+def first_occurrences(fingerprints):
+    """
+    Boolean mask of the first occurrence of every fingerprint.
+    """
+    if fingerprints.dtype != FINGERPRINT_128:
+        return ~pd.Series(fingerprints).duplicated().to_numpy()
+    return ~pd.DataFrame({"high": fingerprints["high"], "low": fingerprints["low"]}).duplicated().to_numpy()
+
+def sort_keys(fingerprints):
+    return fingerprints if fingerprints.dtype != FINGERPRINT_128 else fingerprints["high"]
+
+def sort_fingerprints(fingerprints):
+    if fingerprints.dtype != FINGERPRINT_128:
+        return np.sort(fingerprints)
+    return fingerprints[np.argsort(fingerprints["high"], kind="stable")]
+
+def top_bits(fingerprints):
+    return (sort_keys(fingerprints) >> np.uint64(64 - BUCKET_BITS)).astype(np.int64)
+
+def sorted_contains(values, queries):
+    """
+    Which of queries occur in values (sorted by sort_fingerprints).
+    """
+    if not len(values):
+        return np.zeros(len(queries), dtype=bool)
+    keys = sort_keys(values)
+    positions = np.searchsorted(keys, sort_keys(queries))
+    if values.dtype != FINGERPRINT_128:
+        np.minimum(positions, len(values) - 1, out=positions)
+        return values[positions] == queries
+    # Compare the low halves of every stored fingerprint with the same high half
+    found = np.zeros(len(queries), dtype=bool)
+    pending = np.arange(len(queries))
+    while len(pending):
+        inside = positions < len(values)
+        pending, positions = pending[inside], positions[inside]
+        same = keys[positions] == queries["high"][pending]
+        pending, positions = pending[same], positions[same]
+        hit = values["low"][positions] == queries["low"][pending]
+        found[pending[hit]] = True
+        pending, positions = pending[~hit], positions[~hit] + 1
+    return found
+
+class FingerprintSet:
+    """
+    The fingerprints seen so far in one pass. Keeps counts of rows checked
+    and duplicates found for the step's report.
+    """
+
+    def __init__(self, bits=64, memory_bytes=DEDUP_MEMORY_BYTES, spill_dir=DEDUP_SPILL_DIR):
+        self.bits = bits
+        self.dtype = np.dtype(np.uint64) if bits == 64 else FINGERPRINT_128
+        self.memory_limit = max(memory_bytes // self.dtype.itemsize, 1)
+        self.spill_dir = spill_dir
+        self.memory = np.empty(0, dtype=self.dtype)
+        self.runs = {}
+        self.tmp = None
+        self.spilled = 0
+        self.rows = 0
+        self.duplicates = 0
+
+    def __len__(self):
+        return len(self.memory) + self.spilled
+
+    def contains(self, fingerprints):
+        found = sorted_contains(self.memory, fingerprints)
+        if self.runs and len(fingerprints):
+            buckets = top_bits(fingerprints)
+            for bucket, paths in self.runs.items():
+                selected = np.flatnonzero(buckets == bucket)
+                if not len(selected):
+                    continue
+                for path in paths:
+                    run = np.load(path, mmap_mode="r")
+                    found[selected] |= sorted_contains(run, fingerprints[selected])
+        return found
+
+    def add(self, fingerprints):
+        """
+        Add fingerprints that are neither in the set nor repeated.
+        """
+        # Spilled only when more are added, so a set used for a single frame never is
+        if len(self.memory) > self.memory_limit:
+            self.spill()
+        new = sort_fingerprints(fingerprints)
+        self.memory = np.insert(self.memory, np.searchsorted(sort_keys(self.memory), sort_keys(new)), new)
+
+    def spill(self):
+        if self.tmp is None:
+            self.tmp = tempfile.TemporaryDirectory(prefix="dedup_", dir=self.spill_dir)
+        bounds = np.searchsorted(top_bits(self.memory), np.arange(2 ** BUCKET_BITS + 1))
+        for bucket in np.flatnonzero(np.diff(bounds)):
+            paths = self.runs.setdefault(int(bucket), [])
+            run = self.memory[bounds[bucket]:bounds[bucket + 1]]
+            if len(paths) >= MAX_RUNS_PER_BUCKET:
+                run = sort_fingerprints(np.concatenate([np.load(path) for path in paths] + [run]))
+                for path in paths:
+                    os.remove(path)
+                paths.clear()
+            path = os.path.join(self.tmp.name, f"{bucket:03d}_{self.spilled}.npy")
+            np.save(path, run)
+            paths.append(path)
+        self.spilled += len(self.memory)
+        self.memory = np.empty(0, dtype=self.dtype)
+
+    def report(self):
+        return {
+            "rows_checked": self.rows,
+            "duplicates_dropped": self.duplicates,
+            "fingerprint_bits": self.bits,
+            "spilled_fingerprints": self.spilled
+        }
@@ -0,0 +1,253 @@
+import os
+import pandas as pd
+
+# Dataset readers and writers for CSV, Parquet and Feather (Arrow IPC).
+# The format comes from the job configuration ("input_format" /
+# "output_format") or, when not given, from the file extension. Parquet and
+# Feather keep dtypes (datetimes, categories, nullable ints) that CSV loses.
+# pyarrow is only imported when a columnar format is actually used.
+
+FORMAT_EXTENSIONS = {
+    ".csv": "csv",
+    ".txt": "csv",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".feather": "feather",
+    ".arrow": "feather",
+    ".ipc": "feather"
+}
+DEFAULT_EXTENSIONS = {"csv": ".csv", "parquet": ".parquet", "feather": ".feather"}
+DEFAULT_COMPRESSION = {"csv": None, "parquet": "snappy", "feather": "lz4"}
+# Frames with sparse columns (sparse one-hot targets) are made dense in row
+# blocks of about this many cells when written; no file format stores
+# pandas sparse data
+SPARSE_WRITE_CELLS = 16 * 1024 * 1024
+
+def detect_format(path, fmt=None):
+    if fmt:
+        fmt = fmt.lower()
+        if fmt == "arrow":
+            fmt = "feather"
+        if fmt not in DEFAULT_EXTENSIONS:
+            raise ValueError(f"Unsupported dataset format: {fmt}")
+        return fmt
+    return FORMAT_EXTENSIONS.get(os.path.splitext(path)[1].lower(), "csv")
+
+def output_path_for(path, fmt=None):
+    """
+    Give path the extension of the requested output format, e.g.
+    Processed_Dataset.csv -> Processed_Dataset.parquet.
+    """
+    if not fmt:
+        return path
+    fmt = detect_format(path, fmt)
+    if detect_format(path) == fmt:
+        return path
+    return os.path.splitext(path)[0] + DEFAULT_EXTENSIONS[fmt]
+
+def require_pyarrow(fmt):
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError(f"pyarrow is required to read or write {fmt} files (pip install pyarrow)")
+    return pyarrow
+
+def read_columns(path, fmt=None):
+    fmt = detect_format(path, fmt)
+    if fmt == "csv":
+        return pd.read_csv(path, nrows=0).columns.tolist()
+    pa = require_pyarrow(fmt)
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        return pq.read_schema(path).names
+    with pa.memory_map(path) as source:
+        return pa.ipc.open_file(source).schema.names
+
+def read_dataset(path, fmt=None, **kwargs):
+    """
+    Load a whole dataset. Parquet files also accept row_groups=[...] to read
+    only those row groups.
+    """
+    fmt = detect_format(path, fmt)
+    if fmt == "csv":
+        return pd.read_csv(path, **kwargs)
+    require_pyarrow(fmt)
+    if fmt == "parquet":
+        row_groups = kwargs.pop("row_groups", None)
+        if row_groups is not None:
+            import pyarrow.parquet as pq
+            table = pq.ParquetFile(path).read_row_groups(row_groups, columns=kwargs.get("columns"))
+            return table.to_pandas()
+        return pd.read_parquet(path, **kwargs)
+    return pd.read_feather(path, **kwargs)
+
+def iter_dataset_chunks(path, chunksize, fmt=None, **kwargs):
+    """
+    Yield DataFrames of at most chunksize rows. kwargs go to read_csv for
+    CSV files; columnar formats accept columns=[...] and Parquet files
+    row_groups=[...].
+    """
+    fmt = detect_format(path, fmt)
+    if fmt == "csv":
+        yield from pd.read_csv(path, chunksize=chunksize, **kwargs)
+        return
+
+    pa = require_pyarrow(fmt)
+    columns = kwargs.get("columns")
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        batches = pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=columns,
+                                                    row_groups=kwargs.get("row_groups"))
+        for batch in batches:
+            yield batch.to_pandas()
+        return
+
+    with pa.memory_map(path) as source:
+        reader = pa.ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            if columns is not None:
+                batch = batch.select(columns)
+            for offset in range(0, batch.num_rows, chunksize):
+                yield batch.slice(offset, chunksize).to_pandas()
+
+def sparse_columns(frame):
+    return [c for c, dtype in frame.dtypes.items() if isinstance(dtype, pd.SparseDtype)]
+
+def dense_blocks(frame):
+    """
+    Yield frame in row blocks with its sparse columns made dense, or frame
+    itself when it has none.
+    """
+    sparse = sparse_columns(frame)
+    if not sparse:
+        yield frame
+        return
+    rows = max(1, SPARSE_WRITE_CELLS // frame.shape[1])
+    for start in range(0, max(len(frame), 1), rows):
+        block = frame.iloc[start:start + rows]
+        dense = {c: block[c].array.to_dense() for c in sparse}
+        yield pd.concat([block.drop(columns=sparse), pd.DataFrame(dense, index=block.index)], axis=1)[frame.columns]
+
+def write_dataset(frame, path, fmt=None, compression=None):
+    fmt = detect_format(path, fmt)
+    if compression is None:
+        compression = DEFAULT_COMPRESSION[fmt]
+    if sparse_columns(frame):
+        writer = DatasetWriter(path, fmt, compression)
+        writer.write(frame)
+        writer.close(list(frame.columns))
+        return
+    if fmt == "csv":
+        frame.to_csv(path, index=False)
+        return
+    require_pyarrow(fmt)
+    if fmt == "parquet":
+        frame.to_parquet(path, index=False, compression=compression)
+    else:
+        frame.reset_index(drop=True).to_feather(path, compression=compression)
+
+def common_type(pa, left, right):
+    """
+    Arrow type holding values of both types: null columns take the other
+    type, ints widen to floats, and types with no common type become text.
+    """
+    if left.equals(right):
+        return left
+    try:
+        merged = pa.unify_schemas([pa.schema([("c", left)]), pa.schema([("c", right)])], promote_options="permissive")
+        return merged.field("c").type
+    except (pa.ArrowInvalid, pa.ArrowTypeError, NotImplementedError):
+        return pa.large_string()
+
+def common_schema(pa, schema, other):
+    return pa.schema([pa.field(f.name, common_type(pa, f.type, other.field(f.name).type)) for f in schema])
+
+class DatasetWriter:
+    """
+    Append DataFrame chunks to a single output file. Columnar formats start
+    with the schema of the first chunk. A later chunk that does not fit it
+    (a column that was all missing, ints that became floats) widens the
+    schema to a common type; the rows already written are then rewritten
+    with it, once per widening.
+    """
+
+    def __init__(self, path, fmt=None, compression=None):
+        self.path = path
+        self.fmt = detect_format(path, fmt)
+        self.compression = compression if compression is not None else DEFAULT_COMPRESSION[self.fmt]
+        self.writer = None
+        self.schema = None
+        self.sink = None
+        self.chunks_written = 0
+        self.rewrites = 0
+
+    def write(self, chunk):
+        for block in dense_blocks(chunk):
+            self.write_block(block)
+
+    def write_block(self, chunk):
+        if self.fmt == "csv":
+            first = self.chunks_written == 0
+            chunk.to_csv(self.path, mode="w" if first else "a", header=first, index=False)
+        else:
+            pa = require_pyarrow(self.fmt)
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if self.writer is None:
+                self.open(table.schema)
+            elif not table.schema.equals(self.schema):
+                schema = common_schema(pa, self.schema, table.schema)
+                if not schema.equals(self.schema):
+                    self.widen(schema)
+                table = table.select(self.schema.names).cast(self.schema)
+            self.writer.write_table(table)
+        self.chunks_written += 1
+
+    def open(self, schema):
+        pa = require_pyarrow(self.fmt)
+        self.schema = schema
+        if self.fmt == "parquet":
+            import pyarrow.parquet as pq
+            self.writer = pq.ParquetWriter(self.path, schema, compression=self.compression)
+        else:
+            self.sink = pa.OSFile(self.path, "wb")
+            options = pa.ipc.IpcWriteOptions(compression=self.compression)
+            self.writer = pa.ipc.new_file(self.sink, schema, options=options)
+
+    def widen(self, schema):
+        """
+        Rewrite the rows written so far with schema, in record batches.
+        """
+        pa = require_pyarrow(self.fmt)
+        self.finish()
+        written = f"{self.path}.{os.getpid()}.tmp"
+        os.replace(self.path, written)
+        # The pandas metadata of the first chunk names the old dtypes
+        self.open(schema.remove_metadata())
+        if self.fmt == "parquet":
+            import pyarrow.parquet as pq
+            batches = pq.ParquetFile(written).iter_batches()
+        else:
+            source = pa.ipc.open_file(pa.memory_map(written))
+            batches = (source.get_batch(i) for i in range(source.num_record_batches))
+        for batch in batches:
+            self.writer.write_table(pa.Table.from_batches([batch]).cast(self.schema))
+        os.remove(written)
+        self.rewrites += 1
+
+    def finish(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        if self.sink is not None:
+            self.sink.close()
+            self.sink = None
+
+    def close(self, empty_columns=None):
+        """
+        Finish the file. If nothing was written, an empty dataset with
+        empty_columns is written instead.
+        """
+        if self.chunks_written == 0:
+            write_dataset(pd.DataFrame(columns=empty_columns or []), self.path, self.fmt, self.compression)
+        self.finish()
@@ -0,0 +1,221 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+# Job logging. A JobLog collects the events of one job (errors, classified
+# prompts, saved files, ...) in memory and writes the job's result file
+# (Output.json) once, at the end, with a fixed set of keys:
+#
+#   schema_version, job_id, task, status ("success" | "completed_with_errors"
+#   | "error"), message, errors (list of messages), events (list of event
+#   dicts) and the task's own result fields.
+#
+# Per-step "metrics" in the plan hold "peak_rss_bytes", the high-water mark
+# of the whole process while the step ran. It is null when it could not be
+# measured, which includes steps run while the worker had other jobs running.
+#
+# Events can also be appended as JSON lines to a long-lived event log shared
+# by all jobs of the process (PREPROCESSOR_EVENT_LOG or "event_log" in the
+# job JSON). Lines are buffered and the file is rotated above a size limit.
+
+SCHEMA_VERSION = 1
+
+DEFAULT_EVENT_LOG = os.environ.get("PREPROCESSOR_EVENT_LOG", "")
+EVENT_LOG_MAX_BYTES = int(os.environ.get("PREPROCESSOR_EVENT_LOG_MAX_BYTES", str(16 * 1024 * 1024)))
+EVENT_LOG_BACKUPS = int(os.environ.get("PREPROCESSOR_EVENT_LOG_BACKUPS", "3"))
+# Buffered events are written out once this many are pending
+EVENT_BUFFER_SIZE = 256
+
+class EventSink:
+    """
+    Append-only JSON-lines file with size-based rotation: when a write would
+    take it above max_bytes it is renamed to path.1 (path.1 to path.2, ...,
+    keeping backups old files). Safe to share between threads.
+    """
+
+    def __init__(self, path, max_bytes=EVENT_LOG_MAX_BYTES, backups=EVENT_LOG_BACKUPS):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.lock = threading.Lock()
+
+    def write(self, events):
+        if not events:
+            return
+        data = "".join(json.dumps(event, default=str) + "\n" for event in events).encode("utf-8")
+        with self.lock:
+            try:
+                size = os.path.getsize(self.path)
+            except OSError:
+                size = 0
+            if size and self.max_bytes and size + len(data) > self.max_bytes:
+                self.rotate()
+            with open(self.path, "ab") as f:
+                f.write(data)
+
+    def rotate(self):
+        if self.backups <= 0:
+            os.remove(self.path)
+            return
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+_sinks = {}
+_sinks_lock = threading.Lock()
+
+def open_event_sink(path=None):
+    """
+    Shared EventSink for path (default PREPROCESSOR_EVENT_LOG), or None when
+    no event log is configured.
+    """
+    path = path or DEFAULT_EVENT_LOG
+    if not path:
+        return None
+    key = os.path.abspath(path)
+    with _sinks_lock:
+        if key not in _sinks:
+            _sinks[key] = EventSink(path)
+        return _sinks[key]
+
+def write_json_atomic(path, data):
+    """
+    Write data as JSON to a temporary file next to path and rename it over
+    path, so readers never see a partly written file.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp_", suffix=".json", dir=directory)
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, indent=2, default=str)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+class JobLog:
+    """
+    Event log and result writer of one job. Pass log.error as the log_error
+    callback of plans and streams.
+    """
+
+    def __init__(self, result_path, task="Dataset preprocessing", sink=None):
+        self.result_path = result_path
+        self.task = task
+        self.sink = sink
+        self.job_id = uuid.uuid4().hex
+        self.events = []
+        self.errors = []
+        self.pending = []
+        self.lock = threading.Lock()
+
+    def event(self, event, level="info", **fields):
+        record = {"time": time.time(), "job_id": self.job_id, "level": level, "event": event, **fields}
+        with self.lock:
+            self.events.append(record)
+            if self.sink is not None:
+                self.pending.append(record)
+                if len(self.pending) >= EVENT_BUFFER_SIZE:
+                    self.flush_locked()
+        return record
+
+    def error(self, e, **fields):
+        message = str(e)
+        fields.setdefault("error_type", type(e).__name__ if isinstance(e, BaseException) else "message")
+        with self.lock:
+            self.errors.append(message)
+        self.event("error", level="error", message=message, **fields)
+
+    def flush(self):
+        with self.lock:
+            self.flush_locked()
+
+    def flush_locked(self):
+        pending, self.pending = self.pending, []
+        try:
+            self.sink.write(pending)
+        except OSError:
+            # The event log is a side channel; never fail the job over it
+            pass
+
+    def finish(self, message, **result):
+        """
+        Write the result file for a job that ran to the end; the status
+        becomes "completed_with_errors" when errors were logged.
+        """
+        if self.errors:
+            return self.write_result("completed_with_errors",
+                                     f"{self.task} completed with {len(self.errors)} error(s)", result)
+        return self.write_result("success", message, result)
+
+    def fail(self, message=None, **result):
+        """
+        Write the result file for a job that stopped early.
+        """
+        if message is None:
+            message = self.errors[-1] if self.errors else f"{self.task} failed"
+        return self.write_result("error", message, result)
+
+    def write_result(self, status, message, fields):
+        self.event("job_finished", status=status)
+        data = {
+            "schema_version": SCHEMA_VERSION,
+            "job_id": self.job_id,
+            "task": self.task,
+            "status": status,
+            "message": message,
+            "errors": list(self.errors),
+            **fields,
+            "events": list(self.events)
+        }
+        if self.sink is not None:
+            self.flush()
+        try:
+            write_json_atomic(self.result_path, data)
+        except Exception as e:
+            # Last resort: a minimal result without the fields that failed to serialize
+            try:
+                write_json_atomic(self.result_path, {
+                    "schema_version": SCHEMA_VERSION,
+                    "job_id": self.job_id,
+                    "task": self.task,
+                    "status": "error",
+                    "message": f"Error writing output file: {e}",
+                    "errors": list(self.errors) + [str(e)]
+                })
+            except Exception:
+                pass
+        return data
+
+def read_job_result(path):
+    """
+    Load a result file written by JobLog. Files from older versions (error
+    lines or a result without schema_version) are converted to the current
+    keys.
+    """
+    with open(path) as f:
+        content = f.read()
+    try:
+        data = json.loads(content)
+    except json.JSONDecodeError:
+        # Older versions appended one {"error": ...} line per error
+        errors = []
+        for line in content.splitlines():
+            try:
+                errors.append(json.loads(line)["error"])
+            except (json.JSONDecodeError, KeyError, TypeError):
+                pass
+        data = {"status": "error", "message": errors[-1] if errors else "Unreadable output file", "errors": errors}
+    data.setdefault("schema_version", 0)
+    data.setdefault("errors", [])
+    data.setdefault("events", [])
+    return data
@@ -0,0 +1,170 @@
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+
+# Per-step measurements for Output.json. Peak RSS is the process high-water
+# mark while the step ran: on Linux it is reset before every step through
+# /proc/self/clear_refs, elsewhere it is the peak since the process started.
+# The mark covers the whole process, so while the worker runs several jobs at
+# once it is neither reset nor reported (peak_rss_bytes is null): it would
+# include the other jobs and resetting it would clear their peaks.
+
+_jobs = 0
+_jobs_lock = threading.Lock()
+
+@contextmanager
+def job_running():
+    """
+    Count a job running in this process for the duration of the block.
+    """
+    global _jobs
+    with _jobs_lock:
+        _jobs += 1
+    try:
+        yield
+    finally:
+        with _jobs_lock:
+            _jobs -= 1
+
+def reset_peak_rss():
+    if _jobs > 1:
+        return
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+def peak_rss():
+    if _jobs > 1:
+        return None
+    try:
+        with open("/proc/self/status") as f:
+            match = re.search(r"VmHWM:\s+(\d+)\s+kB", f.read())
+        if match:
+            return int(match.group(1)) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        # ru_maxrss is in kB on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except (ImportError, OSError):
+        return None
+
+def frame_stats(frame):
+    return {
+        "rows": len(frame),
+        "columns": frame.shape[1],
+        "bytes": int(frame.memory_usage(index=False, deep=True).sum())
+    }
+
+def buffer_id(values):
+    """
+    Identity of the memory behind a column: the same value before and after
+    a step means the column was not copied.
+    """
+    array = values.array
+    if isinstance(array, pd.Categorical):
+        array = array.codes
+    pa_array = getattr(array, "_pa_array", None)
+    if pa_array is not None:
+        return tuple(buf.address for chunk in pa_array.chunks for buf in chunk.buffers() if buf is not None)
+    data = getattr(array, "_ndarray", array)
+    if not isinstance(data, np.ndarray):
+        return None
+    return data.__array_interface__["data"][0]
+
+def column_buffers(frame):
+    return {c: buffer_id(frame[c]) for c in frame.columns}
+
+def copied_columns(before, frame, written):
+    """
+    Columns the step did not write that now live in new memory.
+    """
+    copied = []
+    for c, identity in before.items():
+        if c in written or c not in frame.columns or identity is None:
+            continue
+        if buffer_id(frame[c]) != identity:
+            copied.append(c)
+    return copied
+
+def add_time(step, key, started):
+    """
+    Add the seconds since started (a perf_counter value) to
+    step["metrics"][key]; streamed steps add up one entry per chunk.
+    """
+    metrics = step.setdefault("metrics", {})
+    metrics[key] = metrics.get(key, 0.0) + time.perf_counter() - started
+
+# Only one cProfile profiler can be active in a process from Python 3.12
+_profile_lock = threading.Lock()
+
+class StepProfiler:
+    """
+    cProfile every step of a plan separately and write one pstats file per
+    step to profile_dir ("<position>_<op>.prof", for pstats, snakeviz or
+    gprof2dot). Steps run over several chunks add up into one profile.
+    Without a profile_dir the profiler does nothing. While another job of
+    the process is profiling a step, runs of this job's steps are not
+    profiled; their steps get "profile_partial".
+    """
+    def __init__(self, profile_dir, steps):
+        self.profile_dir = profile_dir
+        self.positions = {id(step): i for i, step in enumerate(steps)}
+        self.steps = {id(step): step for step in steps}
+        self.profiles = {}
+        self.partial = set()
+
+    @contextmanager
+    def step(self, step):
+        if not self.profile_dir or id(step) not in self.positions:
+            yield
+            return
+        if not _profile_lock.acquire(blocking=False):
+            self.partial.add(id(step))
+            yield
+            return
+        try:
+            import cProfile
+            profile = self.profiles.get(id(step))
+            if profile is None:
+                profile = self.profiles[id(step)] = (step, cProfile.Profile())
+            try:
+                profile[1].enable()
+            except ValueError:
+                # Another profiling tool (a debugger, coverage) is active
+                self.partial.add(id(step))
+                yield
+                return
+            try:
+                yield
+            finally:
+                profile[1].disable()
+        finally:
+            _profile_lock.release()
+
+    def dump(self, log_error=None):
+        """
+        Write the collected profiles; each step gets the path under "profile".
+        A profile_dir that cannot be written is reported to log_error instead
+        of failing the job.
+        """
+        for key in self.partial:
+            self.steps[key]["profile_partial"] = True
+        if not self.profiles:
+            return
+        try:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            for key, (step, profile) in self.profiles.items():
+                path = os.path.join(self.profile_dir, f"{self.positions[key]:02d}_{step['op']}.prof")
+                profile.dump_stats(path)
+                step["profile"] = path
+        except OSError as e:
+            if log_error is not None:
+                log_error(e)
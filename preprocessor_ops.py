@@ -0,0 +1,759 @@
+import re
+import numpy as np
+import pandas as pd
+from preprocessor_columns import column_index, words
+from preprocessor_sketch import QuantileSketch, rank_error
+
+# Fit/transform implementations of the preprocessing operations.
+#
+# A step is a plain dict: {"op": name, "prompt": user_input, "columns": None,
+# "params": None}. Statistics-based operations accumulate state chunk by chunk
+# (update), turn it into JSON-serializable params (finalize) and then apply
+# them to any number of chunks (transform). Row-local operations only have a
+# transform. This lets the same step run over a whole DataFrame or over a
+# stream of CSV chunks.
+
+CATEGORICAL_DTYPES = ["object", "category", "string"]
+
+def extract_columns_from_text(user_input, columns):
+    """
+    Columns named in a prompt, in dataset order (whole words only, see
+    preprocessor_columns.py).
+    """
+    return column_index(columns).find(user_input)
+
+DTYPE_WORDS = {
+    "int": "int", "integer": "int", "integers": "int",
+    "float": "float", "floats": "float", "double": "float", "decimal": "float",
+    "str": "str", "string": "str", "strings": "str", "text": "str",
+    "date": "datetime", "dates": "datetime", "datetime": "datetime", "timestamp": "datetime"
+}
+
+def parse_dtype_requests(user_input, columns):
+    """
+    Find "<col> to int|float|str|date|datetime" requests in a prompt. Several
+    columns can share a type ("age and zip to int"), and "into"/"as" work
+    like "to".
+    """
+    prompt = words(user_input)
+    spans = column_index(columns).spans(user_input)
+    dtype_dict = {}
+    group = []
+    for i, (start, end, cols) in enumerate(spans):
+        group.extend(cols)
+        following = spans[i + 1][0] if i + 1 < len(spans) else len(prompt)
+        between = prompt[end:following]
+        if between and between[0] in ("to", "into", "as"):
+            dtype = next((DTYPE_WORDS[w] for w in between[1:3] if w in DTYPE_WORDS), None)
+            if dtype:
+                for col in group:
+                    dtype_dict.setdefault(col, dtype)
+            group = []
+        elif any(w not in ("and", "or") for w in between):
+            group = []
+    return dtype_dict
+
+DEFAULT_COMPONENTS = 2
+COMPONENT_PATTERNS = [
+    re.compile(r"n_components\s*=\s*(\d+)"),
+    re.compile(r"\b(\d+)\s*(?:principal\s+)?(?:components?|dimensions?|dims?|pcs?|features?)\b"),
+    re.compile(r"\b(?:to|into)\s+(\d+)\b")
+]
+
+def parse_component_count(user_input, default=DEFAULT_COMPONENTS):
+    """
+    Number of PCA components requested in a prompt, e.g. "reduce to 3
+    dimensions", "pca with 5 components", "n_components=4".
+    """
+    user_lower = user_input.lower()
+    for pattern in COMPONENT_PATTERNS:
+        match = pattern.search(user_lower)
+        if match:
+            return int(match.group(1))
+    return default
+
+def to_builtin(value):
+    """
+    Convert numpy scalars to plain Python values so params can be saved as JSON.
+    """
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+def sort_values(values):
+    try:
+        return sorted(values)
+    except TypeError:
+        return sorted(values, key=str)
+
+def stacked_codes(frame, cols):
+    """
+    Integer codes for several columns at once: returns (codes, uniques) where
+    codes is a rows x len(cols) array indexing into uniques and -1 marks a
+    missing value. Categorical columns reuse their own codes; other columns
+    are factorized without converting their values to Python objects.
+    """
+    codes = np.empty((len(frame), len(cols)), dtype=np.int64)
+    parts = []
+    offsets = np.empty(len(cols), dtype=np.int64)
+    offset = 0
+    for i, c in enumerate(cols):
+        values = frame[c]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            codes[:, i] = values.array.codes
+            col_uniques = values.array.categories
+        else:
+            codes[:, i], col_uniques = pd.factorize(values)
+        parts.append(np.asarray(col_uniques, dtype=object))
+        offsets[i] = offset
+        offset += len(col_uniques)
+    np.add(codes, offsets, out=codes, where=codes >= 0)
+    uniques = np.concatenate(parts) if parts else np.empty(0, dtype=object)
+    return codes, uniques
+
+# Above this many (column, value) cells code_counts switches from a dense
+# bincount to sorting the keys
+DENSE_COUNT_LIMIT = 4_000_000
+
+def code_counts(codes, n_uniques):
+    """
+    Occurrences of the values present in each column, as three arrays
+    (column index, value index, count), counted for all columns at once.
+    """
+    n_cols = codes.shape[1]
+    width = n_uniques + 1
+    keys = (codes + np.arange(n_cols) * width + 1).ravel()
+    if n_cols * width <= DENSE_COUNT_LIMIT:
+        counts = np.bincount(keys, minlength=n_cols * width)
+        keys = np.flatnonzero(counts)
+        counts = counts[keys]
+    else:
+        keys, counts = np.unique(keys, return_counts=True)
+    col_idx, value_idx = np.divmod(keys, width)
+    # value_idx 0 is the missing-value slot
+    present = value_idx > 0
+    return col_idx[present], value_idx[present] - 1, counts[present]
+
+def new_step(op, prompt):
+    return {"op": op, "prompt": prompt, "columns": None, "params": None}
+
+class Op:
+    needs_fit = False
+    drops_columns = False
+    # Effects the plan compiler needs to know about when fusing steps
+    changes_rows = False
+    changes_schema = False
+    # True when the result depends on columns other than step["columns"]
+    # (row filters, whole-row dedup, PCA), so no column may be left out before it
+    cross_column = False
+    # Step key of the report a step writes while it runs ("dedup", "coercion",
+    # "target_encoding"); parallel shards send it back with their params
+    report_key = None
+    # True when the fitted statistics do not change with repeated rows and the
+    # transform keeps distinct rows distinct, so dedup may run before the step
+    dedup_invariant = False
+
+    def resolve(self, step, frame, ctx):
+        step["columns"] = []
+
+    def new_state(self, step):
+        return None
+
+    def update(self, state, chunk, step):
+        pass
+
+    def finalize(self, state, step):
+        return {}
+
+    def start_pass(self, step):
+        return None
+
+    def transform(self, chunk, step, run_state):
+        return chunk
+
+    def select(self, chunk, step, run_state, mask):
+        """
+        Narrow the boolean row mask (None = all rows) to the rows transform
+        would keep, without building a new frame; copy_free mode calls it for
+        ops with changes_rows, which must override it. Ops that keep every
+        row leave the mask as it is.
+        """
+        return mask
+
+def numeric_columns(step, frame, ctx):
+    cols = extract_columns_from_text(step["prompt"], ctx["columns"])
+    if not cols:
+        cols = frame.select_dtypes(include="number").columns.tolist()
+        if ctx["target_column"] in cols:
+            cols.remove(ctx["target_column"])
+    return [c for c in cols if c in frame.columns]
+
+def categorical_columns(step, frame, ctx):
+    cols = extract_columns_from_text(step["prompt"], ctx["columns"])
+    if not cols:
+        text = set(frame.select_dtypes(include=CATEGORICAL_DTYPES).columns)
+        # Columns parsed as dates on load are text in the file
+        text.update(ctx.get("load_schema", {}).get("dates", {}))
+        cols = [c for c in frame.columns if c in text]
+        if ctx["target_column"] in cols:
+            cols.remove(ctx["target_column"])
+    return [c for c in cols if c in frame.columns]
+
+class DropColumnsOp(Op):
+    drops_columns = True
+
+    def resolve(self, step, frame, ctx):
+        cols = extract_columns_from_text(step["prompt"], ctx["columns"])
+        step["columns"] = [c for c in cols if c != ctx["target_column"]]
+
+    def transform(self, chunk, step, run_state):
+        cols = [c for c in step["columns"] if c in chunk.columns]
+        return chunk.drop(columns=cols) if cols else chunk
+
+class FillMeanOp(Op):
+    needs_fit = True
+
+    def resolve(self, step, frame, ctx):
+        step["columns"] = numeric_columns(step, frame, ctx)
+
+    def new_state(self, step):
+        return {"count": pd.Series(0.0, index=step["columns"]), "sum": pd.Series(0.0, index=step["columns"])}
+
+    def update(self, state, chunk, step):
+        values = chunk[step["columns"]]
+        state["count"] = state["count"].add(values.count(), fill_value=0)
+        state["sum"] = state["sum"].add(values.sum(), fill_value=0)
+
+    def finalize(self, state, step):
+        means = state["sum"] / state["count"].replace(0, np.nan)
+        return {"fill": {c: to_builtin(v) for c, v in means.dropna().items()}}
+
+    def transform(self, chunk, step, run_state):
+        fill = step["params"]["fill"]
+        cols = [c for c in fill if c in chunk.columns]
+        if cols:
+            chunk[cols] = chunk[cols].fillna(pd.Series(fill)[cols])
+        return chunk
+
+class FillMedianOp(FillMeanOp):
+    # Exact medians need every non-null value of the selected columns; only
+    # those columns (not the whole frame) are kept in memory while fitting.
+    # With the "approximate" quantile method each column is summarized by a
+    # fixed-size mergeable sketch instead (see preprocessor_sketch.py).
+    def resolve(self, step, frame, ctx):
+        super().resolve(step, frame, ctx)
+        step["approximate"] = ctx.get("options", {}).get("quantiles") == "approximate"
+
+    def new_state(self, step):
+        if step.get("approximate"):
+            return {c: QuantileSketch() for c in step["columns"]}
+        return {c: [] for c in step["columns"]}
+
+    def update(self, state, chunk, step):
+        for c in step["columns"]:
+            values = chunk[c].dropna().to_numpy(dtype=np.float64)
+            if step.get("approximate"):
+                state[c].update(values)
+            else:
+                state[c].append(values)
+
+    def finalize(self, state, step):
+        fill = {}
+        if step.get("approximate"):
+            for c, sketch in state.items():
+                if sketch.count:
+                    fill[c] = sketch.median()
+            return {"fill": fill, "method": "approximate", "rank_error": rank_error()}
+        for c, parts in state.items():
+            values = np.concatenate(parts) if parts else np.empty(0)
+            if len(values):
+                fill[c] = float(np.median(values))
+        return {"fill": fill, "method": "exact"}
+
+class FillModeOp(FillMeanOp):
+    # Counts of every (column, value) pair, gathered for all columns in one pass
+    def resolve(self, step, frame, ctx):
+        step["columns"] = categorical_columns(step, frame, ctx)
+
+    def new_state(self, step):
+        return {"counts": None}
+
+    def update(self, state, chunk, step):
+        cols = step["columns"]
+        if not cols:
+            return
+        codes, uniques = stacked_codes(chunk, cols)
+        col_idx, value_idx, counts = code_counts(codes, len(uniques))
+        index = pd.MultiIndex.from_arrays([np.asarray(cols, dtype=object)[col_idx], uniques[value_idx]])
+        chunk_counts = pd.Series(counts, index=index)
+        if state["counts"] is not None:
+            chunk_counts = state["counts"].add(chunk_counts, fill_value=0)
+        state["counts"] = chunk_counts
+
+    def finalize(self, state, step):
+        counts = state["counts"]
+        if counts is None or not len(counts):
+            return {"fill": {}}
+        top = counts[counts == counts.groupby(level=0).transform("max")]
+        columns = top.index.get_level_values(0)
+        tied = columns.duplicated(keep=False)
+        fill = {c: to_builtin(v) for c, v in top.index[~tied]}
+        # Same tie-break as Series.mode(): smallest of the most frequent values
+        for c in columns[tied].unique():
+            fill[c] = to_builtin(sort_values(top.loc[c].index)[0])
+        return {"fill": {c: fill[c] for c in step["columns"] if c in fill}}
+
+    def transform(self, chunk, step, run_state):
+        filled = {}
+        for c, value in step["params"]["fill"].items():
+            if c not in chunk.columns:
+                continue
+            values = chunk[c]
+            if isinstance(values.dtype, pd.CategoricalDtype) and value in values.array.categories:
+                # Fill through the integer codes instead of comparing values
+                missing = values.array.codes < 0
+                if missing.any():
+                    codes = values.array.codes.copy()
+                    codes[missing] = values.array.categories.get_loc(value)
+                    filled[c] = pd.Categorical.from_codes(codes, dtype=values.dtype)
+            elif values.hasnans:
+                filled[c] = values.fillna(value).array
+        if filled:
+            chunk[list(filled)] = pd.DataFrame(filled, index=chunk.index)
+        return chunk
+
+class RemoveDuplicatesOp(Op):
+    # Rows are compared by fingerprint (preprocessor_dedup.py): over the
+    # columns named in the prompt ("remove duplicates by email"), otherwise
+    # over the whole row. The first occurrence is kept.
+    changes_rows = True
+    cross_column = True
+    report_key = "dedup"
+
+    def resolve(self, step, frame, ctx):
+        from preprocessor_dedup import FINGERPRINT_BITS
+        bits = int(ctx["options"].get("dedup_fingerprint", 64))
+        if bits not in FINGERPRINT_BITS:
+            raise ValueError(f"Unknown dedup fingerprint size: {bits} (expected 64 or 128)")
+        step["columns"] = extract_columns_from_text(step["prompt"], ctx["columns"])
+        step["params"] = {"subset": step["columns"], "fingerprint_bits": bits}
+
+    # The fingerprints seen so far in the current pass
+    def start_pass(self, step):
+        from preprocessor_dedup import FingerprintSet
+        return FingerprintSet((step["params"] or {}).get("fingerprint_bits", 64))
+
+    def transform(self, chunk, step, run_state):
+        return chunk[self.select(chunk, step, run_state, None)]
+
+    def select(self, chunk, step, run_state, mask):
+        from preprocessor_dedup import first_occurrences, row_fingerprints
+        params = step["params"] or {}
+        subset = [c for c in params.get("subset") or [] if c in chunk.columns]
+        keep = np.ones(len(chunk), dtype=bool) if mask is None else mask.copy()
+        fingerprints = row_fingerprints(chunk, subset, params.get("fingerprint_bits", 64))[keep]
+        first = first_occurrences(fingerprints)
+        if len(run_state):
+            first[first] = ~run_state.contains(fingerprints[first])
+        run_state.add(fingerprints[first])
+        run_state.rows += len(fingerprints)
+        run_state.duplicates += len(fingerprints) - int(first.sum())
+        # Totals of the pass so far; the last pass over the data leaves the final counts
+        step["dedup"] = run_state.report()
+        keep[keep] = first
+        return keep
+
+class FixDataTypesOp(Op):
+    # Conversion and failure counting in preprocessor_coerce.py. Date formats
+    # are inferred from the stage input when resolved (or from the first
+    # chunk that has the column) and saved in params["date_formats"].
+    changes_schema = True
+    report_key = "coercion"
+
+    def resolve(self, step, frame, ctx):
+        from preprocessor_coerce import infer_datetime_format
+        dtypes = parse_dtype_requests(step["prompt"], ctx["columns"])
+        date_formats = {}
+        if frame is not None:
+            for col, dtype in dtypes.items():
+                if dtype == "datetime" and col in frame.columns:
+                    date_formats[col] = infer_datetime_format(frame[col])
+        step["params"] = {"dtypes": dtypes, "date_formats": date_formats}
+        step["columns"] = list(dtypes)
+
+    # Failed conversions per column in the current pass
+    def start_pass(self, step):
+        return {}
+
+    def transform(self, chunk, step, run_state):
+        from preprocessor_coerce import add_to_report, coerce_column, infer_datetime_format
+        date_formats = step["params"].setdefault("date_formats", {})
+        for col, dtype in step["params"]["dtypes"].items():
+            if col not in chunk.columns:
+                continue
+            values = chunk[col]
+            if dtype == "datetime" and date_formats.get(col) is None:
+                # Not known yet, e.g. the first chunk had no values in the column
+                date_formats[col] = infer_datetime_format(values)
+            result, failed = coerce_column(values, dtype, date_formats.get(col))
+            add_to_report(run_state, col, values, failed, result)
+            chunk[col] = result
+        # Totals of the pass so far; the last pass over the data leaves the final counts
+        step["coercion"] = run_state
+        return chunk
+
+class StandardizeOp(FillMeanOp):
+    # Per-chunk count/mean/M2 merged with Chan's parallel variance update
+    def new_state(self, step):
+        zeros = pd.Series(0.0, index=step["columns"])
+        return {"count": zeros, "mean": zeros, "m2": zeros}
+
+    def update(self, state, chunk, step):
+        values = chunk[step["columns"]].astype("float64")
+        n_b = values.count()
+        mean_b = values.mean().fillna(0.0)
+        m2_b = ((values - mean_b) ** 2).sum()
+        n_a, mean_a, m2_a = state["count"], state["mean"], state["m2"]
+        n = n_a + n_b
+        delta = mean_b - mean_a
+        safe_n = n.replace(0, np.nan)
+        state["mean"] = (mean_a + delta * n_b / safe_n).fillna(0.0)
+        state["m2"] = (m2_a + m2_b + delta ** 2 * n_a * n_b / safe_n).fillna(0.0)
+        state["count"] = n
+
+    def finalize(self, state, step):
+        std = np.sqrt(state["m2"] / state["count"].replace(0, np.nan))
+        # Constant columns are left unscaled, as StandardScaler does
+        scale = std.where(std > 0, 1.0).fillna(1.0)
+        return {
+            "mean": {c: to_builtin(v) for c, v in state["mean"].items()},
+            "scale": {c: to_builtin(v) for c, v in scale.items()}
+        }
+
+    def transform(self, chunk, step, run_state):
+        params = step["params"]
+        cols = [c for c in params["mean"] if c in chunk.columns]
+        if cols:
+            chunk[cols] = (chunk[cols] - pd.Series(params["mean"])[cols]) / pd.Series(params["scale"])[cols]
+        return chunk
+
+class NormalizeOp(FillMeanOp):
+    dedup_invariant = True
+
+    def new_state(self, step):
+        return {"min": pd.Series(np.nan, index=step["columns"]), "max": pd.Series(np.nan, index=step["columns"])}
+
+    def update(self, state, chunk, step):
+        values = chunk[step["columns"]]
+        state["min"] = pd.concat([state["min"], values.min()], axis=1).min(axis=1)
+        state["max"] = pd.concat([state["max"], values.max()], axis=1).max(axis=1)
+
+    def finalize(self, state, step):
+        data_range = state["max"] - state["min"]
+        # Constant columns are shifted to 0 but not scaled, as MinMaxScaler does
+        scale = data_range.where(data_range > 0, 1.0).fillna(1.0)
+        return {
+            "min": {c: to_builtin(v) for c, v in state["min"].fillna(0.0).items()},
+            "scale": {c: to_builtin(v) for c, v in scale.items()}
+        }
+
+    def transform(self, chunk, step, run_state):
+        params = step["params"]
+        cols = [c for c in params["min"] if c in chunk.columns]
+        if cols:
+            chunk[cols] = (chunk[cols] - pd.Series(params["min"])[cols]) / pd.Series(params["scale"])[cols]
+        return chunk
+
+class EncodeCategoricalOp(Op):
+    # Values are factorized once for all selected columns and only the
+    # distinct values are converted to strings, never whole columns
+    needs_fit = True
+    changes_schema = True
+    dedup_invariant = True
+
+    def resolve(self, step, frame, ctx):
+        step["columns"] = categorical_columns(step, frame, ctx)
+
+    def new_state(self, step):
+        return {c: set() for c in step["columns"]}
+
+    def update(self, state, chunk, step):
+        cols = step["columns"]
+        if not cols:
+            return
+        codes, uniques = stacked_codes(chunk, cols)
+        col_idx, value_idx, _ = code_counts(codes, len(uniques))
+        names = uniques.astype(str)
+        # col_idx is sorted, so each column's values are one slice
+        bounds = np.searchsorted(col_idx, np.arange(len(cols) + 1))
+        for i, c in enumerate(cols):
+            state[c].update(names[value_idx[bounds[i]:bounds[i + 1]]])
+
+    def finalize(self, state, step):
+        # Sorted vocabulary gives the same codes as LabelEncoder; missing
+        # values get the code after the last class
+        return {"classes": {c: sorted(values) for c, values in state.items()}}
+
+    def transform(self, chunk, step, run_state):
+        classes = step["params"]["classes"]
+        cols = [c for c in classes if c in chunk.columns]
+        if not cols:
+            return chunk
+        codes, uniques = stacked_codes(chunk, cols)
+        width = len(uniques) + 1
+        keys = (codes + np.arange(len(cols)) * width + 1).ravel()
+        # Look up each distinct (column, value) pair once
+        inverse, pair_keys = pd.factorize(keys)
+        col_idx, value_idx = np.divmod(pair_keys, width)
+
+        sizes = np.array([len(classes[c]) for c in cols])
+        starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+        vocabulary = pd.MultiIndex.from_arrays([
+            np.repeat(np.asarray(cols, dtype=object), sizes),
+            [value for c in cols for value in classes[c]]
+        ])
+        names = np.concatenate([[""], uniques.astype(str)]).astype(object)
+        positions = vocabulary.get_indexer(
+            pd.MultiIndex.from_arrays([np.asarray(cols, dtype=object)[col_idx], names[value_idx]])
+        )
+        # Missing values get len(classes); values outside the vocabulary become NaN
+        pair_codes = np.where(positions >= 0, positions - starts[col_idx], np.nan)
+        pair_codes = np.where(value_idx == 0, sizes[col_idx], pair_codes)
+
+        cells = pair_codes[inverse].reshape((len(chunk), len(cols)))
+        has_nan = np.isnan(cells).any(axis=0)
+        if has_nan.any():
+            encoded = pd.DataFrame(
+                {c: cells[:, i] if has_nan[i] else cells[:, i].astype(np.int64) for i, c in enumerate(cols)},
+                index=chunk.index
+            )
+        else:
+            encoded = pd.DataFrame(cells.astype(np.int64), columns=cols, index=chunk.index)
+        chunk[cols] = encoded
+        return chunk
+
+class ReduceDimensionsOp(Op):
+    # PCA fitted from the running mean and scatter matrix of the selected
+    # columns (merged across chunks like StandardizeOp), so it needs one pass
+    # and O(columns^2) memory however many rows there are. The components
+    # are the top eigenvectors of the covariance matrix, signed like
+    # sklearn's PCA.
+    needs_fit = True
+    changes_schema = True
+    cross_column = True
+
+    def resolve(self, step, frame, ctx):
+        numeric = frame.select_dtypes(include="number").columns
+        cols = [c for c in extract_columns_from_text(step["prompt"], ctx["columns"]) if c in numeric]
+        if not cols:
+            cols = numeric.tolist()
+            if ctx["target_column"] in cols:
+                cols.remove(ctx["target_column"])
+        step["columns"] = cols
+
+    def new_state(self, step):
+        d = len(step["columns"])
+        return {"count": 0, "mean": np.zeros(d), "m2": np.zeros((d, d))}
+
+    def update(self, state, chunk, step):
+        values = chunk[step["columns"]].to_numpy(dtype=np.float64)
+        if np.isnan(values).any():
+            raise ValueError("PCA does not accept missing values; fill or drop them first")
+        n_b = len(values)
+        if not n_b:
+            return
+        mean_b = values.mean(axis=0)
+        centered = values - mean_b
+        m2_b = centered.T @ centered
+        n_a = state["count"]
+        n = n_a + n_b
+        delta = mean_b - state["mean"]
+        state["mean"] = state["mean"] + delta * n_b / n
+        state["m2"] = state["m2"] + m2_b + np.outer(delta, delta) * n_a * n_b / n
+        state["count"] = n
+
+    def finalize(self, state, step):
+        n_components = parse_component_count(step["prompt"])
+        n_features = len(step["columns"])
+        if not 1 <= n_components <= min(state["count"], n_features):
+            raise ValueError(
+                f"n_components={n_components} must be between 1 and min(n_samples, n_features)="
+                f"{min(state['count'], n_features)}"
+            )
+        variances, vectors = np.linalg.eigh(state["m2"] / max(state["count"] - 1, 1))
+        order = np.argsort(variances)[::-1][:n_components]
+        components = vectors[:, order].T
+        # Largest loading of each component is positive, as sklearn's svd_flip
+        signs = np.sign(components[np.arange(n_components), np.abs(components).argmax(axis=1)])
+        components *= np.where(signs == 0, 1.0, signs)[:, None]
+        total = variances.clip(min=0).sum()
+        return {
+            "n_components": n_components,
+            "mean": state["mean"].tolist(),
+            "components": components.tolist(),
+            "explained_variance_ratio": (variances[order].clip(min=0) / total).tolist() if total > 0 else None
+        }
+
+    def transform(self, chunk, step, run_state):
+        params = step["params"]
+        values = chunk[step["columns"]].to_numpy(dtype=np.float64)
+        reduced = (values - np.asarray(params["mean"])) @ np.asarray(params["components"]).T
+        for i in range(params["n_components"]):
+            chunk[f"PCA_{i+1}"] = reduced[:, i]
+        return chunk
+
+class FilterRowsOp(Op):
+    # The prompt is compiled into a predicate over the dataset's columns
+    # (preprocessor_query.py); prompts the compiler does not understand are
+    # still run through DataFrame.query
+    changes_rows = True
+    cross_column = True
+
+    def resolve(self, step, frame, ctx):
+        from preprocessor_query import parse_predicate, predicate_columns
+        try:
+            predicate = parse_predicate(step["prompt"], ctx["columns"])
+        except ValueError:
+            predicate = None
+        step["params"] = {"predicate": predicate}
+        step["columns"] = predicate_columns(predicate) if predicate is not None else []
+
+    def transform(self, chunk, step, run_state):
+        if (step["params"] or {}).get("predicate") is None:
+            return chunk.query(step["prompt"])
+        return chunk[self.select(chunk, step, run_state, None)]
+
+    def select(self, chunk, step, run_state, mask):
+        predicate = (step["params"] or {}).get("predicate")
+        if predicate is not None:
+            from preprocessor_query import evaluate
+            keep = evaluate(predicate, chunk)
+        else:
+            keep = chunk.eval(step["prompt"])
+            if not (isinstance(keep, pd.Series) and keep.dtype == bool):
+                raise ValueError(f"Filter condition is not a boolean expression: {step['prompt']}")
+            keep = keep.to_numpy()
+        return keep if mask is None else mask & keep
+
+# Targets with more classes than this get label codes with target encoding
+# "auto": every output format stores one-hot columns densely, sparse or not,
+# so a file of rows x classes cells would be written
+TARGET_LABEL_MIN_CLASSES = 64
+TARGET_ENCODINGS = ["auto", "onehot", "sparse", "label"]
+
+class EncodeTargetOp(Op):
+    """
+    Encodes the target column with a vocabulary fitted over the whole
+    dataset, so every chunk gets the same columns. The encoding comes from
+    plan option "target_encoding":
+
+    - "onehot": one dense boolean column per class
+    - "sparse": the same columns as pandas sparse columns, built straight
+      from the class codes, so memory grows with rows, not rows x classes;
+      written files still hold every cell
+    - "label": one integer column of class codes (missing values get
+      len(categories), values outside the vocabulary NaN)
+    - "auto" (default): "onehot", or "label" above TARGET_LABEL_MIN_CLASSES;
+      the switch is recorded under "target_encoding" on the step and under
+      "requested" in the params, since the output then holds codes, not
+      dummy columns
+    """
+    needs_fit = True
+    changes_schema = True
+    report_key = "target_encoding"
+
+    def resolve(self, step, frame, ctx):
+        step["columns"] = [ctx["target_column"]] if ctx["target_column"] in frame.columns else []
+        encoding = ctx["options"].get("target_encoding", "auto")
+        if encoding not in TARGET_ENCODINGS:
+            raise ValueError(f"Unknown target encoding: {encoding} (expected one of {', '.join(TARGET_ENCODINGS)})")
+        step["encoding"] = encoding
+
+    def new_state(self, step):
+        return set()
+
+    def update(self, state, chunk, step):
+        for c in step["columns"]:
+            state.update(chunk[c].dropna().unique())
+
+    def finalize(self, state, step):
+        categories = [to_builtin(v) for v in sort_values(state)]
+        encoding = step.get("encoding", "onehot")
+        if encoding == "auto" and len(categories) > TARGET_LABEL_MIN_CLASSES:
+            step["target_encoding"] = {"requested": "auto", "encoding": "label", "classes": len(categories),
+                                       "max_onehot_classes": TARGET_LABEL_MIN_CLASSES}
+            return {"categories": categories, "encoding": "label", "requested": "auto"}
+        if encoding == "auto":
+            encoding = "onehot"
+        return {"categories": categories, "encoding": encoding}
+
+    def transform(self, chunk, step, run_state):
+        params = step["params"]
+        encoding = params.get("encoding", "onehot")
+        for c in step["columns"]:
+            if c not in chunk.columns:
+                continue
+            values = pd.Categorical(chunk[c], categories=params["categories"])
+            if encoding == "label":
+                codes = values.codes.astype(np.int64)
+                missing = codes < 0
+                if missing.any():
+                    # Unseen values are not NaN in the input but have no code
+                    unknown = missing & chunk[c].notna().to_numpy()
+                    codes[missing] = len(params["categories"])
+                    codes = np.where(unknown, np.nan, codes) if unknown.any() else codes
+                chunk[c] = codes
+                continue
+            if encoding == "sparse":
+                encoded = sparse_dummies(values, c, chunk.index)
+            else:
+                encoded = pd.get_dummies(values, prefix=c)
+                encoded.index = chunk.index
+            chunk = pd.concat([chunk.drop(columns=[c]), encoded], axis=1)
+        return chunk
+
+def sparse_dummies(values, prefix, index):
+    """
+    One-hot columns of a Categorical as boolean pandas sparse columns, named
+    like get_dummies. Only the positions of the ones are stored.
+    """
+    from scipy import sparse
+    codes = values.codes
+    rows = np.flatnonzero(codes >= 0)
+    matrix = sparse.csc_matrix(
+        (np.ones(len(rows), dtype=bool), (rows, codes[rows])),
+        shape=(len(codes), len(values.categories))
+    )
+    columns = [f"{prefix}_{category}" for category in values.categories]
+    frame = pd.DataFrame.sparse.from_spmatrix(matrix, index=index, columns=columns)
+    return frame.astype(pd.SparseDtype(bool, False))
+
+OPS = {
+    "drop_columns": DropColumnsOp(),
+    "fill_missing_mean": FillMeanOp(),
+    "fill_missing_median": FillMedianOp(),
+    "fill_missing_mode": FillModeOp(),
+    "remove_duplicates": RemoveDuplicatesOp(),
+    "fix_data_types": FixDataTypesOp(),
+    "standardize_columns": StandardizeOp(),
+    "normalize_columns": NormalizeOp(),
+    "encode_categorical": EncodeCategoricalOp(),
+    "reduce_dimensions": ReduceDimensionsOp(),
+    "filter_rows": FilterRowsOp(),
+    "encode_target": EncodeTargetOp()
+}
+
+# Intent label -> op name
+INTENT_OPS = {
+    "drop columns from dataset": "drop_columns",
+    "fill missing values with mean imputation": "fill_missing_mean",
+    "fill missing values with median imputation": "fill_missing_median",
+    "fill missing values with mode imputation": "fill_missing_mode",
+    "remove duplicate rows": "remove_duplicates",
+    "convert or change data types of columns": "fix_data_types",
+    "standardize numeric columns using z-score scaling": "standardize_columns",
+    "normalize numeric columns to range 0 to 1": "normalize_columns",
+    "encode categorical columns using label encoding": "encode_categorical",
+    "reduce dataset dimensions with PCA": "reduce_dimensions",
+    "filter dataset rows based on conditions": "filter_rows"
+}
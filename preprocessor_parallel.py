@@ -0,0 +1,246 @@
+import copy
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context, resource_tracker, shared_memory
+import pandas as pd
+from preprocessor_ops import OPS
+from preprocessor_plan import run_stage
+
+# Column-sharded execution of in-memory plan stages. A stage whose steps all
+# work column by column (imputation, scaling, encoding, type conversion,
+# dropping, target dummies) is split into groups of columns; every group is
+# fitted and transformed in a separate process and the results are put back
+# together in the order sequential execution would give. Shards travel as
+# Arrow IPC streams in shared memory, so no DataFrame is pickled.
+#
+# Stages with row filters, dedup or PCA, small frames, and stages whose
+# columns cannot be converted to Arrow run sequentially as before. If any
+# shard reports an error the stage is re-run sequentially so errors are
+# logged exactly as without workers.
+
+# Stages on frames smaller than this run sequentially
+PARALLEL_MIN_BYTES = int(os.environ.get("PREPROCESSOR_PARALLEL_MIN_BYTES", str(32 * 1024 * 1024)))
+
+# One pool per worker count, shared by the jobs the worker server runs in threads
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(workers):
+    """
+    Process pool reused across jobs (spawned workers do not inherit the
+    worker server's threads). Pools are never shut down while other jobs
+    may be using them, only discarded once broken.
+    """
+    with _pools_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            pool = _pools[workers] = ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"))
+        return pool
+
+def discard_pool(pool):
+    """
+    Forget a pool whose worker crashed; the next stage starts a new one.
+    """
+    with _pools_lock:
+        for workers in [w for w, p in _pools.items() if p is pool]:
+            del _pools[workers]
+    pool.shutdown(wait=False)
+
+def write_frame(frame, owned=True):
+    """
+    Copy frame into a new shared memory block as an Arrow IPC stream and
+    return the block's name. owned=False hands the block over to the
+    process that reads it, which removes it.
+    """
+    import pyarrow as pa
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    sink = pa.MockOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    shm = shared_memory.SharedMemory(create=True, size=max(sink.size(), 1))
+    buffer = pa.py_buffer(shm.buf)
+    try:
+        stream = pa.FixedSizeBufferWriter(buffer)
+        with pa.ipc.new_stream(stream, table.schema) as writer:
+            writer.write_table(table)
+        stream.close()
+    except Exception:
+        del buffer
+        shm.close()
+        shm.unlink()
+        raise
+    # Arrow must drop its view of the block before it can be closed
+    del writer, stream, buffer
+    shm.close()
+    if not owned:
+        # Otherwise this process's resource tracker would remove it again at exit
+        resource_tracker.unregister(shm._name, "shared_memory")
+    return shm.name
+
+def read_frame(name, unlink=False):
+    """
+    Load the DataFrame stored by write_frame. The block is copied out in one
+    piece and closed (and removed with unlink=True).
+    """
+    import pyarrow as pa
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        data = bytes(shm.buf)
+    finally:
+        shm.close()
+        if unlink:
+            shm.unlink()
+    return pa.ipc.open_stream(pa.py_buffer(data)).read_all().to_pandas()
+
+def release(names):
+    for name in names:
+        try:
+            shm = shared_memory.SharedMemory(name=name)
+        except FileNotFoundError:
+            continue
+        shm.close()
+        shm.unlink()
+
+def run_shard(name, stage):
+    """
+    Worker side: fit and transform one column shard. Returns the name of the
+    block holding the result, the fitted params and the report (see
+    Op.report_key) of every step, and the errors.
+    """
+    errors = []
+    frame = read_frame(name)
+    frame = run_stage(frame, stage, lambda e: errors.append(str(e)))
+    reports = [step.get(OPS[step["op"]].report_key) for step in stage]
+    return write_frame(frame, owned=False), [step["params"] for step in stage], reports, errors
+
+def column_local(stage):
+    return all(
+        step.get("skipped") or not (OPS[step["op"]].cross_column or OPS[step["op"]].changes_rows)
+        for step in stage
+    )
+
+def partition_columns(frame, columns, shards):
+    """
+    Split columns into shards of similar size in bytes (largest first, each
+    to the lightest shard).
+    """
+    sizes = frame[columns].memory_usage(index=False, deep=False)
+    groups = [[] for _ in range(shards)]
+    loads = [0] * shards
+    for col in sorted(columns, key=lambda c: -sizes[c]):
+        lightest = loads.index(min(loads))
+        groups[lightest].append(col)
+        loads[lightest] += sizes[col]
+    return [[c for c in columns if c in group] for group in groups if group]
+
+def merge_params(step, parts):
+    """
+    Combine the params fitted on each shard. Per-column dicts (fill values,
+    means, vocabularies, ...) are merged in the step's column order.
+    """
+    parts = [p for p in parts if p is not None]
+    if not parts:
+        return None
+    merged = {}
+    for params in parts:
+        for key, value in params.items():
+            if isinstance(value, dict):
+                merged.setdefault(key, {}).update(value)
+            else:
+                merged.setdefault(key, value)
+    order = step["columns"] or []
+    for key, value in merged.items():
+        if isinstance(value, dict):
+            merged[key] = {**{c: value[c] for c in order if c in value}, **value}
+    return merged
+
+def run_stage_parallel(frame, stage, workers, log_error):
+    """
+    Run a stage over column shards in the process pool. Returns the result,
+    or None when the stage should run sequentially instead.
+    """
+    if not column_local(stage) or frame.memory_usage(index=False, deep=False).sum() < PARALLEL_MIN_BYTES:
+        return None
+    active = [step for step in stage if not step.get("skipped")]
+    columns = []
+    for step in active:
+        columns.extend(c for c in step["columns"] or [] if c in frame.columns and c not in columns)
+    if len(columns) < 2:
+        return None
+
+    shards = partition_columns(frame, columns, min(workers, len(columns)))
+    inputs = []
+    try:
+        for shard in shards:
+            inputs.append(write_frame(frame[shard].reset_index(drop=True)))
+    except Exception:
+        # Columns Arrow cannot represent (e.g. mixed-type objects)
+        release(inputs)
+        return None
+
+    pool = get_pool(workers)
+    futures = []
+    try:
+        for name, shard in zip(inputs, shards):
+            shard_stage = copy.deepcopy(stage)
+            for step in shard_stage:
+                if step["columns"] is not None:
+                    step["columns"] = [c for c in step["columns"] if c in shard]
+            futures.append(pool.submit(run_shard, name, shard_stage))
+    except (RuntimeError, BrokenProcessPool):
+        # Another job discarded this pool after a crash; run the stage sequentially
+        for future in futures:
+            future.cancel()
+        wait(futures)
+        # Shards that already ran left their results in shared memory
+        release(inputs + [f.result()[0] for f in futures if not f.cancelled() and f.exception() is None])
+        return None
+
+    outputs = []
+    failed = False
+    for future in futures:
+        try:
+            out_name, params, reports, errors = future.result()
+            outputs.append((read_frame(out_name, unlink=True), params, reports))
+            failed = failed or bool(errors)
+        except Exception as e:
+            # A crashed worker breaks the whole pool; start a new one next time
+            log_error(e)
+            failed = True
+    release(inputs)
+    if failed and any(future.exception() is not None for future in futures):
+        discard_pool(pool)
+    if failed:
+        return None
+
+    for i, step in enumerate(stage):
+        op = OPS[step["op"]]
+        if op.needs_fit and not step.get("skipped"):
+            # Only shards that hold some of the step's columns fitted anything
+            parts = [params[i] for shard, (_, params, _) in zip(shards, outputs) if set(shard) & set(step["columns"])]
+            step["params"] = merge_params(step, parts)
+        if op.report_key and not step.get("skipped") and any(reports[i] is not None for _, _, reports in outputs):
+            # Column-wise steps report per column, and shards have disjoint columns
+            step[op.report_key] = {k: v for _, _, reports in outputs for k, v in (reports[i] or {}).items()}
+
+    untouched = frame.drop(columns=columns)
+    parts = [untouched]
+    for shard_frame, _, _ in outputs:
+        shard_frame.index = frame.index
+        parts.append(shard_frame)
+    return pd.concat(parts, axis=1)[empty_result_columns(frame, stage)]
+
+def empty_result_columns(frame, stage):
+    """
+    Columns the stage produces, in sequential order, found by applying its
+    fitted transforms to an empty frame.
+    """
+    empty = frame.head(0).copy()
+    for step in stage:
+        if step.get("skipped"):
+            continue
+        # A copy, so the step's report is not replaced by that of the empty frame
+        empty = OPS[step["op"]].transform(empty, dict(step), OPS[step["op"]].start_pass(step))
+    return list(empty.columns)
@@ -0,0 +1,476 @@
+import json
+import time
+from preprocessor_metrics import (StepProfiler, add_time, column_buffers, copied_columns, frame_stats, peak_rss,
+                                  reset_peak_rss)
+from preprocessor_ops import OPS, new_step
+
+# The prompt list is compiled into a plan: an ordered list of steps, each with
+# a fit phase (gather statistics) and a transform phase (apply them). At run
+# time consecutive steps are grouped into stages. Every statistics-based step
+# in a stage is fitted from the same input, so the stage needs one scan to
+# fit and one fused pass to transform instead of one of each per step.
+#
+# A fit step can only join the current stage when no earlier step in the
+# stage changes the rows it sees (filter, dedup), changes column dtypes or
+# adds columns (type conversion, encoding, PCA), or writes one of its columns.
+#
+# Before that, optimize_plan moves drops, filters and dedup ahead of steps
+# they commute with, and once a stage is fitted transform_order runs its
+# filters before the other transforms that do not touch the filtered columns,
+# so less data flows through the rest of the plan with the same result.
+
+def compile_plan(actions, target_column, columns, options=None):
+    """
+    Build a plan from (op name, prompt) or (op name, prompt, intent info)
+    actions. Target one-hot encoding is always the last step. options holds
+    job-level settings for the ops, e.g. {"quantiles": "exact" | "approximate"};
+    the steps are reordered by optimize_plan unless "optimize" is false.
+    """
+    steps = []
+    for action in actions:
+        step = new_step(action[0], action[1])
+        if len(action) > 2:
+            # How the prompt was classified (see preprocessor.classify_prompts)
+            step["intent"] = action[2]
+        steps.append(step)
+    steps.append(new_step("encode_target", target_column))
+    plan = {"target_column": target_column, "columns": list(columns), "steps": steps, "options": dict(options or {})}
+    if plan["options"].get("optimize", True):
+        optimize_plan(plan)
+    return plan
+
+def prompt_columns(step, ctx):
+    """
+    Columns of a drop, type conversion, dedup (its subset; empty for whole
+    rows) or compiled filter, which only depend on the prompt; None for
+    other steps and for filters run through DataFrame.query.
+    """
+    op = OPS[step["op"]]
+    if step["op"] == "filter_rows":
+        if step["columns"] is None:
+            op.resolve(step, None, ctx)
+        return step["columns"] if step["params"]["predicate"] is not None else None
+    if step["op"] in ("drop_columns", "fix_data_types", "remove_duplicates"):
+        probe = dict(step)
+        op.resolve(probe, None, ctx)
+        return probe["columns"]
+    return None
+
+def can_precede(step, other, ctx):
+    """
+    True when step gives the same output if it runs right before other
+    instead of right after it.
+    """
+    other_op = OPS[other["op"]]
+    if step["op"] == "drop_columns":
+        # Column-local steps resolve and fit every column on its own, so
+        # their work on the dropped columns is simply never done
+        if not other_op.cross_column:
+            return True
+        if other["op"] == "filter_rows":
+            predicate_columns = prompt_columns(other, ctx)
+            return predicate_columns is not None and not set(predicate_columns) & set(prompt_columns(step, ctx))
+        if other["op"] == "remove_duplicates":
+            # Dedup over a subset of columns ignores the others
+            subset = prompt_columns(other, ctx)
+            return bool(subset) and not set(subset) & set(prompt_columns(step, ctx))
+        return False
+    if step["op"] == "filter_rows":
+        columns = prompt_columns(step, ctx)
+        if columns is None:
+            return False
+        if other["op"] == "remove_duplicates":
+            # Rows dedup treats as copies pass or fail the filter together
+            return dedup_keeps_filter(prompt_columns(other, ctx), columns)
+        if other["op"] in ("drop_columns", "fix_data_types"):
+            return not set(columns) & set(prompt_columns(other, ctx))
+        return False
+    if step["op"] == "remove_duplicates":
+        # Dedup over a subset also drops rows that differ elsewhere, which
+        # changes the statistics of the other columns
+        return other_op.dedup_invariant and not prompt_columns(step, ctx)
+    return False
+
+def dedup_keeps_filter(subset, columns):
+    """
+    True when a filter on columns gives the same rows before or after a
+    dedup over subset (empty for whole rows).
+    """
+    return not subset or set(columns) <= set(subset)
+
+def optimize_plan(plan):
+    """
+    Move steps earlier where that cannot change the output:
+
+    - drop_columns ahead of column-local steps and of compiled filters on
+      other columns, so the dropped columns are neither processed nor,
+      when nothing cross-column remains in front, loaded
+    - compiled filter_rows ahead of dedup (over whole rows or a subset that
+      includes the filtered columns) and of drops and type conversions of
+      other columns
+    - drop_columns also ahead of dedup over a subset of other columns
+    - whole-row remove_duplicates ahead of min-max scaling and label
+      encoding, whose statistics ignore repeated rows
+
+    Each step moves as far forward as these rules allow, in prompt order.
+    The moves are recorded in plan["optimizer"].
+    """
+    ctx = plan_context(plan)
+    steps = plan["steps"]
+    moves = []
+    for i in range(len(steps)):
+        step = steps[i]
+        target = i
+        while target > 0 and can_precede(step, steps[target - 1], ctx):
+            target -= 1
+        if target < i:
+            moves.append({
+                "op": step["op"],
+                "prompt": step["prompt"],
+                "from": i,
+                "to": target,
+                "moved_before": [s["op"] for s in steps[target:i]]
+            })
+            steps.insert(target, steps.pop(i))
+    plan["optimizer"] = {"moves": moves, "order": [step["op"] for step in steps]}
+    return plan
+
+def transform_commutes(columns, other):
+    """
+    True when a filter on columns may run before the fitted transform of
+    other: other neither writes, converts nor drops those columns, and does
+    not depend on the whole row.
+    """
+    if other.get("skipped"):
+        return True
+    if other["op"] == "remove_duplicates":
+        return other["columns"] is not None and dedup_keeps_filter(other["columns"], columns)
+    if other["op"] == "filter_rows" or OPS[other["op"]].cross_column or other["columns"] is None:
+        return False
+    return not columns.intersection(other["columns"])
+
+def transform_order(steps):
+    """
+    Order in which to apply the transforms of fitted steps, as positions in
+    steps. Fitted transforms work row by row, so every compiled filter can
+    run before the steps ahead of it that do not touch its columns and the
+    rows it removes are never transformed; the statistics stay those of the
+    unfiltered input. Moved filters get "hoisted_past" (the ops they now
+    run before).
+    """
+    order = []
+    for i, step in enumerate(steps):
+        position = len(order)
+        if step["op"] == "filter_rows" and not step.get("skipped") and \
+                (step["params"] or {}).get("predicate") is not None:
+            columns = set(step["columns"])
+            while position > 0 and transform_commutes(columns, steps[order[position - 1]]):
+                position -= 1
+            if position < len(order):
+                step["hoisted_past"] = [steps[j]["op"] for j in order[position:]]
+        order.insert(position, i)
+    return order
+
+def prunable_columns(plan):
+    """
+    Columns that drop_columns steps remove before any step that looks at
+    other columns than its own. They never affect the output, so they need
+    not be loaded at all.
+    """
+    ctx = plan_context(plan)
+    prunable = []
+    for step in plan["steps"]:
+        op = OPS[step["op"]]
+        if op.cross_column:
+            break
+        if op.drops_columns:
+            probe = dict(step)
+            op.resolve(probe, None, ctx)
+            prunable.extend(c for c in probe["columns"] if c not in prunable)
+    return prunable
+
+def pushdown_filters(plan):
+    """
+    filter_rows steps whose predicate the loader may use to skip rows: the
+    compiled ones preceded only by column drops (not of their columns),
+    dedup (keeping the first copy of each row commutes with filtering on
+    the columns it compares) and other such filters. The steps still run;
+    the loader only leaves out rows they would remove. Returns (predicate
+    or None, steps).
+    """
+    ctx = plan_context(plan)
+    dropped = set()
+    subsets = []
+    pushed = []
+    for step in plan["steps"]:
+        op = OPS[step["op"]]
+        if step.get("skipped"):
+            continue
+        if step["op"] == "filter_rows":
+            if step["columns"] is None:
+                op.resolve(step, None, ctx)
+            predicate = step["params"]["predicate"]
+            if predicate is None or dropped.intersection(step["columns"]) or \
+                    not all(dedup_keeps_filter(subset, step["columns"]) for subset in subsets):
+                break
+            pushed.append(step)
+        elif op.drops_columns:
+            dropped.update(prompt_columns(step, ctx))
+        elif step["op"] == "remove_duplicates":
+            subsets.append(prompt_columns(step, ctx))
+        else:
+            break
+    if not pushed:
+        return None, []
+    predicates = [step["params"]["predicate"] for step in pushed]
+    return (predicates[0] if len(predicates) == 1 else {"op": "and", "args": predicates}), pushed
+
+def plan_context(plan):
+    return {"target_column": plan["target_column"], "columns": plan["columns"], "options": plan.get("options", {}),
+            "load_schema": plan.get("load_schema") or {"category": [], "dates": {}, "float32": []}}
+
+def form_stage(steps, start, frame, ctx, log_error):
+    """
+    Resolve steps[start:] against frame (the stage input) and return the end
+    index of the stage that starts at start.
+    """
+    dropped = set()
+    written = set()
+    barrier = False
+    end = start
+    while end < len(steps):
+        step = steps[end]
+        op = OPS[step["op"]]
+        if step.get("skipped"):
+            end += 1
+            continue
+
+        try:
+            if step["columns"] is None:
+                op.resolve(step, frame, ctx)
+                step["columns"] = [c for c in step["columns"] if c not in dropped]
+        except Exception as e:
+            log_error(e)
+            step["skipped"] = True
+            end += 1
+            continue
+
+        if op.needs_fit and end > start and (barrier or written.intersection(step["columns"])):
+            # Must be resolved again on the output of this stage
+            step["columns"] = None
+            break
+
+        if op.changes_rows or op.changes_schema:
+            barrier = True
+        if op.drops_columns:
+            dropped.update(step["columns"])
+        else:
+            written.update(step["columns"])
+        end += 1
+    return end
+
+def run_stage(frame, stage, log_error, copy_free=False, profiler=None, reorder=False):
+    """
+    Fit every statistics-based step of a stage from the same input, then
+    apply the stage in one pass (filters first where transform_order allows,
+    with reorder). Every step gets "metrics": fit and
+    transform wall time, rows, columns and bytes before and after it, and
+    the peak RSS while it ran.
+
+    With copy_free, filter and dedup steps only narrow a row mask; the rows
+    are taken once, before the next step that needs them or at the end of
+    the stage, and every other step is checked for copying columns it does
+    not write.
+    """
+    profiler = profiler or StepProfiler(None, [])
+    fit_peaks = {}
+    for i, step in enumerate(stage):
+        op = OPS[step["op"]]
+        if step.get("skipped") or not op.needs_fit:
+            continue
+        reset_peak_rss()
+        started = time.perf_counter()
+        try:
+            with profiler.step(step):
+                state = op.new_state(step)
+                op.update(state, frame, step)
+                step["params"] = op.finalize(state, step)
+        except Exception as e:
+            log_error(e)
+            step["skipped"] = True
+        add_time(step, "fit_seconds", started)
+        fit_peaks[i] = peak_rss()
+
+    mask = None
+    stats = frame_stats(frame)
+    metrics = None
+    for i in (transform_order(stage) if reorder else range(len(stage))):
+        step = stage[i]
+        if step.get("skipped"):
+            continue
+        op = OPS[step["op"]]
+        deferred = copy_free and op.changes_rows
+        reset_peak_rss()
+        started = time.perf_counter()
+        if mask is not None and not deferred:
+            frame, mask = frame[mask], None
+            stats = frame_stats(frame)
+        rows_in = stats["rows"] if mask is None else int(mask.sum())
+        buffers = column_buffers(frame) if copy_free and not deferred else None
+        try:
+            with profiler.step(step):
+                if deferred:
+                    mask = op.select(frame, step, op.start_pass(step), mask)
+                else:
+                    frame = op.transform(frame, step, op.start_pass(step))
+        except Exception as e:
+            log_error(e)
+        add_time(step, "transform_seconds", started)
+        out = stats if deferred else frame_stats(frame)
+        metrics = step["metrics"]
+        metrics.update({
+            "rows_in": rows_in,
+            "rows_out": out["rows"] if mask is None else int(mask.sum()),
+            "columns_in": stats["columns"],
+            "columns_out": out["columns"],
+            "bytes_in": stats["bytes"],
+            "bytes_out": out["bytes"],
+            "peak_rss_bytes": max_peak(fit_peaks.get(i), peak_rss())
+        })
+        if buffers is not None:
+            metrics["copied_columns"] = copied_columns(buffers, frame, set(step["columns"] or []))
+        stats = out
+
+    if mask is not None:
+        # The rows removed by the stage's trailing filter/dedup steps
+        reset_peak_rss()
+        started = time.perf_counter()
+        frame = frame[mask]
+        out = frame_stats(frame)
+        metrics["transform_seconds"] += time.perf_counter() - started
+        metrics["bytes_out"] = out["bytes"]
+        metrics["peak_rss_bytes"] = max_peak(metrics["peak_rss_bytes"], peak_rss())
+    return frame
+
+def max_peak(*peaks):
+    peaks = [p for p in peaks if p is not None]
+    return max(peaks) if peaks else None
+
+def enable_copy_on_write():
+    """
+    Make column assignments share the untouched columns of a frame instead of
+    copying them (always the case from pandas 3). The option is process-wide,
+    so it is set once at import rather than toggled per job while other
+    threads run theirs.
+    """
+    import pandas as pd
+    if int(pd.__version__.split(".")[0]) < 3:
+        pd.set_option("mode.copy_on_write", True)
+
+enable_copy_on_write()
+
+def run_plan(frame, plan, log_error, start=0, checkpoint=None):
+    """
+    Execute a plan on an in-memory DataFrame and return the result. Steps that
+    fail to fit are skipped; a failing transform leaves the frame as it was.
+    With plan option "workers" above 1, large column-local stages are split
+    into column shards and run in a process pool (their steps only report
+    the stage's wall time). Plan option "copy_free" defers row filtering to
+    avoid whole-frame copies between steps, and "profile_dir" saves a
+    cProfile dump of every step run in this process. Unless "optimize" is
+    false, the filters of a stage are applied before its other transforms.
+
+    start > 0 resumes a plan whose steps[:start] are already fitted and
+    applied to frame. checkpoint(end, frame), when given, is called after
+    every stage with the frame after steps[:end].
+    """
+    ctx = plan_context(plan)
+    workers = ctx["options"].get("workers", 1)
+    copy_free = ctx["options"].get("copy_free", False)
+    reorder = ctx["options"].get("optimize", True)
+    steps = plan["steps"]
+    profiler = StepProfiler(ctx["options"].get("profile_dir"), steps)
+    stage_index = steps[start - 1].get("stage", -1) + 1 if start else 0
+    while start < len(steps):
+        end = form_stage(steps, start, frame, ctx, log_error)
+        stage = steps[start:end]
+        for step in stage:
+            step["stage"] = stage_index
+
+        result = None
+        if workers > 1:
+            from preprocessor_parallel import run_stage_parallel
+            started = time.perf_counter()
+            result = run_stage_parallel(frame, stage, workers, log_error)
+            if result is not None:
+                for step in stage:
+                    if not step.get("skipped"):
+                        step["metrics"] = {"workers": workers}
+                        add_time(step, "stage_seconds", started)
+        frame = result if result is not None else run_stage(frame, stage, log_error, copy_free, profiler, reorder)
+        if checkpoint is not None:
+            checkpoint(end, frame)
+
+        start = end
+        stage_index += 1
+    profiler.dump(log_error)
+    return frame
+
+# Optional step keys copied to the summary
+SUMMARY_KEYS = ("intent", "cached", "pushdown", "hoisted_past", "dedup", "coercion", "target_encoding", "metrics",
+                "profile", "profile_partial")
+
+def plan_summary(plan):
+    """
+    Compact description of the executed plan for Output.json.
+    """
+    return [
+        {
+            "op": step["op"],
+            "prompt": step["prompt"],
+            "stage": step.get("stage"),
+            "columns": step["columns"] or [],
+            "skipped": bool(step.get("skipped")),
+            **{key: step[key] for key in SUMMARY_KEYS if key in step}
+        }
+        for step in plan["steps"]
+    ]
+
+PIPELINE_FORMAT = "dataset-manager-pipeline"
+PIPELINE_VERSION = 1
+
+def save_pipeline(plan, path):
+    """
+    Save a fitted plan (steps with resolved columns and fitted params) as JSON
+    so it can be applied to new data without re-classifying or re-fitting.
+    """
+    pipeline = {
+        "format": PIPELINE_FORMAT,
+        "version": PIPELINE_VERSION,
+        "target_column": plan["target_column"],
+        "columns": plan["columns"],
+        # dtype hints the plan was fitted with (see preprocessor_schema.load_schema)
+        "load_schema": plan_context(plan)["load_schema"],
+        "steps": [
+            {
+                "op": step["op"],
+                "prompt": step["prompt"],
+                "columns": step["columns"],
+                "params": step["params"],
+                "skipped": bool(step.get("skipped"))
+            }
+            for step in plan["steps"]
+        ]
+    }
+    with open(path, "w") as f:
+        json.dump(pipeline, f, indent=2, default=str)
+
+def load_pipeline(path):
+    with open(path) as f:
+        pipeline = json.load(f)
+    if pipeline.get("format") != PIPELINE_FORMAT or pipeline.get("version") != PIPELINE_VERSION:
+        raise ValueError(f"{path} is not a version {PIPELINE_VERSION} preprocessing pipeline")
+    for step in pipeline["steps"]:
+        if step["op"] not in OPS:
+            raise ValueError(f"Unknown operation in pipeline: {step['op']}")
+    return pipeline
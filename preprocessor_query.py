@@ -0,0 +1,493 @@
+import datetime
+import re
+import numpy as np
+import pandas as pd
+
+# Compiler for filter_rows prompts. A prompt such as
+#
+#   age > 30 and city == 'Paris'
+#   keep rows where income is at least 50000 and region is not null
+#   remove rows whose status is one of (closed, cancelled)
+#
+# is parsed into a predicate tree of plain dicts (so it can be saved in a
+# pipeline) and evaluated column-wise with vectorized comparisons, without
+# going through DataFrame.query. Literals are typed when parsed (number,
+# string, bool, null) and converted to the column's dtype when evaluated.
+#
+# The same tree can be checked against Parquet row-group statistics
+# (min/max/null count) to skip row groups that cannot match, which lets a
+# filter that runs before any other row-dependent step be pushed down into
+# the loader.
+#
+# Node shapes:
+#   {"op": "==" | "!=" | ">" | ">=" | "<" | "<=", "column": c, "value": v}
+#   {"op": "==" | "!=" | ">" | ">=" | "<" | "<=", "column": c, "other": c2}  (column to column)
+#   {"op": "between", "column": c, "low": v, "high": v}
+#   {"op": "in", "column": c, "values": [...]}
+#   {"op": "isnull", "column": c}
+#   {"op": "contains" | "startswith" | "endswith", "column": c, "value": s}
+#   {"op": "and" | "or", "args": [node, ...]}
+#   {"op": "not", "arg": node}
+
+COMPARISONS = ["==", "!=", ">", ">=", "<", "<="]
+STRING_MATCHES = ["contains", "startswith", "endswith"]
+ORDERED = [">", ">=", "<", "<=", "between"]
+
+# Word forms of the operators, longest first so that "greater than or equal
+# to" wins over "greater than"
+OPERATOR_PHRASES = sorted([
+    ("is greater than or equal to", ">="), ("greater than or equal to", ">="), ("is at least", ">="),
+    ("at least", ">="), ("is no less than", ">="), ("no less than", ">="),
+    ("is less than or equal to", "<="), ("less than or equal to", "<="), ("is at most", "<="),
+    ("at most", "<="), ("is no more than", "<="), ("no more than", "<="),
+    ("is greater than", ">"), ("greater than", ">"), ("is more than", ">"), ("more than", ">"),
+    ("is above", ">"), ("above", ">"), ("is over", ">"), ("over", ">"), ("is after", ">"), ("after", ">"),
+    ("is less than", "<"), ("less than", "<"), ("is fewer than", "<"), ("fewer than", "<"),
+    ("is below", "<"), ("below", "<"), ("is under", "<"), ("under", "<"), ("is before", "<"), ("before", "<"),
+    ("is not equal to", "!="), ("not equal to", "!="), ("does not equal", "!="), ("is not", "!="),
+    ("is equal to", "=="), ("equal to", "=="), ("equals", "=="), ("is", "=="),
+    ("is between", "between"), ("between", "between"),
+    ("is not one of", "not in"), ("not in", "not in"), ("is one of", "in"), ("in", "in"),
+    ("contains", "contains"), ("includes", "contains"),
+    ("starts with", "startswith"), ("begins with", "startswith"), ("ends with", "endswith")
+], key=lambda phrase: -len(phrase[0].split()))
+OPERATOR_PHRASES = [(tuple(words.split()), op) for words, op in OPERATOR_PHRASES]
+
+SYMBOLS = {"==": "==", "=": "==", "!=": "!=", "<>": "!=", ">=": ">=", "=>": ">=", "<=": "<=", "=<": "<=",
+           ">": ">", "<": "<"}
+NULL_WORDS = {"null", "none", "nan", "na", "missing", "empty", "blank"}
+BOOL_WORDS = {"true": True, "false": False, "yes": True, "no": False}
+
+# Leading "keep rows where" / "remove records whose"; removing negates the predicate
+PROMPT_PREFIX = re.compile(
+    r"^\s*(?:please\s+)?(?:(?P<verb>filter|keep|select|show|return|get|only|remove|drop|exclude|delete|discard)\s+)?"
+    r"(?:out\s+)?(?:only\s+)?(?:the\s+|all\s+)?(?:rows?|records?|entries|samples|data)?\s*"
+    r"(?:where|whose|with|if|when|having|that have|for which)\s+",
+    re.IGNORECASE
+)
+NEGATING_VERBS = {"remove", "drop", "exclude", "delete", "discard"}
+
+TOKEN = re.compile(
+    r"\s*(?:(?P<quoted>'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\")|(?P<backtick>`[^`]*`)"
+    r"|(?P<symbol>==|!=|<>|>=|=>|<=|=<|&&|\|\||[=<>()\[\],&|!])|(?P<word>[^\s()\[\],'\"`=!<>&|]+))"
+)
+
+# Only quotes and backslashes are escaped in quoted literals; anything else,
+# non-ASCII text included, is taken as written
+ESCAPE = re.compile(r"\\([\\'\"])")
+
+def tokenize(text):
+    tokens = []
+    position = 0
+    text = text.strip()
+    while position < len(text):
+        match = TOKEN.match(text, position)
+        if not match or match.end() == position:
+            raise ValueError(f"Cannot read filter condition at: {text[position:]!r}")
+        position = match.end()
+        if match.group("quoted"):
+            tokens.append(("string", ESCAPE.sub(r"\1", match.group("quoted")[1:-1])))
+        elif match.group("backtick"):
+            tokens.append(("column", match.group("backtick")[1:-1]))
+        elif match.group("symbol"):
+            tokens.append(("symbol", match.group("symbol")))
+        elif match.group("word"):
+            tokens.append(("word", match.group("word")))
+    return tokens
+
+def column_key(name):
+    return re.sub(r"[\s_]+", " ", str(name).strip().lower())
+
+class Parser:
+    """
+    Recursive-descent parser: or-expressions of and-expressions of (possibly
+    negated) conditions or parenthesized expressions.
+    """
+
+    def __init__(self, tokens, columns):
+        self.tokens = tokens
+        self.position = 0
+        self.columns = {column_key(c): c for c in columns}
+        self.longest_column = max((len(k.split()) for k in self.columns), default=1)
+
+    def peek(self, offset=0):
+        index = self.position + offset
+        return self.tokens[index] if index < len(self.tokens) else (None, None)
+
+    def peek_word(self, offset=0):
+        kind, value = self.peek(offset)
+        return value.lower() if kind == "word" else None
+
+    def take(self):
+        token = self.peek()
+        self.position += 1
+        return token
+
+    def at_symbol(self, *symbols):
+        kind, value = self.peek()
+        return kind == "symbol" and value in symbols
+
+    def parse(self):
+        node = self.parse_or()
+        if self.position < len(self.tokens):
+            raise ValueError(f"Unexpected {self.peek()[1]!r} in filter condition")
+        return node
+
+    def parse_or(self):
+        args = [self.parse_and()]
+        while self.peek_word() == "or" or self.at_symbol("|", "||"):
+            self.take()
+            args.append(self.parse_and())
+        return args[0] if len(args) == 1 else {"op": "or", "args": args}
+
+    def parse_and(self):
+        args = [self.parse_not()]
+        while self.peek_word() == "and" or self.at_symbol("&", "&&", ","):
+            self.take()
+            args.append(self.parse_not())
+        return args[0] if len(args) == 1 else {"op": "and", "args": args}
+
+    def parse_not(self):
+        if self.peek_word() == "not" or self.at_symbol("!"):
+            self.take()
+            return {"op": "not", "arg": self.parse_not()}
+        if self.at_symbol("("):
+            self.take()
+            node = self.parse_or()
+            if not self.at_symbol(")"):
+                raise ValueError("Missing ')' in filter condition")
+            self.take()
+            return node
+        return self.parse_condition()
+
+    def match_column(self, quoted=True):
+        """
+        Take the column named at the current position and return it, or
+        None. quoted=False leaves quoted strings to be read as values.
+        """
+        kind, value = self.peek()
+        if (kind == "column" or quoted and kind == "string") and column_key(value) in self.columns:
+            self.take()
+            return self.columns[column_key(value)]
+        # Column names may span several words ("monthly income")
+        for length in range(self.longest_column, 0, -1):
+            words = [self.peek(i) for i in range(length)]
+            if any(kind != "word" for kind, _ in words):
+                continue
+            key = column_key(" ".join(value for _, value in words))
+            if key in self.columns:
+                self.position += length
+                return self.columns[key]
+        return None
+
+    def parse_column(self):
+        column = self.match_column()
+        if column is not None:
+            return column
+        kind, value = self.peek()
+        if kind is None:
+            raise ValueError("Filter condition ends where a column name was expected")
+        raise ValueError(f"Unknown column {value!r} in filter condition")
+
+    def parse_operator(self):
+        kind, value = self.peek()
+        if kind == "symbol" and value in SYMBOLS:
+            self.take()
+            return SYMBOLS[value]
+        for words, op in OPERATOR_PHRASES:
+            if all(self.peek_word(i) == word for i, word in enumerate(words)):
+                self.position += len(words)
+                return op
+        raise ValueError(f"Expected a comparison after the column name, found {value!r}")
+
+    def parse_value(self):
+        kind, value = self.take()
+        if kind == "string":
+            return value
+        if kind != "word":
+            raise ValueError(f"Expected a value in filter condition, found {value!r}")
+        lower = value.lower()
+        if lower in BOOL_WORDS:
+            return BOOL_WORDS[lower]
+        number = parse_number(value)
+        if number is not None:
+            return number
+        # Unquoted text runs until the next connective ("city is New York and ...")
+        words = [value]
+        while self.peek()[0] == "word" and self.peek_word() not in ("and", "or"):
+            words.append(self.take()[1])
+        return " ".join(words)
+
+    def parse_list(self):
+        closing = None
+        if self.at_symbol("(", "["):
+            closing = ")" if self.take()[1] == "(" else "]"
+        values = [self.parse_value()]
+        while self.at_symbol(",") or (closing is None and self.peek_word() == "or"):
+            self.take()
+            values.append(self.parse_value())
+        if closing is not None:
+            if not self.at_symbol(closing):
+                raise ValueError(f"Missing {closing!r} in filter condition")
+            self.take()
+        return values
+
+    def parse_condition(self):
+        column = self.parse_column()
+        # "is null", "is not missing"
+        negate = False
+        offset = 0
+        if self.peek_word() == "is":
+            offset = 1
+            if self.peek_word(1) == "not":
+                negate = True
+                offset = 2
+        if self.peek_word(offset) in NULL_WORDS:
+            self.position += offset + 1
+            node = {"op": "isnull", "column": column}
+            return {"op": "not", "arg": node} if negate else node
+
+        op = self.parse_operator()
+        if op == "between":
+            low = self.parse_value()
+            if self.peek_word() != "and":
+                raise ValueError("Expected 'and' in between condition")
+            self.take()
+            return {"op": "between", "column": column, "low": low, "high": self.parse_value()}
+        if op in ("in", "not in"):
+            node = {"op": "in", "column": column, "values": self.parse_list()}
+            return {"op": "not", "arg": node} if op == "not in" else node
+        if op in COMPARISONS:
+            # "a > b" compares two columns, as in DataFrame.query
+            other = self.match_column(quoted=False)
+            if other is not None:
+                return {"op": op, "column": column, "other": other}
+        value = self.parse_value()
+        if op in STRING_MATCHES:
+            return {"op": op, "column": column, "value": str(value)}
+        if isinstance(value, str) and value.lower() in NULL_WORDS and op in ("==", "!="):
+            node = {"op": "isnull", "column": column}
+            return {"op": "not", "arg": node} if op == "!=" else node
+        return {"op": op, "column": column, "value": value}
+
+def parse_number(text):
+    try:
+        number = float(text.replace("_", ""))
+    except ValueError:
+        return None
+    if not np.isfinite(number):
+        return None
+    return int(number) if number.is_integer() and not re.search(r"[.eE]", text) else number
+
+def parse_predicate(text, columns):
+    """
+    Compile a filter prompt into a predicate tree over the given columns.
+    Raises ValueError when the prompt is not a condition this grammar
+    understands.
+    """
+    match = PROMPT_PREFIX.match(text)
+    negate = False
+    if match:
+        negate = (match.group("verb") or "").lower() in NEGATING_VERBS
+        text = text[match.end():]
+    text = text.strip().rstrip(".")
+    node = Parser(tokenize(text), columns).parse()
+    return {"op": "not", "arg": node} if negate else node
+
+def predicate_columns(node):
+    if node["op"] in ("and", "or"):
+        columns = []
+        for arg in node["args"]:
+            columns.extend(c for c in predicate_columns(arg) if c not in columns)
+        return columns
+    if node["op"] == "not":
+        return predicate_columns(node["arg"])
+    if "other" in node and node["other"] != node["column"]:
+        return [node["column"], node["other"]]
+    return [node["column"]]
+
+def typed_value(values, value):
+    """
+    Convert a literal to the dtype of the column it is compared with.
+    """
+    if value is None:
+        return value
+    dtype = values.dtype
+    if pd.api.types.is_bool_dtype(dtype):
+        if isinstance(value, str):
+            if value.lower() not in BOOL_WORDS:
+                raise ValueError(f"Cannot compare boolean column {values.name!r} with {value!r}")
+            return BOOL_WORDS[value.lower()]
+        return bool(value)
+    if pd.api.types.is_numeric_dtype(dtype):
+        if isinstance(value, str):
+            number = parse_number(value)
+            if number is None:
+                raise ValueError(f"Cannot compare numeric column {values.name!r} with {value!r}")
+            return number
+        return value
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        timestamp = pd.Timestamp(str(value))
+        if getattr(dtype, "tz", None) is not None and timestamp.tzinfo is None:
+            timestamp = timestamp.tz_localize(dtype.tz)
+        return timestamp
+    # Text columns: numbers in the prompt are compared as their text
+    if isinstance(value, bool):
+        return str(value)
+    if isinstance(value, (int, float)):
+        return str(value)
+    return value
+
+def as_mask(result):
+    if isinstance(result, pd.Series):
+        return result.to_numpy(dtype=bool, na_value=False)
+    return np.asarray(result, dtype=bool)
+
+def evaluate(node, frame):
+    """
+    Boolean numpy mask of the rows of frame that satisfy node. Comparisons
+    with missing values are False, as in DataFrame.query.
+    """
+    op = node["op"]
+    if op == "and":
+        mask = evaluate(node["args"][0], frame)
+        for arg in node["args"][1:]:
+            mask = mask & evaluate(arg, frame)
+        return mask
+    if op == "or":
+        mask = evaluate(node["args"][0], frame)
+        for arg in node["args"][1:]:
+            mask = mask | evaluate(arg, frame)
+        return mask
+    if op == "not":
+        return ~evaluate(node["arg"], frame)
+
+    values = frame[node["column"]]
+    if op in ORDERED and isinstance(values.dtype, pd.CategoricalDtype) and not values.cat.ordered:
+        # Text loaded as categories compares like the text
+        values = values.astype(values.cat.categories.dtype)
+    if op == "isnull":
+        return as_mask(values.isna())
+    if op == "between":
+        low = typed_value(values, node["low"])
+        high = typed_value(values, node["high"])
+        return as_mask((values >= low) & (values <= high))
+    if op == "in":
+        return as_mask(values.isin([typed_value(values, v) for v in node["values"]]))
+    if op in STRING_MATCHES:
+        return as_mask(getattr(values.astype("string").str, op)(node["value"]))
+    if "other" in node:
+        value = frame[node["other"]]
+        if op in ORDERED and isinstance(value.dtype, pd.CategoricalDtype) and not value.cat.ordered:
+            value = value.astype(value.cat.categories.dtype)
+    else:
+        value = typed_value(values, node["value"])
+    if op == "==":
+        return as_mask(values == value)
+    if op == "!=":
+        return as_mask(values != value)
+    if op == ">":
+        return as_mask(values > value)
+    if op == ">=":
+        return as_mask(values >= value)
+    if op == "<":
+        return as_mask(values < value)
+    return as_mask(values <= value)
+
+def stats_value(sample, value):
+    """
+    Convert a literal to the type of a row-group statistic, or None when
+    they cannot be compared.
+    """
+    if value is None or sample is None:
+        return None
+    if isinstance(sample, bool):
+        return value if isinstance(value, bool) else None
+    if isinstance(sample, (int, float)):
+        if isinstance(value, str):
+            return parse_number(value)
+        return None if isinstance(value, bool) else value
+    if isinstance(sample, str):
+        return str(value)
+    if isinstance(sample, (datetime.datetime, datetime.date)):
+        try:
+            timestamp = pd.Timestamp(str(value))
+        except ValueError:
+            return None
+        return timestamp.to_pydatetime() if isinstance(sample, datetime.datetime) else timestamp.date()
+    return None
+
+def may_match(node, stats):
+    """
+    False only when no row of a row group with the given statistics
+    ({column: {"min", "max", "null_count", "num_values"}}) can satisfy node.
+    """
+    op = node["op"]
+    if op == "and":
+        return all(may_match(arg, stats) for arg in node["args"])
+    if op == "or":
+        return any(may_match(arg, stats) for arg in node["args"])
+    if op == "not":
+        inner = node["arg"]
+        if inner["op"] == "isnull" and inner["column"] in stats:
+            column = stats[inner["column"]]
+            return column.get("null_count") is None or column["null_count"] < column["num_values"]
+        return True
+    column = stats.get(node["column"])
+    if column is None or "other" in node:
+        return True
+    if op == "isnull":
+        return column.get("null_count") is None or column["null_count"] > 0
+    low, high = column.get("min"), column.get("max")
+    if low is None or high is None:
+        return True
+    try:
+        if op == "between":
+            lo, hi = stats_value(low, node["low"]), stats_value(low, node["high"])
+            return lo is None or hi is None or (high >= lo and low <= hi)
+        if op == "in":
+            values = [stats_value(low, v) for v in node["values"]]
+            return any(v is None or low <= v <= high for v in values)
+        if op in STRING_MATCHES:
+            return True
+        value = stats_value(low, node["value"])
+        if value is None:
+            return True
+        if op == "==":
+            return low <= value <= high
+        if op == "!=":
+            return not (low == high == value and column.get("null_count") == 0)
+        if op == ">":
+            return high > value
+        if op == ">=":
+            return high >= value
+        if op == "<":
+            return low < value
+        return low <= value
+    except TypeError:
+        return True
+
+def row_group_stats(metadata, index):
+    row_group = metadata.row_group(index)
+    stats = {}
+    for i in range(row_group.num_columns):
+        column = row_group.column(i)
+        statistics = column.statistics
+        entry = {"num_values": row_group.num_rows, "null_count": None, "min": None, "max": None}
+        if statistics is not None:
+            if statistics.has_null_count:
+                entry["null_count"] = statistics.null_count
+            if statistics.has_min_max:
+                entry["min"], entry["max"] = statistics.min, statistics.max
+        stats[column.path_in_schema] = entry
+    return stats
+
+def matching_row_groups(path, node):
+    """
+    Indices of the row groups of a Parquet file whose statistics do not
+    rule node out, and the total number of row groups.
+    """
+    import pyarrow.parquet as pq
+    metadata = pq.ParquetFile(path).metadata
+    total = metadata.num_row_groups
+    return [i for i in range(total) if may_match(node, row_group_stats(metadata, i))], total
@@ -0,0 +1,154 @@
+import numpy as np
+import pandas as pd
+from pandas.tseries.api import guess_datetime_format
+from preprocessor_io import detect_format, iter_dataset_chunks
+
+# Schema sniffing before the full load, with "infer_schema": true. A sample of the file decides which
+# string columns are low-cardinality (loaded as "category") and which hold
+# dates in a single format (parsed on load with that format). After loading,
+# complete float columns are downcast to float32 when that is lossless for
+# every value, so the compact schema never changes the data. Float columns
+# with missing values stay float64 so fill values are not rounded. Integer
+# columns stay int64: a narrower type would wrap around in expressions later
+# in the plan (a filter on "a * 100" with a as int8).
+
+SAMPLE_ROWS = 10000
+# A string column becomes "category" when its sample has at most this share of distinct values
+CATEGORY_MAX_RATIO = 0.5
+
+def date_format_of(values):
+    """
+    The strftime format every non-null value matches, or None.
+    """
+    values = values.dropna().astype(str)
+    if values.empty:
+        return None
+    for dayfirst in (False, True):
+        fmt = guess_datetime_format(values.iloc[0], dayfirst=dayfirst)
+        if fmt is not None and pd.to_datetime(values, errors="coerce", format=fmt).notna().all():
+            return fmt
+    return None
+
+def sniff_schema(path, fmt=None, sample_rows=SAMPLE_ROWS):
+    """
+    Infer load options from the first sample_rows rows. Returns
+    {"category": [...], "dates": {column: format}, "row_bytes": {column: bytes}},
+    where row_bytes is the average size per row of each column when loaded
+    without hints.
+    """
+    fmt = detect_format(path, fmt)
+    # Columnar files already carry their dtypes; for them only the size estimate is used
+    sample = next(iter_dataset_chunks(path, sample_rows, fmt), None)
+    if sample is None:
+        return {"category": [], "dates": {}, "row_bytes": {}}
+
+    category = []
+    dates = {}
+    if fmt == "csv":
+        for col in sample.select_dtypes(include=["object", "string"]).columns:
+            values = sample[col]
+            date_format = date_format_of(values)
+            if date_format:
+                dates[col] = date_format
+            elif values.nunique() <= max(1, CATEGORY_MAX_RATIO * values.count()):
+                category.append(col)
+
+    row_bytes = sample.memory_usage(deep=True, index=False) / max(len(sample), 1)
+    return {"category": category, "dates": dates, "row_bytes": {c: float(b) for c, b in row_bytes.items()}}
+
+def load_kwargs(fmt, schema, usecols=None):
+    """
+    Reader keyword arguments for the sniffed schema and the needed columns.
+    """
+    if fmt != "csv":
+        return {"columns": usecols} if usecols is not None else {}
+    kwargs = {}
+    if usecols is not None:
+        kwargs["usecols"] = usecols
+    keep = set(usecols) if usecols is not None else None
+    dates = {c: f for c, f in schema["dates"].items() if keep is None or c in keep}
+    if dates:
+        kwargs["parse_dates"] = list(dates)
+        kwargs["date_format"] = dates
+    category = {c: "category" for c in schema["category"] if keep is None or c in keep}
+    if category:
+        kwargs["dtype"] = category
+    return kwargs
+
+def prepare_load(path, fmt, columns, prunable, infer_schema=False, chunked=False):
+    """
+    Sniff path and build the reader arguments that skip the prunable columns.
+    Without infer_schema (the default) only the columns are pruned. Chunked reads get no
+    category hints because every chunk would get its own set of categories.
+    Returns (reader kwargs, schema, skipped columns).
+    """
+    fmt = detect_format(path, fmt)
+    skipped = [c for c in columns if c in prunable]
+    usecols = [c for c in columns if c not in prunable] if skipped else None
+    schema = sniff_schema(path, fmt)
+    if not infer_schema:
+        schema["category"] = []
+        schema["dates"] = {}
+    elif chunked:
+        schema["category"] = []
+    return load_kwargs(fmt, schema, usecols), schema, skipped
+
+def load_schema(schema, float32=()):
+    """
+    The dtype hints a plan was loaded with: {"category": [...], "dates":
+    {column: format}, "float32": [...]}. Columns they turned into dates are
+    still chosen as text columns by the ops. Saved pipelines replay the dates
+    and float32 columns when applied, so they see the data as it was fitted.
+    """
+    return {"category": list(schema["category"]), "dates": dict(schema["dates"]), "float32": list(float32)}
+
+def prune_row_groups(path, fmt, predicate, steps, read_kwargs):
+    """
+    For Parquet input, make read_kwargs read only the row groups whose
+    min/max/null statistics leave a chance of matching predicate (from
+    pushdown_filters) and record {"row_groups", "row_groups_read"} under
+    "pushdown" on its filter steps. Other formats carry no statistics.
+    """
+    if predicate is None or detect_format(path, fmt) != "parquet":
+        return
+    from preprocessor_query import matching_row_groups
+    groups, total = matching_row_groups(path, predicate)
+    if len(groups) < total:
+        read_kwargs["row_groups"] = groups
+    for step in steps:
+        step["pushdown"] = {"row_groups": total, "row_groups_read": len(groups)}
+
+def compact_frame(frame, columns=None):
+    """
+    Downcast float columns (all, or the given ones) in place where it loses
+    nothing.
+    """
+    for col in frame.columns if columns is None else [c for c in columns if c in frame.columns]:
+        values = frame[col]
+        if values.dtype == np.float64 and not values.hasnans:
+            as_float32 = values.astype(np.float32)
+            if (as_float32.astype(np.float64) == values).all():
+                frame[col] = as_float32
+    return frame
+
+def load_report(schema, skipped_columns, rows, frame=None):
+    """
+    Memory report for Output.json. The default size is estimated from the
+    sample; the loaded size is measured when the loaded frame is given.
+    """
+    row_bytes = schema["row_bytes"]
+    report = {
+        "skipped_columns": list(skipped_columns),
+        "category_columns": list(schema["category"]),
+        "date_columns": list(schema["dates"]),
+        "estimated_default_bytes": int(sum(row_bytes.values()) * rows),
+        "skipped_bytes": int(sum(row_bytes.get(c, 0.0) for c in skipped_columns) * rows)
+    }
+    if frame is not None:
+        loaded = int(frame.memory_usage(deep=True, index=False).sum())
+        report["category_columns"] = [c for c in schema["category"] if c in frame.columns]
+        report["date_columns"] = [c for c in schema["dates"] if c in frame.columns]
+        report["dtypes"] = {c: str(t) for c, t in frame.dtypes.items()}
+        report["loaded_bytes"] = loaded
+        report["saved_bytes"] = max(report["estimated_default_bytes"] - loaded, 0)
+    return report
@@ -0,0 +1,196 @@
+import numpy as np
+import pandas as pd
+
+# Mergeable quantile sketch (KLL, Karnin-Lang-Liberty 2016) for median
+# imputation and other quantile-based steps on data that does not fit in
+# memory. Values are kept in levels; an item at level h stands for 2**h
+# original values. When a level outgrows its capacity it is sorted and every
+# other item (random offset) is promoted to the level above, halving it.
+#
+# Error bound: with k = 200 the rank of a returned quantile is within about
+# 1.7% of the requested rank (99% confidence), i.e. the median lies between
+# the 48.3th and 51.7th percentiles. The error shrinks as 1/k; memory is
+# O(k) items per column regardless of the number of rows. While fewer than
+# k values have been seen nothing is compacted and results are exact.
+
+DEFAULT_K = 200
+# Capacity of a level relative to the level above it
+CAPACITY_RATIO = 2.0 / 3.0
+MIN_CAPACITY = 8
+
+def rank_error(k=DEFAULT_K):
+    """
+    Normalized rank error bound (99% confidence) for sketch size k.
+    """
+    return 3.4 / k
+
+class QuantileSketch:
+    def __init__(self, k=DEFAULT_K, seed=0):
+        self.k = k
+        self.count = 0
+        self.levels = [np.empty(0)]
+        self.rng = np.random.default_rng(seed)
+
+    def capacity(self, level):
+        depth = len(self.levels) - 1 - level
+        return max(MIN_CAPACITY, int(np.ceil(self.k * CAPACITY_RATIO ** depth)))
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        self.count += len(values)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self.compress()
+
+    def merge(self, other):
+        """
+        Add another sketch (e.g. built from a different chunk or process) to this one.
+        """
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for h, items in enumerate(other.levels):
+            self.levels[h] = np.concatenate([self.levels[h], items])
+        self.count += other.count
+        self.compress()
+
+    def compress(self):
+        h = 0
+        while h < len(self.levels):
+            items = self.levels[h]
+            if len(items) > self.capacity(h):
+                items = np.sort(items)
+                # An odd item out stays at this level
+                keep = items[len(items) - len(items) % 2:]
+                promoted = items[self.rng.integers(2):len(items) - len(items) % 2:2]
+                self.levels[h] = keep
+                if h + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                self.levels[h + 1] = np.concatenate([self.levels[h + 1], promoted])
+            h += 1
+
+    def is_exact(self):
+        return len(self.levels) == 1
+
+    def quantiles(self, qs):
+        """
+        Approximate values at the quantiles qs (0..1); exact (same as
+        np.quantile) while nothing has been compacted.
+        """
+        if self.count == 0:
+            return [float("nan") for _ in qs]
+        if self.is_exact():
+            return [float(v) for v in np.quantile(self.levels[0], qs)]
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 2.0 ** h) for h, items in enumerate(self.levels)])
+        order = np.argsort(values, kind="stable")
+        values = values[order]
+        cumulative = np.cumsum(weights[order])
+        positions = np.searchsorted(cumulative, np.asarray(qs) * cumulative[-1], side="left")
+        return [float(values[min(p, len(values) - 1)]) for p in positions]
+
+    def median(self):
+        return self.quantiles([0.5])[0]
+
+    def to_dict(self):
+        return {"k": self.k, "count": self.count, "levels": [items.tolist() for items in self.levels]}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data["k"])
+        sketch.count = data["count"]
+        sketch.levels = [np.asarray(items, dtype=np.float64) for items in data["levels"]]
+        return sketch
+
+# Distinct counts for dataset profiles. Values are hashed to 64 bits; the
+# distinct hashes are kept exactly up to EXACT_DISTINCT, after which the
+# sketch switches to HyperLogLog (Flajolet et al. 2007) with 2**p one-byte
+# registers: the first p bits of a hash pick a register, which keeps the
+# largest position of the first 1 bit in the rest. With p = 14 (16 KB per
+# column) the relative standard error is 1.04 / sqrt(2**14) = 0.8%.
+
+EXACT_DISTINCT = 1024
+DEFAULT_P = 14
+
+def leading_zeros(words):
+    """
+    Leading zero bits of each uint64 in words, computed on 32-bit halves so
+    the float log2 is exact.
+    """
+    high = (words >> np.uint64(32)).astype(np.float64)
+    low = (words & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    zeros = np.where(high > 0, 31 - np.floor(np.log2(np.maximum(high, 1))),
+                     63 - np.floor(np.log2(np.maximum(low, 1))))
+    zeros[(high == 0) & (low == 0)] = 64
+    return zeros.astype(np.uint8)
+
+class DistinctSketch:
+    def __init__(self, p=DEFAULT_P):
+        self.p = p
+        self.exact = np.empty(0, dtype=np.uint64)
+        self.registers = None
+
+    def update(self, hashes):
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        if self.registers is None:
+            self.exact = np.union1d(self.exact, hashes)
+            if len(self.exact) <= EXACT_DISTINCT:
+                return
+            hashes, self.exact = self.exact, np.empty(0, dtype=np.uint64)
+            self.registers = np.zeros(2 ** self.p, dtype=np.uint8)
+        index = (hashes >> np.uint64(64 - self.p)).astype(np.int64)
+        rest = hashes << np.uint64(self.p)
+        ranks = np.minimum(leading_zeros(rest), 64 - self.p) + 1
+        np.maximum.at(self.registers, index, ranks.astype(np.uint8))
+
+    def is_exact(self):
+        return self.registers is None
+
+    def count(self):
+        if self.registers is None:
+            return len(self.exact)
+        m = len(self.registers)
+        estimate = 0.7213 / (1 + 1.079 / m) * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        empty = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and empty:
+            # Linear counting is more accurate for small cardinalities
+            estimate = m * np.log(m / empty)
+        return int(round(estimate))
+
+# Most frequent values for dataset profiles: counts are merged chunk by chunk
+# and cut back to the TOP_CAPACITY largest whenever they grow beyond it. A
+# value dropped once restarts from zero, so counts can be too low by at most
+# the largest count ever dropped (reported as the error bound); values
+# common enough to be among the top few are never dropped in practice.
+
+TOP_CAPACITY = 10000
+
+class TopValues:
+    def __init__(self, capacity=TOP_CAPACITY):
+        self.capacity = capacity
+        self.counts = None
+        self.max_dropped = 0
+
+    def update(self, values):
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # Count the values, not the codes, so chunks with different categories line up
+            values = values.astype(values.cat.categories.dtype)
+        counts = values.value_counts(dropna=True, sort=False)
+        if self.counts is not None:
+            # Hash-based merge; Series.add would sort the union of both indexes
+            counts = pd.concat([self.counts, counts]).groupby(level=0, sort=False).sum()
+        if len(counts) > self.capacity:
+            counts = counts.sort_values(ascending=False, kind="stable")
+            self.max_dropped = max(self.max_dropped, int(counts.iloc[self.capacity]))
+            counts = counts.iloc[:self.capacity]
+        self.counts = counts
+
+    def top(self, n):
+        """
+        The n most frequent (value, count) pairs, most frequent first.
+        """
+        if self.counts is None:
+            return []
+        top = self.counts.sort_values(ascending=False, kind="stable").iloc[:n]
+        return [(value, int(count)) for value, count in top.items()]
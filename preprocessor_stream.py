@@ -0,0 +1,215 @@
+import os
+import time
+from preprocessor_io import DatasetWriter, detect_format, iter_dataset_chunks, read_columns
+from preprocessor_metrics import StepProfiler, add_time
+from preprocessor_ops import OPS
+from preprocessor_plan import (compile_plan, form_stage, plan_context, prunable_columns, pushdown_filters,
+                               transform_order)
+from preprocessor_schema import compact_frame, load_kwargs, load_report, load_schema, prepare_load, prune_row_groups
+
+# Streaming execution for CSVs larger than memory. The file is read in chunks;
+# every stage of the compiled plan that has statistics-based steps gets one
+# fit pass (replaying the earlier steps on each chunk) and a final pass
+# applies all steps and appends to the output, so peak memory is bounded by
+# the chunk size rather than the file size. Fitted steps are replayed and
+# applied in transform_order, so compiled filters drop rows as early as they
+# can.
+
+DEFAULT_CHUNKSIZE = int(os.environ.get("PREPROCESSOR_CHUNKSIZE", "100000"))
+# Files above this size are streamed when the job does not choose a mode
+STREAM_THRESHOLD_BYTES = int(os.environ.get("PREPROCESSOR_STREAM_THRESHOLD_BYTES", str(512 * 1024 * 1024)))
+
+def should_stream(data, dataset_path):
+    """
+    Decide the execution mode from the job's "execution" key
+    ("memory", "stream" or "auto", the default).
+    """
+    mode = data.get("execution", "auto")
+    if mode == "stream":
+        return True
+    if mode == "memory":
+        return False
+    try:
+        return os.path.getsize(dataset_path) > STREAM_THRESHOLD_BYTES
+    except OSError:
+        return False
+
+def iter_chunks(dataset_path, chunksize, fmt=None, read_kwargs=None):
+    return iter_dataset_chunks(dataset_path, chunksize, fmt, **(read_kwargs or {}))
+
+def fitted_order(steps, ctx):
+    """
+    steps in the order their transforms are applied (see transform_order).
+    """
+    if not ctx["options"].get("optimize", True):
+        return list(steps)
+    return [steps[i] for i in transform_order(steps)]
+
+def apply_steps(chunk, steps, run_states, ctx, log_error, profiler=None):
+    """
+    Transform one chunk. With a profiler (the final pass), every step adds
+    its time and row/column counts to its metrics.
+    """
+    for step, run_state in zip(steps, run_states):
+        if step.get("skipped"):
+            continue
+        op = OPS[step["op"]]
+        shape_in = chunk.shape
+        started = time.perf_counter()
+        try:
+            if step["columns"] is None:
+                op.resolve(step, chunk, ctx)
+            if profiler is None:
+                chunk = op.transform(chunk, step, run_state)
+            else:
+                with profiler.step(step):
+                    chunk = op.transform(chunk, step, run_state)
+        except Exception as e:
+            # Report a failing step once, not once per chunk
+            if not step.get("failed"):
+                step["failed"] = True
+                log_error(e)
+        if profiler is not None:
+            add_time(step, "transform_seconds", started)
+            metrics = step["metrics"]
+            metrics["rows_in"] = metrics.get("rows_in", 0) + shape_in[0]
+            metrics["rows_out"] = metrics.get("rows_out", 0) + len(chunk)
+            metrics["columns_in"] = shape_in[1]
+            metrics["columns_out"] = chunk.shape[1]
+    return chunk
+
+def fit_stage(dataset_path, steps, start, ctx, chunksize, log_error, input_format=None, read_kwargs=None,
+              profiler=None):
+    """
+    One pass over the file: replay steps[:start] on every chunk and feed the
+    result to the accumulators of every statistics-based step in the stage
+    that starts at start. The stage is formed on the first chunk. Returns the
+    end index of the stage.
+    """
+    profiler = profiler or StepProfiler(None, [])
+    previous = fitted_order(steps[:start], ctx)
+    run_states = [OPS[s["op"]].start_pass(s) for s in previous]
+    end = None
+    fit_steps = []
+    states = []
+    for chunk in iter_chunks(dataset_path, chunksize, input_format, read_kwargs):
+        chunk = apply_steps(chunk, previous, run_states, ctx, log_error)
+        if end is None:
+            end = form_stage(steps, start, chunk, ctx, log_error)
+            fit_steps = [s for s in steps[start:end] if OPS[s["op"]].needs_fit and not s.get("skipped")]
+            if not fit_steps:
+                return end
+            states = [OPS[s["op"]].new_state(s) for s in fit_steps]
+        for step, state in zip(fit_steps, states):
+            if step.get("skipped"):
+                continue
+            started = time.perf_counter()
+            try:
+                with profiler.step(step):
+                    OPS[step["op"]].update(state, chunk, step)
+            except Exception as e:
+                log_error(e)
+                step["skipped"] = True
+            add_time(step, "fit_seconds", started)
+
+    if end is None:
+        # Empty file: nothing to fit
+        return len(steps)
+    for step, state in zip(fit_steps, states):
+        if step.get("skipped"):
+            continue
+        started = time.perf_counter()
+        try:
+            with profiler.step(step):
+                step["params"] = OPS[step["op"]].finalize(state, step)
+        except Exception as e:
+            log_error(e)
+            step["skipped"] = True
+        add_time(step, "fit_seconds", started)
+    return end
+
+def stream_preprocess(dataset_path, actions, target_column, output_path, log_error, chunksize=DEFAULT_CHUNKSIZE,
+                      io_options=None, plan_options=None):
+    """
+    Run the (op name, prompt[, intent info]) actions over dataset_path chunk
+    by chunk and write the result to output_path. io_options may hold
+    "input_format", "output_format", "compression" and "infer_schema";
+    plan_options is passed to compile_plan. Returns (plan, rows, columns) of
+    the output; plan["load_report"] lists the skipped columns and every step
+    gets "metrics" summed over the chunks.
+    """
+    io_options = io_options or {}
+    input_format = io_options.get("input_format")
+    columns = read_columns(dataset_path, input_format)
+    plan = compile_plan(actions, target_column, columns, plan_options)
+    steps = plan["steps"]
+
+    # Columns dropped before they matter are never read
+    read_kwargs, schema, skipped = prepare_load(
+        dataset_path, input_format, columns, prunable_columns(plan), io_options.get("infer_schema", False), chunked=True
+    )
+    plan["load_schema"] = load_schema(schema)
+    ctx = plan_context(plan)
+    profiler = StepProfiler(ctx["options"].get("profile_dir"), steps)
+    # Row groups no pushed-down filter can match are never read
+    prune_row_groups(dataset_path, input_format, *pushdown_filters(plan), read_kwargs)
+
+    # One fit pass per stage of statistics-based steps
+    start = 0
+    stage_index = 0
+    while start < len(steps):
+        end = fit_stage(dataset_path, steps, start, ctx, chunksize, log_error, input_format, read_kwargs, profiler)
+        for step in steps[start:end]:
+            step["stage"] = stage_index
+        start = end
+        stage_index += 1
+
+    # Apply pass
+    rows, out_columns = write_transformed(plan, fitted_order(steps, ctx), dataset_path, output_path, log_error,
+                                          chunksize, io_options, read_kwargs, profiler)
+    profiler.dump(log_error)
+    plan["load_report"] = load_report(schema, skipped, rows)
+    return plan, rows, out_columns
+
+def write_transformed(plan, steps, input_path, output_path, log_error, chunksize, io_options, read_kwargs=None,
+                      profiler=None):
+    ctx = plan_context(plan)
+    float32 = ctx["load_schema"].get("float32")
+    profiler = profiler or StepProfiler(None, [])
+    run_states = [OPS[s["op"]].start_pass(s) for s in steps]
+    writer = DatasetWriter(output_path, io_options.get("output_format"), io_options.get("compression"))
+    rows = 0
+    out_columns = None
+    try:
+        for chunk in iter_chunks(input_path, chunksize, io_options.get("input_format"), read_kwargs):
+            if float32:
+                compact_frame(chunk, float32)
+            chunk = apply_steps(chunk, steps, run_states, ctx, log_error, profiler)
+            writer.write(chunk)
+            rows += len(chunk)
+            out_columns = list(chunk.columns)
+    finally:
+        if out_columns is None:
+            read_kwargs = read_kwargs or {}
+            out_columns = read_kwargs.get("usecols") or read_kwargs.get("columns") or \
+                read_columns(input_path, io_options.get("input_format"))
+        writer.close(out_columns)
+    return rows, out_columns
+
+def apply_plan_to_file(plan, input_path, output_path, log_error, chunksize=DEFAULT_CHUNKSIZE, io_options=None):
+    """
+    Transform input_path chunk by chunk with an already fitted plan. Every
+    transform is row-local once fitted (PCA included), so this works for
+    any file size. Date columns parsed when the plan was fitted are parsed
+    with the same formats and float32 columns downcast the same way.
+    Returns (rows, columns) of the output.
+    """
+    io_options = io_options or {}
+    input_format = detect_format(input_path, io_options.get("input_format"))
+    ctx = plan_context(plan)
+    present = set(read_columns(input_path, input_format))
+    dates = {c: f for c, f in ctx["load_schema"]["dates"].items() if c in present}
+    read_kwargs = load_kwargs(input_format, {"category": [], "dates": dates})
+    steps = [step for step in plan["steps"] if not step.get("skipped")]
+    return write_transformed(plan, fitted_order(steps, ctx), input_path, output_path, log_error,
+                             chunksize, io_options, read_kwargs)
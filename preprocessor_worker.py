@@ -0,0 +1,256 @@
+import os
+import queue
+import secrets
+import socket
+import threading
+import time
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener, Client
+
+# Only the standard library is imported at module level so the Flask app can
+# use submit_job()/ping() without having torch or sklearn installed.
+
+WORKER_HOST = "127.0.0.1"
+WORKER_PORT = int(os.environ.get("PREPROCESSOR_WORKER_PORT", "6001"))
+WORKER_ADDRESS = (WORKER_HOST, WORKER_PORT)
+# Requests are pickled, so only processes holding the key may connect. The
+# key comes from PREPROCESSOR_WORKER_AUTHKEY (hex) or else from a key file
+# readable only by its owner, created with a random key on first use, so a
+# restarted Flask app still reaches the worker an earlier run started.
+WORKER_KEY_FILE = os.environ.get("PREPROCESSOR_WORKER_KEY_FILE",
+                                 os.path.join(os.path.dirname(os.path.abspath(__file__)), ".preprocessor_worker_key"))
+
+def load_authkey(path=WORKER_KEY_FILE):
+    if os.environ.get("PREPROCESSOR_WORKER_AUTHKEY"):
+        return bytes.fromhex(os.environ["PREPROCESSOR_WORKER_AUTHKEY"])
+    key = secrets.token_bytes(32)
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        # Another process may have created it a moment ago
+        for _ in range(50):
+            with open(path) as f:
+                text = f.read().strip()
+            if text:
+                return bytes.fromhex(text)
+            time.sleep(0.01)
+        raise RuntimeError(f"Preprocessor worker key file is empty: {path}")
+    except OSError:
+        # No writable key file: the key only lives in this process and its children
+        os.environ["PREPROCESSOR_WORKER_AUTHKEY"] = key.hex()
+        return key
+    with os.fdopen(fd, "w") as f:
+        f.write(key.hex())
+    return key
+
+WORKER_AUTHKEY = load_authkey()
+
+class ClassificationBatcher:
+    """
+    Collects classification requests from concurrently running jobs and
+    encodes them together, so N jobs with M prompts each cost one encoder
+    call instead of N. Requests arriving within max_wait seconds of the
+    first one are merged into the same batch.
+    """
+
+    def __init__(self, embedder, label_embs, cache=None, max_wait=0.01, max_batch=256):
+        self.embedder = embedder
+        self.label_embs = label_embs
+        self.cache = cache
+        self.max_wait = max_wait
+        self.max_batch = max_batch
+        self.pending = queue.Queue()
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def classify(self, prompts):
+        if not prompts:
+            return []
+        request = {"prompts": list(prompts), "done": threading.Event(), "results": None, "error": None}
+        self.pending.put(request)
+        request["done"].wait()
+        if request["error"] is not None:
+            raise request["error"]
+        return request["results"]
+
+    def run(self):
+        import preprocessor
+
+        while True:
+            batch = [self.pending.get()]
+            size = len(batch[0]["prompts"])
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self.pending.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(request)
+                size += len(request["prompts"])
+
+            prompts = [p for request in batch for p in request["prompts"]]
+            try:
+                results = preprocessor.classify_batch(prompts, self.embedder, self.label_embs, top_k=1,
+                                                      cache=self.cache)
+                start = 0
+                for request in batch:
+                    end = start + len(request["prompts"])
+                    request["results"] = results[start:end]
+                    start = end
+            except Exception as e:
+                for request in batch:
+                    request["error"] = e
+            for request in batch:
+                request["done"].set()
+
+def handle_connection(conn, state):
+    """
+    Serve a single request: {"action": "ping" | "preprocess" | "apply" | "profile" | "shutdown", ...}
+    """
+    import preprocessor
+    # Per-step peak RSS is only measured while a single job runs
+    from preprocessor_metrics import job_running
+
+    try:
+        request = conn.recv()
+        action = request.get("action")
+
+        if action == "ping":
+            conn.send({
+                "status": "ok",
+                "model": preprocessor.MODEL_NAME,
+                "jobs_served": state["jobs_served"],
+                "intent_stats": preprocessor.get_intent_stats()
+            })
+        elif action == "preprocess":
+            with job_running():
+                ok = preprocessor.preprocess_dataset(
+                    request.get("input_file_path", "sampleinput.json"),
+                    request.get("output_csv", "Processed_Dataset.csv"),
+                    request.get("log_file", "Output.json"),
+                    classify_fn=state["batcher"].classify
+                )
+            with state["lock"]:
+                state["jobs_served"] += 1
+            conn.send({"status": "done", "result": ok})
+        elif action == "apply":
+            with job_running():
+                ok = preprocessor.apply_pipeline(
+                    request["pipeline_path"],
+                    request["input_csv"],
+                    request.get("output_csv", "Applied_Dataset.csv"),
+                    request.get("log_file", "Output.json")
+                )
+            conn.send({"status": "done", "result": ok})
+        elif action == "profile":
+            from dataset_profile import profile_dataset
+            with job_running():
+                profile = profile_dataset(request["dataset_path"])
+            conn.send({"status": "done", "profile": profile})
+        elif action == "shutdown":
+            conn.send({"status": "stopping"})
+            state["stop"].set()
+        else:
+            conn.send({"status": "error", "message": f"Unknown action: {action}"})
+    except Exception as e:
+        try:
+            conn.send({"status": "error", "message": str(e)})
+        except Exception:
+            pass
+    finally:
+        conn.close()
+
+def serve(address=WORKER_ADDRESS, authkey=WORKER_AUTHKEY):
+    """
+    Run the long-lived preprocessing worker. The embedder and the candidate
+    label embeddings are loaded once here and shared by every job.
+    """
+    import preprocessor
+
+    cache = preprocessor.open_intent_cache()
+    embedder, label_embs = preprocessor.load_classifier(cache=cache)
+    state = {
+        "batcher": ClassificationBatcher(embedder, label_embs, cache),
+        "jobs_served": 0,
+        "lock": threading.Lock(),
+        "stop": threading.Event()
+    }
+
+    try:
+        listener = Listener(address, authkey=authkey)
+    except OSError as e:
+        print(f"[X] Preprocessor worker cannot listen on {address[0]}:{address[1]}: {e}", flush=True)
+        raise SystemExit(1)
+    with listener:
+        print(f"[OK] Preprocessor worker listening on {address[0]}:{address[1]}", flush=True)
+        while not state["stop"].is_set():
+            try:
+                conn = listener.accept()
+            except (OSError, EOFError, AuthenticationError):
+                # A client without the key, or one that hung up mid-handshake
+                continue
+            threading.Thread(target=handle_connection, args=(conn, state), daemon=True).start()
+
+def port_in_use(address=WORKER_ADDRESS):
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.settimeout(1)
+        return sock.connect_ex(address) == 0
+
+def send_request(request, address=WORKER_ADDRESS, authkey=WORKER_AUTHKEY, timeout=None):
+    with Client(address, authkey=authkey) as conn:
+        conn.send(request)
+        if timeout is not None and not conn.poll(timeout):
+            raise TimeoutError(f"Preprocessor worker did not answer within {timeout} seconds")
+        return conn.recv()
+
+def ping(address=WORKER_ADDRESS, authkey=WORKER_AUTHKEY, timeout=5):
+    try:
+        return send_request({"action": "ping"}, address, authkey, timeout).get("status") == "ok"
+    except (OSError, EOFError, TimeoutError, AuthenticationError):
+        return False
+
+def submit_job(input_file_path, output_csv="Processed_Dataset.csv", log_file="Output.json",
+               address=WORKER_ADDRESS, authkey=WORKER_AUTHKEY, timeout=None):
+    """
+    Submit a preprocessing job to a running worker and wait for it to finish.
+    Returns the worker's reply, e.g. {"status": "done", "result": True}.
+    """
+    return send_request({
+        "action": "preprocess",
+        "input_file_path": input_file_path,
+        "output_csv": output_csv,
+        "log_file": log_file
+    }, address, authkey, timeout)
+
+def submit_apply(pipeline_path, input_csv, output_csv="Applied_Dataset.csv", log_file="Output.json",
+                 address=WORKER_ADDRESS, authkey=WORKER_AUTHKEY, timeout=None):
+    """
+    Transform a new CSV with a saved pipeline in the running worker.
+    """
+    return send_request({
+        "action": "apply",
+        "pipeline_path": pipeline_path,
+        "input_csv": input_csv,
+        "output_csv": output_csv,
+        "log_file": log_file
+    }, address, authkey, timeout)
+
+def submit_profile(dataset_path, address=WORKER_ADDRESS, authkey=WORKER_AUTHKEY, timeout=None):
+    """
+    Column summary of a dataset (see dataset_profile.profile_dataset),
+    computed or read from the cache by the running worker.
+    """
+    return send_request({"action": "profile", "dataset_path": dataset_path}, address, authkey, timeout)
+
+def shutdown(address=WORKER_ADDRESS, authkey=WORKER_AUTHKEY):
+    try:
+        send_request({"action": "shutdown"}, address, authkey, timeout=5)
+        # Wake the accept() loop so it sees the stop flag
+        ping(address, authkey, timeout=1)
+    except (OSError, EOFError, TimeoutError, AuthenticationError):
+        pass
+
+if __name__ == "__main__":
+    serve()
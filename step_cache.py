@@ -0,0 +1,219 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from intent_cache import DEFAULT_CACHE_DIR
+from preprocessor_io import require_pyarrow
+
+# Intermediate frames of in-memory runs, so a job that repeats the prompts
+# of an earlier job on the same file (typically with one prompt added or
+# changed at the end) resumes after the longest prefix of steps it shares
+# with it instead of reloading and recomputing everything.
+#
+# Every entry is the frame after steps[:k] of a plan, saved as an Arrow IPC
+# (Feather) file, which writes several times faster than Parquet, together
+# with the fitted state of those steps. Its key chains the
+# content hash of the dataset file, the load settings and the options that
+# change results with the op and prompt of each of the k steps.
+
+# The cache is off unless a job sets "step_cache": true or PREPROCESSOR_STEP_CACHE=1
+ENABLED_BY_DEFAULT = os.environ.get("PREPROCESSOR_STEP_CACHE", "0") == "1"
+DEFAULT_DIR = os.environ.get("PREPROCESSOR_STEP_CACHE_DIR", os.path.join(DEFAULT_CACHE_DIR, "steps"))
+DEFAULT_MAX_BYTES = int(os.environ.get("PREPROCESSOR_STEP_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+# Frames above this share of the cache size are not stored
+MAX_ENTRY_SHARE = 0.25
+# Plan options that change how steps run but not what they compute
+RUNTIME_OPTIONS = ("workers", "copy_free", "profile_dir", "optimize", "step_cache")
+# Step keys that describe one run rather than the fitted step
+RUN_KEYS = ("intent", "metrics", "profile", "pushdown", "hoisted_past", "cached")
+
+_fingerprints = {}
+_fingerprints_lock = threading.Lock()
+
+def file_fingerprint(path, block_size=1024 * 1024):
+    """
+    SHA-256 of the file's content, remembered per (path, size, mtime) so an
+    unchanged file is only hashed once per process.
+    """
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _fingerprints_lock:
+        if key in _fingerprints:
+            return _fingerprints[key]
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    with _fingerprints_lock:
+        _fingerprints[key] = digest.hexdigest()
+    return _fingerprints[key]
+
+def chain_key(previous, item):
+    raw = previous + "\0" + json.dumps(item, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def prefix_keys(dataset_path, read_kwargs, infer_schema, plan):
+    """
+    Cache keys of every plan prefix: keys[k] addresses the frame after
+    steps[:k] (keys[0] is the loaded dataset).
+    """
+    root = chain_key(file_fingerprint(dataset_path), {
+        "read": read_kwargs,
+        "infer_schema": infer_schema,
+        "target_column": plan["target_column"],
+        "options": {k: v for k, v in plan.get("options", {}).items() if k not in RUNTIME_OPTIONS}
+    })
+    keys = [root]
+    for step in plan["steps"]:
+        # Prompts differing only in spacing give the same step
+        keys.append(chain_key(keys[-1], [step["op"], " ".join(step["prompt"].split())]))
+    return keys
+
+class StepCache:
+    """
+    Size-capped LRU store of intermediate frames: Feather files in a
+    directory, indexed by a SQLite table like IntentCache.
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(os.path.join(directory, "index.sqlite"), check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS frames ("
+            "key TEXT PRIMARY KEY, steps TEXT NOT NULL, load_report TEXT, size INTEGER NOT NULL, "
+            "last_access REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS frames_last_access ON frames (last_access)")
+        self.conn.commit()
+
+    def frame_path(self, key):
+        return os.path.join(self.directory, key + ".feather")
+
+    def lookup(self, keys):
+        """
+        Longest cached prefix among keys (as built by prefix_keys). Returns
+        (k, frame, steps, load_report) for the frame after steps[:k], where
+        steps holds the fitted state of those k steps, or None.
+        """
+        from pyarrow import feather
+        with self.lock:
+            found = {}
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self.conn.execute(
+                    f"SELECT key, steps, load_report FROM frames WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                found.update((key, (steps, load_report)) for key, steps, load_report in rows)
+        for k in range(len(keys) - 1, -1, -1):
+            if keys[k] not in found:
+                continue
+            try:
+                frame = feather.read_table(self.frame_path(keys[k])).to_pandas()
+            except Exception:
+                # File removed or damaged behind the index's back
+                with self.lock:
+                    self.remove_locked(keys[k])
+                continue
+            with self.lock:
+                self.conn.execute("UPDATE frames SET last_access = ? WHERE key = ?", (time.time(), keys[k]))
+                self.conn.commit()
+            steps, load_report = found[keys[k]]
+            return k, frame, json.loads(steps), json.loads(load_report) if load_report else None
+        return None
+
+    def store(self, key, frame, steps, load_report=None):
+        """
+        Save the frame after steps (their fitted state is kept with it).
+        Returns False when the frame is too large for the cache or cannot be
+        converted to Arrow (e.g. sparse or mixed-type object columns).
+        """
+        size = int(frame.memory_usage(deep=True, index=True).sum())
+        if size > self.max_bytes * MAX_ENTRY_SHARE:
+            return False
+        state = [{k: v for k, v in step.items() if k not in RUN_KEYS} for step in steps]
+        path = self.frame_path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            import pyarrow as pa
+            from pyarrow import feather
+            state_json = json.dumps(state, default=str)
+            # The index is kept (filtered frames have gaps in it)
+            feather.write_feather(pa.Table.from_pandas(frame), tmp_path)
+            os.replace(tmp_path, path)
+        except Exception:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return False
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO frames (key, steps, load_report, size, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, state_json, json.dumps(load_report, default=str), os.path.getsize(path), time.time())
+            )
+            self.conn.commit()
+            self.evict()
+        return True
+
+    def remove_locked(self, key):
+        self.conn.execute("DELETE FROM frames WHERE key = ?", (key,))
+        self.conn.commit()
+        try:
+            os.remove(self.frame_path(key))
+        except OSError:
+            pass
+
+    def evict(self):
+        """
+        Drop least recently used frames until the cache fits in max_bytes.
+        Callers must hold self.lock.
+        """
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM frames").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        stale = []
+        for key, size in self.conn.execute("SELECT key, size FROM frames ORDER BY last_access"):
+            if total <= self.max_bytes:
+                break
+            stale.append(key)
+            total -= size
+        for key in stale:
+            self.remove_locked(key)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+_default_cache = None
+
+def open_step_cache(directory=DEFAULT_DIR, max_bytes=DEFAULT_MAX_BYTES):
+    """
+    Return the process-wide cache, or None when disabled with
+    PREPROCESSOR_CACHE=0 or when pyarrow is missing. The first call picks
+    the directory.
+    """
+    global _default_cache
+    if os.environ.get("PREPROCESSOR_CACHE", "1") == "0":
+        return None
+    if _default_cache is None:
+        try:
+            require_pyarrow("feather")
+            _default_cache = StepCache(directory, max_bytes)
+        except (ImportError, OSError, sqlite3.Error):
+            return None
+    return _default_cache
+
+def restore_steps(plan, cached_steps):
+    """
+    Copy the fitted state of cached steps into the first steps of plan and
+    mark them "cached".
+    """
+    for step, cached in zip(plan["steps"], cached_steps):
+        step.update({k: v for k, v in cached.items() if k not in ("op", "prompt")})
+        step["cached"] = True
@@ -0,0 +1,63 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from preprocessor_dedup import FingerprintSet, row_fingerprints
+from preprocessor_ops import OPS, new_step
+
+def frame(n=4000):
+    rng = np.random.default_rng(4)
+    return pd.DataFrame({
+        "a": rng.integers(0, 20, n),
+        "b": rng.choice(["x", "y", "z"], n),
+        "c": rng.integers(0, 10, n).astype(float)
+    })
+
+def dedup_chunks(data, run_state, subset=(), bits=64, chunksize=250):
+    step = new_step("remove_duplicates", "remove duplicates")
+    step["params"] = {"subset": list(subset), "fingerprint_bits": bits}
+    parts = [OPS["remove_duplicates"].transform(data.iloc[i:i + chunksize], step, run_state)
+             for i in range(0, len(data), chunksize)]
+    return pd.concat(parts), step
+
+@pytest.mark.parametrize("bits", [64, 128])
+@pytest.mark.parametrize("subset", [(), ("a", "b")])
+def test_spilled_set_matches_drop_duplicates(tmp_path, bits, subset):
+    data = frame()
+    run_state = FingerprintSet(bits, memory_bytes=128, spill_dir=str(tmp_path))
+    result, step = dedup_chunks(data, run_state, subset, bits)
+    expected = data.drop_duplicates(subset=list(subset) or None)
+    pd.testing.assert_frame_equal(result, expected)
+    report = step["dedup"]
+    assert report["spilled_fingerprints"] > 0
+    assert report["rows_checked"] == len(data)
+    assert report["duplicates_dropped"] == len(data) - len(expected)
+    assert len(run_state) == len(expected)
+
+def test_in_memory_set_does_not_spill():
+    data = frame()
+    run_state = FingerprintSet()
+    result, step = dedup_chunks(data, run_state)
+    pd.testing.assert_frame_equal(result, data.drop_duplicates())
+    assert step["dedup"]["spilled_fingerprints"] == 0
+
+def test_chunk_dtypes_do_not_change_fingerprints():
+    ints = pd.DataFrame({"a": pd.Series([1, 2, 3], dtype="int64"), "b": ["x", "y", "z"]})
+    floats = pd.DataFrame({"a": pd.Series([1.0, 2.0, 3.0]), "b": ["x", "y", "z"]})
+    assert (row_fingerprints(ints) == row_fingerprints(floats)).all()
+
+def test_large_integers_and_negative_zero_hash_alike_in_every_chunk():
+    big = 2 ** 53 + 1
+    ints = pd.DataFrame({"a": pd.Series([big, 5, 0], dtype="int64")})
+    floats = pd.DataFrame({"a": pd.Series([np.nan, 5.0, -0.0])})
+    nullable = pd.DataFrame({"a": pd.Series([big, None, 0], dtype="Int64")})
+    assert row_fingerprints(ints)[1] == row_fingerprints(floats)[1]
+    assert row_fingerprints(ints)[2] == row_fingerprints(floats)[2] == row_fingerprints(nullable)[2]
+    assert row_fingerprints(ints)[0] == row_fingerprints(nullable)[0]
+    assert row_fingerprints(floats)[0] == row_fingerprints(nullable)[1]
+    # Neighbours above 2**53 stay distinct
+    pair = row_fingerprints(pd.DataFrame({"a": [big, big - 1]}))
+    assert pair[0] != pair[1]
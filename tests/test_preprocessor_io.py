@@ -0,0 +1,41 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from preprocessor_io import DatasetWriter, read_dataset
+
+pytest.importorskip("pyarrow")
+
+CHUNKS = [
+    # "a" is all missing and "codes" are int64 in the first chunk
+    pd.DataFrame({"a": [np.nan, np.nan], "codes": [0, 1], "n": [1.5, 2.5]}),
+    pd.DataFrame({"a": ["x", "y"], "codes": [np.nan, 2.0], "n": [3.5, 4.5]}),
+    pd.DataFrame({"a": [np.nan, "z"], "codes": [3, 4], "n": [5.5, np.nan]}),
+]
+
+@pytest.mark.parametrize("fmt", ["parquet", "feather"])
+def test_stream_chunks_with_changing_types(tmp_path, fmt):
+    path = str(tmp_path / f"out.{fmt}")
+    writer = DatasetWriter(path, fmt)
+    for chunk in CHUNKS:
+        writer.write(chunk)
+    writer.close()
+
+    result = read_dataset(path, fmt)
+    assert result["a"].astype(object).where(result["a"].notna(), None).tolist() == [None, None, "x", "y", None, "z"]
+    assert result["codes"].tolist()[:2] == [0.0, 1.0] and np.isnan(result["codes"].iloc[2])
+    assert result["codes"].tolist()[3:] == [2.0, 3.0, 4.0]
+    assert result["n"].iloc[:5].tolist() == [1.5, 2.5, 3.5, 4.5, 5.5]
+    assert writer.rewrites == 1
+
+@pytest.mark.parametrize("fmt", ["parquet", "feather"])
+def test_stream_chunks_with_no_common_type(tmp_path, fmt):
+    path = str(tmp_path / f"out.{fmt}")
+    writer = DatasetWriter(path, fmt)
+    writer.write(pd.DataFrame({"v": [1, 2]}))
+    writer.write(pd.DataFrame({"v": ["three"]}))
+    writer.close()
+    assert read_dataset(path, fmt)["v"].tolist() == ["1", "2", "three"]
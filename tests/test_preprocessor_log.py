@@ -0,0 +1,63 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from preprocessor_log import SCHEMA_VERSION, EventSink, JobLog, read_job_result
+
+RESULT_KEYS = {"schema_version", "job_id", "task", "status", "message", "errors", "events"}
+
+def test_success_result_schema(tmp_path):
+    path = str(tmp_path / "Output.json")
+    log = JobLog(path)
+    log.event("dataset_loaded", rows=3)
+    log.finish("Dataset preprocessing completed successfully", output_file="out.csv")
+    with open(path) as f:
+        data = json.load(f)
+    assert set(data) == RESULT_KEYS | {"output_file"}
+    assert data["schema_version"] == SCHEMA_VERSION
+    assert data["status"] == "success"
+    assert data["errors"] == []
+    assert [e["event"] for e in data["events"]] == ["dataset_loaded", "job_finished"]
+    assert all(e["job_id"] == data["job_id"] for e in data["events"])
+
+def test_errors_change_status(tmp_path):
+    path = str(tmp_path / "Output.json")
+    log = JobLog(path)
+    log.error(ValueError("bad column"), step=2)
+    data = log.finish("done")
+    assert data["status"] == "completed_with_errors"
+    assert data["errors"] == ["bad column"]
+    error = data["events"][0]
+    assert (error["level"], error["error_type"], error["step"]) == ("error", "ValueError", 2)
+
+    log.fail()
+    assert read_job_result(path)["message"] == "bad column"
+    assert read_job_result(path)["status"] == "error"
+
+def test_unserializable_result_falls_back(tmp_path):
+    path = str(tmp_path / "Output.json")
+    JobLog(path).finish("done", broken={("a", "b"): 1})
+    data = read_job_result(path)
+    assert data["status"] == "error"
+    assert data["message"].startswith("Error writing output file")
+
+def test_read_legacy_error_lines(tmp_path):
+    path = str(tmp_path / "Output.json")
+    with open(path, "w") as f:
+        f.write(json.dumps({"error": "first"}) + "\n" + json.dumps({"error": "second"}) + "\n")
+    data = read_job_result(path)
+    assert (data["schema_version"], data["status"], data["message"]) == (0, "error", "second")
+    assert data["errors"] == ["first", "second"]
+    assert data["events"] == []
+
+def test_event_sink_rotates(tmp_path):
+    path = str(tmp_path / "events.jsonl")
+    sink = EventSink(path, max_bytes=200, backups=2)
+    for i in range(20):
+        sink.write([{"event": "tick", "i": i}])
+    assert os.path.getsize(path) <= 200
+    assert os.path.exists(path + ".1") and os.path.exists(path + ".2")
+    assert not os.path.exists(path + ".3")
+    with open(path) as f:
+        assert json.loads(f.readlines()[-1])["i"] == 19
@@ -0,0 +1,78 @@
+import os
+import sys
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from preprocessor_ops import TARGET_LABEL_MIN_CLASSES
+from preprocessor_plan import compile_plan, plan_summary, run_plan
+
+def encode_target(classes, encoding=None):
+    frame = pd.DataFrame({"x": range(200), "target": [f"c{i % classes:03d}" for i in range(200)]})
+    options = {"target_encoding": encoding} if encoding else {}
+    plan = compile_plan([], "target", list(frame.columns), options)
+    errors = []
+    result = run_plan(frame, plan, errors.append)
+    assert errors == []
+    return result, plan
+
+def test_auto_target_encoding_is_onehot_for_few_classes():
+    result, plan = encode_target(TARGET_LABEL_MIN_CLASSES)
+    assert result.shape[1] == 1 + TARGET_LABEL_MIN_CLASSES
+    step = plan["steps"][-1]
+    assert step["params"]["encoding"] == "onehot"
+    assert "requested" not in step["params"]
+    assert "target_encoding" not in plan_summary(plan)[-1]
+
+def test_auto_target_encoding_falls_back_to_labels_and_says_so():
+    result, plan = encode_target(TARGET_LABEL_MIN_CLASSES + 1)
+    assert list(result.columns) == ["x", "target"]
+    assert result["target"].tolist()[:3] == [0, 1, 2]
+    step = plan["steps"][-1]
+    assert step["params"]["encoding"] == "label"
+    assert step["params"]["requested"] == "auto"
+    assert plan_summary(plan)[-1]["target_encoding"] == {
+        "requested": "auto", "encoding": "label", "classes": TARGET_LABEL_MIN_CLASSES + 1,
+        "max_onehot_classes": TARGET_LABEL_MIN_CLASSES
+    }
+
+@pytest.mark.parametrize("encoding", ["onehot", "sparse"])
+def test_explicit_target_encoding_is_kept(encoding):
+    result, plan = encode_target(TARGET_LABEL_MIN_CLASSES + 1, encoding)
+    assert result.shape[1] == 2 + TARGET_LABEL_MIN_CLASSES
+    assert "target_encoding" not in plan["steps"][-1]
+
+def coerce(frame, prompt):
+    plan = compile_plan([("fix_data_types", prompt)], "target", list(frame.columns))
+    errors = []
+    result = run_plan(frame, plan, errors.append)
+    assert errors == []
+    return result, plan["steps"][0]
+
+def test_coercion_counts_failures_per_column():
+    frame = pd.DataFrame({
+        "age": ["1", "2", "x", None, "4.7"],
+        "when": ["01/02/2020", "02/03/2020", "soon", "04/05/2020", None],
+        "target": ["a", "b", "a", "b", "a"]
+    })
+    result, step = coerce(frame, "age to int and when to date")
+    assert result["age"].tolist()[:3] == [1, 2, pd.NA] and result["age"].dtype == "Int64"
+    assert result["when"].iloc[1] == pd.Timestamp("2020-02-03")
+    assert step["params"]["date_formats"] == {"when": "%m/%d/%Y"}
+    assert step["coercion"]["age"] == {"dtype": "Int64", "failed": 1, "examples": ["x"]}
+    assert step["coercion"]["when"]["failed"] == 1
+    assert step["coercion"]["when"]["examples"] == ["soon"]
+    assert plan_summary({"steps": [step]})[0]["coercion"] == step["coercion"]
+
+def test_coercion_counts_add_up_over_chunks(tmp_path):
+    from preprocessor_stream import stream_preprocess
+    frame = pd.DataFrame({"score": [str(i) if i % 4 else f"n{i}" for i in range(100)], "target": ["a", "b"] * 50})
+    path = str(tmp_path / "scores.csv")
+    frame.to_csv(path, index=False)
+    errors = []
+    plan, rows, _ = stream_preprocess(path, [("fix_data_types", "score to float")], "target",
+                                      str(tmp_path / "out.csv"), errors.append, chunksize=30)
+    assert errors == []
+    report = plan["steps"][0]["coercion"]["score"]
+    assert report["failed"] == 25
+    assert report["examples"] == ["n0", "n4", "n8"]
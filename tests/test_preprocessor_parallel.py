@@ -0,0 +1,57 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import preprocessor_parallel
+from preprocessor_parallel import merge_params, partition_columns
+from preprocessor_plan import compile_plan, run_plan
+
+def test_merge_params_keeps_step_column_order():
+    step = {"columns": ["a", "b", "c"]}
+    parts = [
+        {"mean": {"c": 3.0}, "std": {"c": 1.0}, "method": "exact"},
+        None,
+        {"mean": {"b": 2.0, "a": 1.0}, "std": {"b": 1.0, "a": 1.0}, "method": "exact"},
+    ]
+    merged = merge_params(step, parts)
+    assert list(merged["mean"]) == ["a", "b", "c"]
+    assert merged["mean"] == {"a": 1.0, "b": 2.0, "c": 3.0}
+    assert merged["method"] == "exact"
+    assert merge_params(step, [None, None]) is None
+
+def test_partition_columns_balances_bytes():
+    frame = pd.DataFrame({"big": np.zeros(10, dtype=np.float64), "small1": np.zeros(10, dtype=np.int8),
+                          "small2": np.zeros(10, dtype=np.int8)})
+    assert partition_columns(frame, ["small1", "big", "small2"], 2) == [["big"], ["small1", "small2"]]
+
+def test_sharded_stage_matches_sequential(monkeypatch):
+    monkeypatch.setattr(preprocessor_parallel, "PARALLEL_MIN_BYTES", 0)
+    rng = np.random.default_rng(3)
+    n = 300
+    frame = pd.DataFrame({
+        "a": rng.normal(size=n),
+        "b": rng.normal(size=n),
+        "c": rng.choice(["u", "v", None], n),
+        "d": rng.choice(["p", "q"], n),
+        "label": rng.choice(["x", "y"], n)
+    })
+    frame.loc[::5, "a"] = np.nan
+    actions = [
+        ("fill_missing_mean", "fill missing values in a with mean"),
+        ("fill_missing_mode", "fill missing values in c with mode"),
+        ("normalize_columns", "normalize b"),
+        ("encode_categorical", "encode c and d"),
+    ]
+    results = []
+    plans = []
+    for workers in (1, 2):
+        plan = compile_plan(actions, "label", list(frame.columns), {"workers": workers})
+        errors = []
+        results.append(run_plan(frame.copy(), plan, errors.append))
+        assert errors == []
+        plans.append(plan)
+    assert any("workers" in (step.get("metrics") or {}) for step in plans[1]["steps"])
+    pd.testing.assert_frame_equal(results[1], results[0])
+    assert [step["params"] for step in plans[1]["steps"]] == [step["params"] for step in plans[0]["steps"]]
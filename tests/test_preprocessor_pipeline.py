@@ -0,0 +1,62 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from preprocessor import preprocess_in_memory
+from preprocessor_plan import load_pipeline, save_pipeline
+from preprocessor_stream import apply_plan_to_file, stream_preprocess
+
+ACTIONS = [
+    ("filter_rows", "d > 06/01/2020"),
+    ("fill_missing_mode", "fill missing values with mode"),
+    ("standardize_columns", "standardize numeric columns"),
+    ("encode_categorical", "encode categorical columns"),
+]
+
+@pytest.fixture
+def train(tmp_path):
+    rng = np.random.default_rng(0)
+    n = 500
+    dates = pd.Timestamp("2020-01-01") + pd.to_timedelta(rng.integers(0, 366, n), unit="D")
+    frame = pd.DataFrame({
+        "d": dates.strftime("%m/%d/%Y"),
+        "city": rng.choice(["north", "south", None], n),
+        "x": rng.integers(0, 1000, n) / 4,
+        "label": rng.choice(["p", "q"], n)
+    })
+    path = str(tmp_path / "train.csv")
+    frame.to_csv(path, index=False)
+    return path
+
+def fit(train, tmp_path, mode, infer_schema):
+    output = str(tmp_path / f"fit_{mode}.csv")
+    errors = []
+    io_options = {"infer_schema": infer_schema}
+    if mode == "memory":
+        plan = preprocess_in_memory(train, ACTIONS, "label", output, errors.append, io_options, {"step_cache": False})[0]
+    else:
+        plan = stream_preprocess(train, ACTIONS, "label", output, errors.append, 100, io_options,
+                                 {"quantiles": "exact"})[0]
+    assert errors == []
+    return plan, output
+
+@pytest.mark.parametrize("mode", ["memory", "stream"])
+@pytest.mark.parametrize("infer_schema", [False, True])
+def test_applied_pipeline_matches_fit_run(train, tmp_path, mode, infer_schema):
+    plan, fitted = fit(train, tmp_path, mode, infer_schema)
+    path = str(tmp_path / "pipeline.json")
+    save_pipeline(plan, path)
+    applied = str(tmp_path / "applied.csv")
+    errors = []
+    apply_plan_to_file(load_pipeline(path), train, applied, errors.append, chunksize=128)
+    assert errors == []
+    pd.testing.assert_frame_equal(pd.read_csv(applied), pd.read_csv(fitted))
+
+def test_sniffed_dates_are_saved(train, tmp_path):
+    plan, _ = fit(train, tmp_path, "memory", True)
+    path = str(tmp_path / "pipeline.json")
+    save_pipeline(plan, path)
+    assert load_pipeline(path)["load_schema"]["dates"] == {"d": "%m/%d/%Y"}
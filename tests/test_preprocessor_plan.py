@@ -0,0 +1,122 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from preprocessor_ops import new_step
+from preprocessor_plan import can_precede, compile_plan, plan_context, pushdown_filters, run_plan, transform_order
+
+COLUMNS = ["age", "income", "city", "label"]
+
+def frame():
+    return pd.DataFrame({
+        "age": [20.0, np.nan, 40.0, 35.0, np.nan, 60.0],
+        "income": [1.0, 2.0, np.nan, 4.0, 5.0, 6.0],
+        "city": ["a", "b", None, "a", "b", "a"],
+        "label": ["x", "y", "x", "y", "x", "y"]
+    })
+
+def stages(actions, options=None):
+    plan = compile_plan(actions, "label", COLUMNS, {"optimize": False, **(options or {})})
+    errors = []
+    result = run_plan(frame(), plan, errors.append)
+    assert errors == []
+    return [step["stage"] for step in plan["steps"]], result
+
+def test_target_encoding_is_last():
+    plan = compile_plan([("fill_missing_mean", "fill missing values with mean")], "label", COLUMNS)
+    assert [step["op"] for step in plan["steps"]] == ["fill_missing_mean", "encode_target"]
+
+def test_independent_fits_share_a_stage():
+    assigned, _ = stages([
+        ("fill_missing_mean", "fill missing values in age with mean"),
+        ("fill_missing_mode", "fill missing values in city with mode"),
+        ("standardize_columns", "standardize income"),
+    ])
+    assert assigned == [0, 0, 0, 0]
+
+def test_fit_on_written_column_starts_a_stage():
+    assigned, result = stages([
+        ("fill_missing_mean", "fill missing values in age with mean"),
+        ("standardize_columns", "standardize age"),
+    ])
+    assert assigned == [0, 1, 1]
+    # Scaled with the statistics of the imputed column
+    assert abs(result["age"].mean()) < 1e-9
+
+def test_row_changes_start_a_stage():
+    assigned, result = stages([
+        ("filter_rows", "age > 25"),
+        ("fill_missing_mean", "fill missing values in income with mean"),
+    ])
+    assert assigned == [0, 1, 1]
+    assert result["income"].tolist() == [5.0, 4.0, 6.0]
+
+def test_optimizer_moves_drops_and_filters_forward():
+    plan = compile_plan([
+        ("standardize_columns", "standardize income"),
+        ("drop_columns", "drop city"),
+        ("remove_duplicates", "remove duplicates"),
+        ("filter_rows", "age > 25"),
+    ], "label", COLUMNS)
+    assert plan["optimizer"]["order"] == [
+        "drop_columns", "standardize_columns", "filter_rows", "remove_duplicates", "encode_target"
+    ]
+    # Scaling statistics depend on the rows, so the filter stays behind it
+    assert [move["op"] for move in plan["optimizer"]["moves"]] == ["drop_columns", "filter_rows"]
+
+def test_dedup_on_subset_keeps_filter_on_other_columns_behind_it():
+    ctx = plan_context(compile_plan([], "label", COLUMNS))
+    dedup = new_step("remove_duplicates", "remove duplicates in city")
+    assert can_precede(new_step("filter_rows", "city == 'a'"), dedup, ctx)
+    assert not can_precede(new_step("filter_rows", "age > 25"), dedup, ctx)
+    assert not can_precede(new_step("filter_rows", "age > 25"), new_step("standardize_columns", "standardize age"),
+                           ctx)
+
+def test_optimized_plan_gives_the_same_output():
+    actions = [
+        ("normalize_columns", "normalize income"),
+        ("remove_duplicates", "remove duplicates"),
+        ("fill_missing_mean", "fill missing values in age with mean"),
+        ("filter_rows", "city == 'a'"),
+        ("drop_columns", "drop label"),
+    ]
+    data = pd.concat([frame(), frame().iloc[:3]], ignore_index=True)
+    results = []
+    for optimize in (False, True):
+        plan = compile_plan(actions, "label", COLUMNS, {"optimize": optimize})
+        errors = []
+        results.append(run_plan(data.copy(), plan, errors.append))
+        assert errors == []
+    assert plan["optimizer"]["moves"]
+    pd.testing.assert_frame_equal(results[1], results[0])
+
+def test_pushdown_filters():
+    plan = compile_plan([
+        ("drop_columns", "drop income"),
+        ("filter_rows", "age > 25"),
+        ("remove_duplicates", "remove duplicates"),
+        ("filter_rows", "city == 'a'"),
+        ("fill_missing_mean", "fill missing values with mean"),
+        ("filter_rows", "age < 50"),
+    ], "label", COLUMNS, {"optimize": False})
+    predicate, pushed = pushdown_filters(plan)
+    assert [step["prompt"] for step in pushed] == ["age > 25", "city == 'a'"]
+    assert predicate["op"] == "and" and len(predicate["args"]) == 2
+
+    plan = compile_plan([("drop_columns", "drop age"), ("filter_rows", "age > 25")], "label", COLUMNS,
+                        {"optimize": False})
+    assert pushdown_filters(plan) == (None, [])
+
+def test_filters_run_before_unrelated_transforms():
+    plan = compile_plan([
+        ("fill_missing_mean", "fill missing values in income with mean"),
+        ("filter_rows", "age > 25"),
+    ], "label", COLUMNS, {"optimize": False})
+    errors = []
+    run_plan(frame(), plan, errors.append)
+    assert errors == []
+    steps = plan["steps"]
+    assert transform_order(steps) == [1, 0, 2]
+    assert steps[1]["hoisted_past"] == ["fill_missing_mean"]
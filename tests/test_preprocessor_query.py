@@ -0,0 +1,24 @@
+import os
+import sys
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from preprocessor_query import evaluate, parse_predicate
+
+FRAME = pd.DataFrame({"city": ["São Paulo", "Paris", "Zürich"], "a": [1, 5, 7], "b": [3, 2, 7]})
+
+def rows(prompt):
+    return FRAME[evaluate(parse_predicate(prompt, FRAME.columns), FRAME)]
+
+def test_non_ascii_literal():
+    assert rows("city == 'São Paulo'")["city"].tolist() == ["São Paulo"]
+    assert rows('keep rows where city is "Zürich"')["city"].tolist() == ["Zürich"]
+
+def test_escaped_quotes():
+    predicate = parse_predicate(r"city == 'it\'s'", FRAME.columns)
+    assert predicate["value"] == "it's"
+
+def test_column_to_column_comparison():
+    assert parse_predicate("a > b", FRAME.columns) == {"op": ">", "column": "a", "other": "b"}
+    assert rows("a > b")["a"].tolist() == [5]
+    assert rows("keep rows where a is at least b")["a"].tolist() == [5, 7]
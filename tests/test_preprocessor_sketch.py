@@ -0,0 +1,48 @@
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from preprocessor_sketch import QuantileSketch, rank_error
+
+QS = [0.1, 0.25, 0.5, 0.75, 0.9]
+
+def rank_of(values, x):
+    return np.searchsorted(np.sort(values), x, side="right") / len(values)
+
+def test_exact_below_k():
+    values = np.random.default_rng(0).normal(size=150)
+    sketch = QuantileSketch()
+    sketch.update(np.append(values, np.nan))
+    assert sketch.is_exact()
+    assert sketch.count == 150
+    assert sketch.quantiles(QS) == [float(v) for v in np.quantile(values, QS)]
+
+def test_rank_error_within_bound():
+    values = np.random.default_rng(1).lognormal(size=100000)
+    sketch = QuantileSketch()
+    for chunk in np.array_split(values, 37):
+        sketch.update(chunk)
+    assert not sketch.is_exact()
+    for q, x in zip(QS, sketch.quantiles(QS)):
+        assert abs(rank_of(values, x) - q) <= rank_error()
+
+def test_merged_shards_within_bound():
+    values = np.random.default_rng(2).uniform(size=60000)
+    merged = QuantileSketch()
+    for i, chunk in enumerate(np.array_split(values, 6)):
+        shard = QuantileSketch(seed=i)
+        shard.update(chunk)
+        merged.merge(shard)
+    assert merged.count == len(values)
+    assert abs(rank_of(values, merged.median()) - 0.5) <= rank_error()
+
+def test_round_trip():
+    sketch = QuantileSketch()
+    sketch.update(np.arange(5000, dtype=float))
+    restored = QuantileSketch.from_dict(sketch.to_dict())
+    assert restored.count == sketch.count
+    assert restored.quantiles(QS) == sketch.quantiles(QS)
+
+def test_empty_sketch():
+    assert np.isnan(QuantileSketch().median())
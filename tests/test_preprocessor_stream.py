@@ -0,0 +1,61 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from preprocessor import preprocess_in_memory
+from preprocessor_stream import should_stream, stream_preprocess
+
+@pytest.fixture
+def dataset(tmp_path):
+    rng = np.random.default_rng(2)
+    n = 900
+    frame = pd.DataFrame({
+        "age": rng.integers(18, 80, n).astype(float),
+        "income": rng.normal(5e4, 1e4, n),
+        "city": rng.choice(["a", "b", "c", None], n),
+        "zip": rng.integers(0, 5, n),
+        "label": rng.choice(["x", "y", "z"], n)
+    })
+    frame.loc[::7, "age"] = np.nan
+    frame.loc[::11, "income"] = np.nan
+    # Repeated rows span several chunks
+    frame = pd.concat([frame, frame.iloc[:150]], ignore_index=True)
+    path = str(tmp_path / "data.csv")
+    frame.to_csv(path, index=False)
+    return path
+
+@pytest.mark.parametrize("actions", [
+    [
+        ("remove_duplicates", "remove duplicates"),
+        ("fill_missing_median", "fill missing values with median"),
+        ("fill_missing_mode", "fill missing values with mode"),
+        ("standardize_columns", "standardize numeric columns"),
+        ("encode_categorical", "encode categorical columns"),
+    ],
+    [
+        ("drop_columns", "drop zip"),
+        ("filter_rows", "age > 30"),
+        ("fill_missing_mean", "fill missing values with mean"),
+        ("normalize_columns", "normalize numeric columns"),
+    ],
+])
+def test_stream_matches_memory(dataset, tmp_path, actions):
+    memory_output = str(tmp_path / "memory.csv")
+    stream_output = str(tmp_path / "stream.csv")
+    errors = []
+    _, shape, _ = preprocess_in_memory(dataset, actions, "label", memory_output, errors.append,
+                                       plan_options={"quantiles": "exact"})
+    _, rows, _ = stream_preprocess(dataset, actions, "label", stream_output, errors.append, chunksize=128,
+                                   plan_options={"quantiles": "exact"})
+    assert errors == []
+    assert rows == shape[0]
+    pd.testing.assert_frame_equal(pd.read_csv(stream_output), pd.read_csv(memory_output), check_dtype=False)
+
+def test_should_stream(tmp_path, dataset):
+    assert should_stream({"execution": "stream"}, dataset)
+    assert not should_stream({"execution": "memory"}, dataset)
+    assert not should_stream({}, dataset)
+    assert not should_stream({}, str(tmp_path / "missing.csv"))
@@ -0,0 +1,62 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import step_cache
+from preprocessor import preprocess_in_memory
+
+ACTIONS = [
+    ("filter_rows", "x > 10"),
+    ("fill_missing_mean", "fill missing values with mean"),
+    ("standardize_columns", "standardize numeric columns"),
+]
+EXTENDED = ACTIONS + [("encode_categorical", "encode categorical columns")]
+
+@pytest.fixture
+def dataset(tmp_path):
+    rng = np.random.default_rng(1)
+    n = 400
+    x = rng.integers(0, 100, n).astype(float)
+    x[rng.random(n) < 0.1] = np.nan
+    frame = pd.DataFrame({
+        "x": x,
+        "y": rng.normal(size=n),
+        "city": rng.choice(["north", "south", "east"], n),
+        "label": rng.choice(["p", "q"], n)
+    })
+    path = str(tmp_path / "data.csv")
+    frame.to_csv(path, index=False)
+    return path
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = step_cache.StepCache(str(tmp_path / "steps"))
+    monkeypatch.setattr(step_cache, "_default_cache", cache)
+    yield cache
+    cache.close()
+
+def run(dataset, tmp_path, actions, name, options):
+    output = str(tmp_path / f"{name}.csv")
+    errors = []
+    plan = preprocess_in_memory(dataset, actions, "label", output, errors.append, plan_options=options)[0]
+    assert errors == []
+    return plan, pd.read_csv(output)
+
+def test_cache_is_off_by_default(dataset, tmp_path, cache):
+    plan, _ = run(dataset, tmp_path, ACTIONS, "default", {})
+    assert "step_cache" not in plan
+    assert os.listdir(cache.directory) == ["index.sqlite"]
+
+def test_resumed_run_matches_fresh_run(dataset, tmp_path, cache):
+    first, _ = run(dataset, tmp_path, ACTIONS, "first", {"step_cache": True})
+    assert first["step_cache"]["stored"]
+
+    resumed, resumed_output = run(dataset, tmp_path, EXTENDED, "resumed", {"step_cache": True})
+    _, fresh_output = run(dataset, tmp_path, EXTENDED, "fresh", {"step_cache": False})
+    start = resumed["step_cache"]["resumed_after_steps"]
+    assert start > 0
+    assert all(step.get("cached") for step in resumed["steps"][:start])
+    pd.testing.assert_frame_equal(resumed_output, fresh_output)